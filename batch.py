@@ -0,0 +1,161 @@
+"""Chiffrage en lot, sans interface graphique, de projets .het.
+
+Exemples :
+    python batch.py "S:/Chiffrages HET" -o rechiffrage.csv
+    python batch.py "archives/**/*.het" -o rechiffrage.jsonl -j 8
+    python batch.py "S:/Chiffrages HET" -o rechiffrage.csv --export exports/
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.model import ApplicationData, Project
+from src.utils.exports import export_project
+
+
+# Données de référence du processus courant (chargées une seule fois par worker)
+_app_data: Optional[ApplicationData] = None
+
+# Attributs du projet repris tels quels dans la synthèse
+PROJECT_FIELDS = [
+    "crm_number", "revision", "client", "affaire", "secteur", "product", "quantity",
+    "nrc_subtotal", "rc_subtotal", "nrc_total", "rc_total", "n_machines_total", "total_with_rex",
+]
+SUMMARY_FIELDS = ["file"] + PROJECT_FIELDS + ["delai_etude", "rapport_path", "ortems_path", "error"]
+
+
+def _init_worker(config_path: str):
+    global _app_data
+    _app_data = ApplicationData.load(config_path)
+
+
+def collect_project_files(sources: Iterable[str]) -> List[str]:
+    """Liste les fichiers projet désignés par des dossiers (récursif), fichiers ou motifs glob."""
+    files: List[str] = []
+    for source in sources:
+        if os.path.isdir(source):
+            matches = glob.glob(os.path.join(source, "**", "*.het"), recursive=True)
+        elif os.path.isfile(source):
+            matches = [source]
+        else:
+            matches = glob.glob(source, recursive=True)
+        files.extend(os.path.abspath(path) for path in sorted(matches))
+    return list(dict.fromkeys(files))
+
+
+def export_stems(files: List[str]) -> List[str]:
+    """Nom de base des exports de chaque projet : nom du fichier .het, suffixé s'il est déjà pris.
+
+    Deux projets (copies d'archive, brouillons sans numéro CRM…) n'écrivent ainsi jamais le même fichier.
+    """
+    stems: List[str] = []
+    used = set()
+    for path in files:
+        base = os.path.splitext(os.path.basename(path))[0]
+        stem, n = base, 1
+        while stem.lower() in used:
+            n += 1
+            stem = f"{base}_{n}"
+        used.add(stem.lower())
+        stems.append(stem)
+    return stems
+
+
+def price_project(path: str, export_dir: Optional[str] = None, export_stem: Optional[str] = None) -> Dict[str, Any]:
+    """Restaure un projet comme Model.load_project et calcule totaux, répartition ORTEMS et délai.
+
+    Si export_dir est renseigné, génère aussi le rapport Excel et l'export ORTEMS du projet,
+    nommés d'après export_stem (nom du fichier .het par défaut).
+    """
+    row: Dict[str, Any] = {"file": path}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        project = Project(_app_data)
+        project.load_dict(data)
+        project.compute_n_machines_total()
+        project.calculate_total_with_rex()
+        delai = project.compute_delai_etude()
+
+        for attr in PROJECT_FIELDS:
+            row[attr] = getattr(project, attr)
+        row["delai_etude"] = delai["delai_reel"]
+        row["ortems"] = project.make_ortems_repartition()
+        if export_dir:
+            stem = export_stem or os.path.splitext(os.path.basename(path))[0]
+            paths = export_project(project, export_dir, file_name=stem)
+            row["rapport_path"] = paths["rapport"]
+            row["ortems_path"] = paths["ortems"]
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def price_projects(files: List[str], config_path: str = "config.yaml", workers: Optional[int] = None,
+                   export_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Chiffre une liste de projets, en parallèle si workers > 1 (ordre des résultats conservé).
+
+    Chaque processus garde ses templates Excel en cache : ils ne sont lus qu'une fois par processus.
+    """
+    # Noms d'export attribués ici, avant répartition entre processus, pour qu'ils soient uniques
+    stems = export_stems(files)
+    export_dirs = [export_dir] * len(files)
+    if export_dir:
+        os.makedirs(export_dir, exist_ok=True)
+    if workers == 1 or len(files) <= 1:
+        _init_worker(config_path)
+        return list(map(price_project, files, export_dirs, stems))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config_path,)) as pool:
+        return list(pool.map(price_project, files, export_dirs, stems, chunksize=8))
+
+
+def write_rows(rows: List[Dict[str, Any]], out, fmt: str):
+    """Écrit une ligne de synthèse par projet, en CSV (une colonne par job ORTEMS) ou en JSONL."""
+    if fmt == "jsonl":
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return
+
+    jobs = list(dict.fromkeys(job for row in rows for job in row.get("ortems", {})))
+    writer = csv.writer(out, delimiter=";")
+    writer.writerow(SUMMARY_FIELDS + [f"ORTEMS {job}" for job in jobs])
+    for row in rows:
+        ortems = row.get("ortems", {})
+        writer.writerow([row.get(name, "") for name in SUMMARY_FIELDS] + [ortems.get(job, "") for job in jobs])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Chiffrage en lot de projets HET (.het), sans interface.")
+    parser.add_argument("sources", nargs="+", help="dossiers, fichiers .het ou motifs glob")
+    parser.add_argument("-o", "--output", help="fichier de sortie (.csv ou .jsonl) ; sortie standard par défaut")
+    parser.add_argument("-f", "--format", choices=("csv", "jsonl"), help="format de sortie (déduit de l'extension par défaut)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="nombre de processus (tous les coeurs par défaut)")
+    parser.add_argument("-e", "--export", metavar="DOSSIER", help="génère aussi rapport Excel et export ORTEMS de chaque projet")
+    parser.add_argument("-c", "--config", default="config.yaml", help="fichier de configuration")
+    args = parser.parse_args(argv)
+
+    files = collect_project_files(args.sources)
+    if not files:
+        print("Aucun projet trouvé.", file=sys.stderr)
+        return 1
+
+    rows = price_projects(files, args.config, args.jobs, args.export)
+    fmt = args.format or ("jsonl" if args.output and args.output.lower().endswith(".jsonl") else "csv")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            write_rows(rows, f, fmt)
+    else:
+        write_rows(rows, sys.stdout, fmt)
+
+    errors = sum(1 for row in rows if "error" in row)
+    print(f"{len(rows)} projet(s) chiffré(s), {errors} erreur(s).", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
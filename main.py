@@ -73,9 +73,8 @@ if __name__ == "__main__":
     splash.show()
     app.processEvents()
 
-    # Chargement des données
-    application_data = ApplicationData()
-    application_data.sort_raw_data()
+    # Chargement des données (depuis le cache du catalogue compilé si les JSON n'ont pas changé)
+    application_data = ApplicationData.load()
 
     # Lancement de l'application
     app.setStyle(application_data.ui_theme) # Look plus moderne par défaut sur Windows
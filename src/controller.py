@@ -75,6 +75,7 @@ class Controller:
 
     def _import_project_from_path(self, path: str):
         """Charge un projet JSON depuis un chemin disque et met à jour l'UI."""
+        self.model.flush_refresh()
         try:
             with open(path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
@@ -92,6 +93,7 @@ class Controller:
     # ------------------------------------------------------------------
 
     def on_quick_export(self):
+        self.model.flush_refresh()  # Appliquer les modifications en attente avant d'exporter
         try:
             from src.utils.exports import quick_export
             paths = quick_export(self.model)
@@ -142,6 +144,7 @@ class Controller:
         dialog.exec()
 
     def _on_export_json(self):
+        self.model.flush_refresh()
         default_dir = self.model.app_data.project_save_dir
         crm = self.model.project.crm_number or "projet"
         rev = self.model.project.revision or "rev"
@@ -164,6 +167,7 @@ class Controller:
             print(f"Erreur lors de l'export du projet : {e}")
 
     def _on_export_ortems(self):
+        self.model.flush_refresh()
         default_dir = self.model.app_data.project_save_dir
         crm = self.model.project.crm_number or "projet"
         rev = self.model.project.revision or "rev"
@@ -183,6 +187,7 @@ class Controller:
             print(f"Erreur export ORTEMS : {e}")
 
     def on_export_excel_report(self):
+        self.model.flush_refresh()
         default_dir = self.model.app_data.project_save_dir
         crm = self.model.project.crm_number or "projet"
         rev = self.model.project.revision or "rev"
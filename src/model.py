@@ -1,10 +1,317 @@
-import copy
-from typing import Dict, List, Optional, Any
+import itertools
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any, Tuple
 from src.utils.ApplicationData import ApplicationData
-from src.utils.Task import AbstractTask, GeneralTask, LPDCDocument, Labo, Option, Calcul
+from src.utils.Task import AbstractTask, GeneralTask, LPDCDocument, Labo, Option, Calcul, TaskState
 from src.utils.exports import export_ortems_excel as _export_ortems, export_excel_report as _export_report
-from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtCore import QObject, pyqtSignal, QTimer, QElapsedTimer
 from math import log
+import numpy as np
+
+@dataclass
+class ProjectTotals:
+    """Résultat d'une passe d'agrégation unique sur toutes les tâches du projet.
+
+    Les heures "auto" sont les heures par défaut des tâches actives, sans
+    correction manuelle ni correction de catégorie (colonne "Base" du rapport).
+    La répartition ORTEMS est brute : ni quantité, ni divers, ni REX appliqués.
+    """
+    nrc_subtotal: float = 0.0
+    rc_subtotal: float = 0.0
+    nrc_subtotal_auto: float = 0.0
+    rc_subtotal_auto: float = 0.0
+    section_hours: Dict[str, float] = field(default_factory=dict)
+    # Clés = noeuds du moteur : ("tasks", catégorie, sous-catégorie), ("options", catégorie)…
+    category_hours: Dict[Tuple, float] = field(default_factory=dict)
+    category_auto_hours: Dict[Tuple, float] = field(default_factory=dict)
+    ortems_nrc: Dict[str, float] = field(default_factory=dict)
+    ortems_rc: Dict[str, float] = field(default_factory=dict)  # À multiplier par le coeff multi-machines
+
+    @property
+    def subtotal(self) -> float:
+        return self.nrc_subtotal + self.rc_subtotal
+
+    def repartition(self, quantity_coeff: float, factor: float) -> Dict[str, float]:
+        """Répartition ORTEMS finale : (NRC + RC × coeff quantité) × facteur (divers, REX)."""
+        return {
+            job: (nrc + self.ortems_rc[job] * quantity_coeff) * factor
+            for job, nrc in self.ortems_nrc.items()
+        }
+
+
+class HoursEngine:
+    """Moteur de recalcul incrémental des heures d'un projet.
+
+    Les heures sont organisées en arbre : total → section → catégorie → tâche.
+    Les heures effectives de chaque tâche et les sous-totaux de chaque noeud sont
+    mis en cache. Une tâche modifiée (sélection, heures manuelles, override de
+    catégorie) notifie le moteur, qui n'invalide que cette feuille et ses ancêtres :
+    une édition coûte O(profondeur) au lieu de plusieurs parcours complets.
+    Un changement de contexte (produit, affaire, secteur, coefficients) ou de
+    structure (apply_defaults) invalide tout le cache.
+
+    Le moteur tient aussi le journal des tâches modifiées depuis la dernière lecture
+    (take_changes) : l'arbre récapitulatif ne met à jour que ces tâches. Chaque
+    reconstruction incrémente `generation`, qui signale un changement global.
+    """
+
+    ROOT = ("total",)
+    RECURRENT = ("rc",)  # Tâches générales multiplicatives (RC), hors arbre principal
+
+    def __init__(self, project: "Project"):
+        self.project = project
+        self.context: Dict[str, Any] = {}
+        self._key: Optional[Tuple] = None
+        self._sources: Tuple = ()
+        self._items: List[AbstractTask] = []
+        # Structure de l'arbre : noeud → feuilles / sous-noeuds, feuille → noeuds parents
+        self._leaves: Dict[Tuple, List[AbstractTask]] = {}
+        self._subnodes: Dict[Tuple, List[Tuple]] = {}
+        self._node_parent: Dict[Tuple, Tuple] = {}
+        self._leaf_parents: Dict[int, Tuple[Tuple, ...]] = {}
+        # Tâches générales : lignes dans app_data.task_arrays et heures par défaut (vectorisées)
+        self._general: List[GeneralTask] = []
+        self._general_rows: np.ndarray = np.empty(0, dtype=np.intp)
+        self._general_defaults: np.ndarray = np.empty(0)
+        # Caches (absence de clé = valeur à recalculer)
+        self._leaf_hours: Dict[int, float] = {}
+        self._totals: Dict[Tuple, float] = {}
+        self._aggregate: Optional[ProjectTotals] = None
+        # Journal des modifications : tâches modifiées depuis la dernière lecture
+        self.generation = 0
+        self._changes: Dict[int, AbstractTask] = {}
+
+    # ── Synchronisation avec le projet ──────────────────────────────
+
+    def _current_key(self) -> Tuple:
+        prj = self.project
+        return (
+            prj.product, prj.machine_type, prj.affaire, prj.secteur,
+            prj.lpdc_coeff_secteur, prj.lpdc_coeff_affaire, prj.labo_coeff_affaire,
+            tuple(sorted(prj.calcul_coeff.items())),
+            tuple(sorted(prj.option_coeff.items())),
+        )
+
+    def _current_sources(self) -> Tuple:
+        prj = self.project
+        return (prj.tasks, prj.lpdc_docs, prj.options, prj.calculs, prj.labo)
+
+    def _sync(self):
+        """Reconstruit l'arbre si le contexte ou la structure du projet a changé."""
+        key = self._current_key()
+        sources = self._current_sources()
+        # Comparaison par identité : les listes sont remplacées (et non modifiées) par apply_defaults
+        if key != self._key or any(a is not b for a, b in zip(sources, self._sources)):
+            self._key = key
+            self._sources = sources
+            self._rebuild()
+
+    def reset(self):
+        """Force la reconstruction complète au prochain accès."""
+        self._key = None
+        self._sources = ()
+
+    def _rebuild(self):
+        prj = self.project
+        for item in self._items:
+            item.listener = None
+        self.context = prj.context()
+        self._items = []
+        self._leaves = {}
+        self._subnodes = {self.ROOT: [], self.RECURRENT: []}
+        self._node_parent = {}
+        self._leaf_parents = {}
+        self._leaf_hours = {}
+        self._totals = {}
+        self._aggregate = None
+        self._general = []
+        self.generation += 1
+        self._changes = {}
+
+        for category, sub_categories in prj.tasks.items():
+            for sub_category, tasks in sub_categories.items():
+                for task in tasks:
+                    parents = (self._category_node(("tasks", category, sub_category)),)
+                    if task.multiplicative:
+                        parents += (self.RECURRENT,)
+                    self._add_leaf(task, parents)
+                    self._general.append(task)
+        for section, items in (("options", prj.options), ("calculs", prj.calculs), ("labo", prj.labo)):
+            for item in items:
+                self._add_leaf(item, (self._category_node((section, item.category)),))
+        for doc in prj.lpdc_docs:
+            self._add_leaf(doc, (self._category_node(("lpdc", prj._lpdc_category(doc))),))
+
+        self._compile_general()
+        for item in self._items:
+            item.listener = self.invalidate
+
+    def _compile_general(self):
+        """Heures par défaut de toutes les tâches générales en une seule indexation des tableaux du catalogue.
+
+        Les tâches sans correction manuelle sont directement placées dans le cache des feuilles.
+        """
+        arrays = self.project.app_data.task_arrays
+        self._general_rows = arrays.rows(self._general)
+        self._general_defaults = arrays.default_hours(
+            self.context["product"], self.context["affaire"], self.context["secteur"])[self._general_rows]
+        for task, hours in zip(self._general, self._general_defaults.tolist()):
+            if task.manual_base_hours is None and task.category_override_hours is None:
+                self._leaf_hours[id(task)] = hours
+
+    def _category_node(self, node: Tuple) -> Tuple:
+        """Déclare un noeud de catégorie (et sa section) s'il n'existe pas encore."""
+        if node not in self._leaves:
+            section = node[:1]
+            if section not in self._subnodes:
+                self._subnodes[section] = []
+                self._node_parent[section] = self.ROOT
+                self._subnodes[self.ROOT].append(section)
+            self._leaves[node] = []
+            self._node_parent[node] = section
+            self._subnodes[section].append(node)
+        return node
+
+    def _add_leaf(self, item: AbstractTask, parents: Tuple[Tuple, ...]):
+        self._items.append(item)
+        self._leaf_parents[id(item)] = parents
+        for node in parents:
+            self._leaves.setdefault(node, []).append(item)
+
+    # ── Invalidation ────────────────────────────────────────────────
+
+    def invalidate(self, item: AbstractTask):
+        """Invalide une tâche et ses ancêtres (appelé par la tâche elle-même)."""
+        self._leaf_hours.pop(id(item), None)
+        self._aggregate = None
+        self._changes[id(item)] = item
+        for node in self._leaf_parents.get(id(item), ()):
+            # Un noeud non caché a forcément des ancêtres non cachés : on peut s'arrêter
+            while node is not None and self._totals.pop(node, None) is not None:
+                node = self._node_parent.get(node)
+
+    def take_changes(self) -> Tuple[int, List[AbstractTask]]:
+        """Génération courante et tâches modifiées depuis le dernier appel (journal vidé).
+
+        Une génération différente de celle du dernier appel signifie que tout a pu changer.
+        """
+        self._sync()
+        changes = list(self._changes.values())
+        self._changes = {}
+        return self.generation, changes
+
+    # ── Lecture ─────────────────────────────────────────────────────
+
+    def leaf_hours(self, item: AbstractTask) -> float:
+        """Heures effectives d'une tâche (cachées)."""
+        self._sync()
+        return self._leaf(item)
+
+    def _leaf(self, item: AbstractTask) -> float:
+        key = id(item)
+        if key not in self._leaf_parents:
+            return item.effective_hours(self.context)
+        hours = self._leaf_hours.get(key)
+        if hours is None:
+            hours = self._leaf_hours[key] = item.effective_hours(self.context)
+        return hours
+
+    def node_hours(self, node: Tuple) -> float:
+        """Sous-total d'un noeud : ("total",), ("rc",), (section,) ou (section, catégorie[, sous-catégorie])."""
+        self._sync()
+        return self._node_hours(node)
+
+    def _node_hours(self, node: Tuple) -> float:
+        total = self._totals.get(node)
+        if total is None:
+            total = sum(self._leaf(item) for item in self._leaves.get(node, ()))
+            total += sum(self._node_hours(sub) for sub in self._subnodes.get(node, ()))
+            self._totals[node] = total
+        return total
+
+    def total(self) -> float:
+        return self.node_hours(self.ROOT)
+
+    def recurrent_hours(self) -> float:
+        return self.node_hours(self.RECURRENT)
+
+    def category_hours(self, section: str) -> Dict[Any, float]:
+        """Sous-totaux par catégorie d'une section ("options", "calculs", "labo", "lpdc")."""
+        self._sync()
+        return {node[1]: self._node_hours(node) for node in self._subnodes.get((section,), ())}
+
+    # ── Agrégation ──────────────────────────────────────────────────
+
+    def aggregate(self) -> ProjectTotals:
+        """Totaux NRC/RC, heures auto, sous-totaux et répartition ORTEMS (recalculés une fois par modification)."""
+        self._sync()
+        if self._aggregate is None:
+            self._aggregate = self._aggregate_pass()
+        return self._aggregate
+
+    def _aggregate_pass(self) -> ProjectTotals:
+        app_data = self.project.app_data
+        ctx = self.context
+        result = ProjectTotals(
+            ortems_nrc=dict.fromkeys(app_data.jobs.keys(), 0.0),
+            ortems_rc=dict.fromkeys(app_data.jobs.keys(), 0.0),
+        )
+        category_ortems = {
+            "calculs": app_data.calcul_ortems,
+            "options": app_data.option_ortems,
+            "labo":    app_data.labo_ortems,
+            "lpdc":    app_data.lpdc_ortems,
+        }
+        total = total_auto = 0.0
+        general_auto = dict(zip(map(id, self._general), self._general_defaults.tolist()))
+
+        for section_node, category_nodes in self._subnodes.items():
+            if section_node in (self.ROOT, self.RECURRENT):
+                continue
+            section = section_node[0]
+            section_total = 0.0
+            for node in category_nodes:
+                hours = auto = 0.0
+                for item in self._leaves[node]:
+                    hours += self._leaf(item)
+                    if section == "tasks":
+                        auto += general_auto[id(item)]
+                    elif item.is_active(ctx):
+                        auto += item.default_hours(ctx)
+
+                # Autres sources : répartition ORTEMS par catégorie
+                for job_code, coeff in category_ortems.get(section, {}).get(node[1], {}).items():
+                    result.ortems_nrc[job_code] += hours * coeff
+
+                self._totals[node] = hours
+                result.category_hours[node] = hours
+                result.category_auto_hours[node] = auto
+                section_total += hours
+                total_auto += auto
+            self._totals[section_node] = section_total
+            result.section_hours[section] = section_total
+            total += section_total
+
+        # Tâches générales : RC (multiplicatives) et répartition ORTEMS par tâche, en produits matrice-vecteur
+        arrays = self.project.app_data.task_arrays
+        hours = np.zeros(len(arrays))
+        auto = np.zeros(len(arrays))
+        hours[self._general_rows] = [self._leaf(task) for task in self._general]
+        auto[self._general_rows] = self._general_defaults
+        mult = arrays.multiplicative
+        result.rc_subtotal = float(arrays.recurrent_hours(hours))
+        result.rc_subtotal_auto = float(arrays.recurrent_hours(auto))
+        for ortems, part in ((result.ortems_nrc, np.where(mult, 0.0, hours)), (result.ortems_rc, np.where(mult, hours, 0.0))):
+            for job_code, job_hours in zip(arrays.jobs, arrays.repartition(part).tolist()):
+                if job_hours or job_code in ortems:
+                    ortems[job_code] = ortems.get(job_code, 0.0) + job_hours
+
+        self._totals[self.ROOT] = total
+        self._totals[self.RECURRENT] = result.rc_subtotal
+        result.nrc_subtotal = total - result.rc_subtotal
+        result.nrc_subtotal_auto = total_auto - result.rc_subtotal_auto
+        return result
+
 
 class Project:
     def __init__(self, app_data: ApplicationData):
@@ -53,6 +360,11 @@ class Project:
         self.options: List[Option] = []
         self.calculs: List[Calcul] = []
         self.labo: List[Labo] = []
+        self.task_state = TaskState(0)  # État éditable des tâches (cf. apply_defaults)
+        # Index des tâches par type puis par numéro (cf. find_task)
+        self.task_index: Dict[str, Dict[int, AbstractTask]] = {}
+
+        self.hours = HoursEngine(self)
     
     def context(self) -> Dict[str, str]:
         return {
@@ -103,12 +415,42 @@ class Project:
 
         self.category_corrections = {}
         
-        self.tasks = copy.deepcopy(self.app_data.tasks)
-        self.lpdc_docs = copy.deepcopy([doc for doc in self.app_data.lpdc_docs if doc.is_active(ctx) or doc.option_possible])
-        self.options = copy.deepcopy(self.app_data.options)
-        self.calculs = copy.deepcopy([calc for calc in self.app_data.calculs if calc.is_available_as_option(ctx) or calc.is_mandatory(ctx)])
-        self.labo = copy.deepcopy(self.app_data.labo)
+        # Vues sur le catalogue partagé : seul l'état éditable (sélection, heures manuelles,
+        # overrides) est propre au projet, dans self.task_state
+        lpdc_docs = [doc for doc in self.app_data.lpdc_docs if doc.is_active(ctx) or doc.option_possible]
+        calculs = [calc for calc in self.app_data.calculs if calc.is_available_as_option(ctx) or calc.is_mandatory(ctx)]
+        n_tasks = sum(len(tasks) for subcats in self.app_data.tasks.values() for tasks in subcats.values())
+        self.task_state = TaskState(n_tasks + len(lpdc_docs) + len(self.app_data.options) + len(calculs) + len(self.app_data.labo))
+        slots = itertools.count()
+
+        def bind(items):
+            return [item.bind(self.task_state, next(slots)) for item in items]
+
+        self.tasks = {
+            category: {sub_category: bind(tasks) for sub_category, tasks in sub_categories.items()}
+            for category, sub_categories in self.app_data.tasks.items()
+        }
+        self.lpdc_docs = bind(lpdc_docs)
+        self.options = bind(self.app_data.options)
+        self.calculs = bind(calculs)
+        self.labo = bind(self.app_data.labo)
+        self._index_tasks()
+        self.hours.reset()
     
+    def _index_tasks(self):
+        """Reconstruit l'index des tâches (mêmes clés que les modifications sérialisées)."""
+        self.task_index = {
+            "tasks": {task.index: task for task in self.get_all_tasks()},
+            "lpdc_docs": {doc.index: doc for doc in self.lpdc_docs},
+            "options": {opt.index: opt for opt in self.options},
+            "calculs": {calc.index: calc for calc in self.calculs},
+            "labo": {labo.index: labo for labo in self.labo},
+        }
+
+    def find_task(self, kind: str, index: int) -> Optional[AbstractTask]:
+        """Tâche du projet à partir de son type ("tasks", "lpdc_docs", "options", "calculs", "labo") et de son index."""
+        return self.task_index.get(kind, {}).get(index)
+
     def get_task_default_hours(self, task: GeneralTask) -> float:
         return task.default_hours(self.context())
 
@@ -170,19 +512,20 @@ class Project:
     
     def compute_tree_hours(self, node) -> float:
         if isinstance(node, AbstractTask):
-            return node.effective_hours(self.context())
+            return self.hours.leaf_hours(node)
         if isinstance(node, list):
             return sum(self.compute_tree_hours(t) for t in node)
         if isinstance(node, dict):
             return sum(self.compute_tree_hours(v) for v in node.values())
         return 0.0
 
+    def compute_totals(self) -> ProjectTotals:
+        """Agrégation unique des heures du projet, partagée par le résumé, les exports et le délai."""
+        return self.hours.aggregate()
+
     def compute_first_machine_subtotal(self) -> float:
         """Calcule le sous-total de base (toutes les tâches)."""
-        self.first_machine_subtotal = sum(
-            self.compute_tree_hours(data)
-            for data in [self.tasks, self.lpdc_docs, self.options, self.calculs, self.labo]
-        )
+        self.first_machine_subtotal = self.compute_totals().subtotal
         return self.first_machine_subtotal
     
     def compute_first_machine_total(self) -> float:
@@ -199,20 +542,11 @@ class Project:
 
     def _compute_recurrent_hours(self) -> float:
         """Retourne les heures RC (tâches multiplicatives) pour une machine."""
-        return sum(t.effective_hours(self.context()) for t in self.get_all_tasks() if t.multiplicative)
+        return self.compute_totals().rc_subtotal
 
     def compute_nrc_subtotal(self) -> float:
         """Sous-total NRC : toutes les tâches non-récurrentes."""
-        nrc_tasks = sum(
-            t.effective_hours(self.context())
-            for t in self.get_all_tasks()
-            if not t.multiplicative
-        )
-        other = sum(
-            self.compute_tree_hours(data)
-            for data in [self.lpdc_docs, self.options, self.calculs, self.labo]
-        )
-        self.nrc_subtotal = nrc_tasks + other
+        self.nrc_subtotal = self.compute_totals().nrc_subtotal
         return self.nrc_subtotal
 
     def compute_rc_subtotal(self) -> float:
@@ -266,53 +600,12 @@ class Project:
     def make_ortems_repartition(self) -> Dict[str, float]:
         """Crée la répartition ORTEMS.
 
-        Itère les mêmes listes que compute_first_machine_subtotal()
+        Issue de la même agrégation que les sous-totaux (compute_totals)
         pour garantir la cohérence entre le total et la répartition.
         """
-        repartition = dict.fromkeys(self.app_data.jobs.keys(), 0.0)
-        ctx = self.context()
         self.quantity_mult = self._compute_multi_machine_coeff(self.quantity)
-
-        # 1. Tâches générales (répartition per-task)
-        for task in self.get_all_tasks():
-            hours = task.effective_hours(ctx)
-            is_recurrent = task.multiplicative 
-            if is_recurrent: # Pour les tâches "Suivi"
-                hours *= self.quantity_mult
-            if hours > 0 and task.ortems_repartition:
-                for job_code, coeff in task.ortems_repartition.items():
-                    repartition[job_code] += hours * coeff
-
-        # 2. Sources catégorisées (itération directe sur les listes)
-        for items, ortems_map in [
-            (self.calculs, self.app_data.calcul_ortems),
-            (self.options, self.app_data.option_ortems),
-            (self.labo,    self.app_data.labo_ortems),
-        ]:
-            cat_sums: Dict[str, float] = {}
-            for item in items:
-                cat_sums[item.category] = cat_sums.get(item.category, 0.0) + item.effective_hours(ctx)
-            for cat, total in cat_sums.items():
-                for job_code, coeff in ortems_map.get(cat, {}).items():
-                    repartition[job_code] += total * coeff
-
-        # 3. LPDC (catégorie déterminée par le contexte)
-        lpdc_sums: Dict[str, float] = {}
-        for doc in self.lpdc_docs:
-            hours = doc.effective_hours(ctx)
-            if hours > 0:
-                cat = self._lpdc_category(doc)
-                if cat:
-                    lpdc_sums[cat] = lpdc_sums.get(cat, 0.0) + hours
-        for cat, total in lpdc_sums.items():
-            for job_code, coeff in self.app_data.lpdc_ortems.get(cat, {}).items():
-                repartition[job_code] += total * coeff
-
-        # Application du divers et du REX
-        for job_code in repartition:
-            repartition[job_code] *= (1 + self.divers_percent) * self.manual_rex_coeff
-
-        return repartition
+        return self.compute_totals().repartition(
+            self.quantity_mult, (1 + self.divers_percent) * self.manual_rex_coeff)
     
     def compute_delai_etude(self) -> Dict[str, float]:
         """Calcule le délai d'étude (mois) à partir de la répartition ORTEMS."""
@@ -336,146 +629,228 @@ class Project:
             "delai_reel": delai_reel,
         }
 
-    def export_ortems_excel(self, path: str):
-        _export_ortems(self, path)
-
-    def export_excel_report(self, path: str):
-        _export_report(self, path)
+    # ------------------------------------------------------------------
+    # Corrections de catégorie
+    # ------------------------------------------------------------------
 
+    def correction_groups(self) -> Dict[str, List[AbstractTask]]:
+        """Tâches de chaque catégorie corrigeable, par clé "table_label/category_name".
 
-class Model(QObject):
-    project_changed = pyqtSignal()   # Émis lors de l'application des paramètres par défaut
-    data_updated = pyqtSignal()      # Émis lors de modifications mineures (valeurs, checkboxes)
-    description_updated = pyqtSignal()  # Émis lors d'une modification externe de la description
+        Même découpage et même ordre (obligatoires d'abord, puis par index) que les
+        tables des onglets Définition et Labo/Options, qui restaurent ces corrections.
+        """
+        ctx = self.context()
+        groups: Dict[str, List[tuple]] = {}
+        gestion = self.tasks.get("Gestion de projet", {})
+        for label in ("Enclenchement", "Suivi"):
+            groups[f"{label}/{label}"] = [(task, True) for task in gestion.get(label, [])]
+        for category, calcs in self.items_by_category(self.calculs, self.app_data.calcul_categories).items():
+            cat_label = self.app_data.calcul_categories.get(category, category)
+            groups[f"Calculs/{cat_label}"] = [(calc, calc.is_mandatory(ctx)) for calc in calcs]
+        for subcat, tasks in self.tasks.get("Plans / Specs / LDN", {}).items():
+            groups[f"Plans / Specs / LDN/{subcat}"] = [(task, True) for task in tasks]
+        for category, labo_tasks in self.items_by_category(self.labo, self.app_data.labo_categories).items():
+            cat_label = self.app_data.labo_categories.get(category, category)
+            groups[f"Laboratoire/{cat_label}"] = [(task, task.is_mandatory(ctx)) for task in labo_tasks]
+        for category, options in self.items_by_category(self.options, self.app_data.option_categories).items():
+            cat_label = self.app_data.option_categories.get(category, category)
+            groups[f"Options/{cat_label}"] = [(opt, False) for opt in options]
+        return {
+            key: [task for task, _ in sorted(items, key=lambda t: (not t[1], t[0].index))]
+            for key, items in groups.items()
+        }
 
-    def __init__(self, app_data: ApplicationData):
-        super().__init__()
-        self.app_data = app_data
-        self.project = Project(app_data)
+    @staticmethod
+    def distribute_category_correction(tasks: List[AbstractTask], correction: Optional[float], context: Dict[str, Any]):
+        """Répartit une correction de catégorie au prorata des heures naturelles (sans corrections) des tâches."""
+        if correction is None:
+            for task in tasks:
+                task.category_override_hours = None
+            return
+
+        natural = [task.default_hours(context) if task.is_active(context) else 0.0 for task in tasks]
+        total = sum(natural)
+        for task, hours in zip(tasks, natural):
+            if total == 0:
+                task.category_override_hours = 0.0
+            else:
+                task.category_override_hours = (hours / total) * correction
+
+    def apply_category_corrections(self):
+        """Applique self.category_corrections aux tâches (overrides de catégorie), sans passer par l'UI."""
+        ctx = self.context()
+        for key, tasks in self.correction_groups().items():
+            self.distribute_category_correction(tasks, self.category_corrections.get(key), ctx)
 
     # ------------------------------------------------------------------
     # Sauvegarde / Chargement
     # ------------------------------------------------------------------
 
-    def save_project(self) -> dict:
+    def to_dict(self) -> dict:
         """Sérialise le projet : valeurs scalaires + delta des modifications."""
-        prj = self.project
         return {
             "version": 1,
             "project": {
-                "crm_number":   prj.crm_number,
-                "client":       prj.client,
-                "affaire":      prj.affaire,
-                "das":          prj.das,
-                "secteur":      prj.secteur,
-                "machine_type": prj.machine_type,
-                "product":      prj.product,
-                "designation":  prj.designation,
-                "quantity":     prj.quantity,
-                "revision":     prj.revision,
-                "date":         prj.date,
-                "created_by":   prj.created_by,
-                "validated_by": prj.validated_by,
-                "description":  prj.description,
-                "lpdc_coeff_secteur": prj.lpdc_coeff_secteur,
-                "lpdc_coeff_affaire": prj.lpdc_coeff_affaire,
-                "divers_percent":    prj.divers_percent,
-                "manual_rex_coeff":  prj.manual_rex_coeff,
+                "crm_number":   self.crm_number,
+                "client":       self.client,
+                "affaire":      self.affaire,
+                "das":          self.das,
+                "secteur":      self.secteur,
+                "machine_type": self.machine_type,
+                "product":      self.product,
+                "designation":  self.designation,
+                "quantity":     self.quantity,
+                "revision":     self.revision,
+                "date":         self.date,
+                "created_by":   self.created_by,
+                "validated_by": self.validated_by,
+                "description":  self.description,
+                "lpdc_coeff_secteur": self.lpdc_coeff_secteur,
+                "lpdc_coeff_affaire": self.lpdc_coeff_affaire,
+                "divers_percent":    self.divers_percent,
+                "manual_rex_coeff":  self.manual_rex_coeff,
             },
             "modifications": {
                 "lpdc_docs": [
                     {"index": d.index, "is_selected": d.is_selected, "manual_base_hours": d.manual_base_hours}
-                    for d in prj.lpdc_docs
+                    for d in self.lpdc_docs
                     if d.is_selected or d.manual_base_hours is not None
                 ],
                 "options": [
                     {"index": o.index, "is_selected": o.is_selected, "manual_base_hours": o.manual_base_hours}
-                    for o in prj.options
+                    for o in self.options
                     if o.is_selected or o.manual_base_hours is not None
                 ],
                 "calculs": [
                     {"index": c.index, "is_selected": c.is_selected, "manual_base_hours": c.manual_base_hours}
-                    for c in prj.calculs
+                    for c in self.calculs
                     if c.is_selected or c.manual_base_hours is not None
                 ],
                 "tasks": [
                     {"index": t.index, "manual_base_hours": t.manual_base_hours}
-                    for t in prj.get_all_tasks()
+                    for t in self.get_all_tasks()
                     if t.manual_base_hours is not None
                 ],
                 "labo": [
                     {"index": l.index, "is_selected": l.is_selected, "manual_base_hours": l.manual_base_hours}
-                    for l in prj.labo
+                    for l in self.labo
                     if l.is_selected or l.manual_base_hours is not None
                 ],
-                "category_corrections": prj.category_corrections,
+                "category_corrections": self.category_corrections,
             },
         }
 
-    def load_project(self, data: dict):
+    def load_dict(self, data: dict):
         """Charge un projet : applique les valeurs puis les modifications."""
-        prj = self.project
         pd = data.get("project", {})
 
         # Valeurs scalaires
-        prj.crm_number   = pd.get("crm_number", "")
-        prj.client       = pd.get("client", "")
-        prj.affaire      = pd.get("affaire", "")
-        prj.das          = pd.get("das", "")
-        prj.secteur      = pd.get("secteur", "")
-        prj.machine_type = pd.get("machine_type", "")
-        prj.product      = pd.get("product", "")
-        prj.designation  = pd.get("designation", "")
-        prj.quantity     = pd.get("quantity", 1)
-        prj.revision     = pd.get("revision", "A")
-        prj.date         = pd.get("date", "")
-        prj.created_by   = pd.get("created_by", "")
-        prj.validated_by = pd.get("validated_by", "")
-        prj.description  = pd.get("description", "")
+        self.crm_number   = pd.get("crm_number", "")
+        self.client       = pd.get("client", "")
+        self.affaire      = pd.get("affaire", "")
+        self.das          = pd.get("das", "")
+        self.secteur      = pd.get("secteur", "")
+        self.machine_type = pd.get("machine_type", "")
+        self.product      = pd.get("product", "")
+        self.designation  = pd.get("designation", "")
+        self.quantity     = pd.get("quantity", 1)
+        self.revision     = pd.get("revision", "A")
+        self.date         = pd.get("date", "")
+        self.created_by   = pd.get("created_by", "")
+        self.validated_by = pd.get("validated_by", "")
+        self.description  = pd.get("description", "")
 
         # Reconstruire les listes à partir des données sources
-        prj.apply_defaults()
+        self.apply_defaults()
 
         # Restaurer divers/rex APRÈS apply_defaults (qui les réinitialise)
-        prj.lpdc_coeff_secteur = pd.get("lpdc_coeff_secteur", prj.lpdc_coeff_secteur)
-        prj.lpdc_coeff_affaire = pd.get("lpdc_coeff_affaire", prj.lpdc_coeff_affaire)
-        prj.divers_percent   = pd.get("divers_percent", 0.05)
-        prj.manual_rex_coeff = pd.get("manual_rex_coeff", 1.0)
+        self.lpdc_coeff_secteur = pd.get("lpdc_coeff_secteur", self.lpdc_coeff_secteur)
+        self.lpdc_coeff_affaire = pd.get("lpdc_coeff_affaire", self.lpdc_coeff_affaire)
+        self.divers_percent   = pd.get("divers_percent", 0.05)
+        self.manual_rex_coeff = pd.get("manual_rex_coeff", 1.0)
 
         # Appliquer les modifications
         mods = data.get("modifications", {})
 
-        lpdc_idx = {m["index"]: m for m in mods.get("lpdc_docs", [])}
-        for doc in prj.lpdc_docs:
-            if doc.index in lpdc_idx:
-                m = lpdc_idx[doc.index]
-                doc.is_selected  = m.get("is_selected", doc.is_selected)
-                doc.manual_base_hours = m.get("manual_base_hours")
-
-        opt_idx = {m["index"]: m for m in mods.get("options", [])}
-        for opt in prj.options:
-            if opt.index in opt_idx:
-                m = opt_idx[opt.index]
-                opt.is_selected  = m.get("is_selected", opt.is_selected)
-                opt.manual_base_hours = m.get("manual_base_hours")
-
-        calc_idx = {m["index"]: m for m in mods.get("calculs", [])}
-        for calc in prj.calculs:
-            if calc.index in calc_idx:
-                m = calc_idx[calc.index]
-                calc.is_selected  = m.get("is_selected", calc.is_selected)
-                calc.manual_base_hours = m.get("manual_base_hours")
-
-        task_idx = {m["index"]: m for m in mods.get("tasks", [])}
-        for task in prj.get_all_tasks():
-            if task.index in task_idx:
-                task.manual_base_hours = task_idx[task.index].get("manual_base_hours")
-
-        labo_idx = {m["index"]: m for m in mods.get("labo", [])}
-        for labo in prj.labo:
-            if labo.index in labo_idx:
-                m = labo_idx[labo.index]
-                labo.is_selected = m.get("is_selected", labo.is_selected)
-                labo.manual_base_hours = m.get("manual_base_hours")
-
-        prj.category_corrections = mods.get("category_corrections", {})
\ No newline at end of file
+        for kind in ("lpdc_docs", "options", "calculs", "labo"):
+            for m in mods.get(kind, []):
+                item = self.find_task(kind, m["index"])
+                if item is not None:
+                    item.is_selected = m.get("is_selected", item.is_selected)
+                    item.manual_base_hours = m.get("manual_base_hours")
+
+        for m in mods.get("tasks", []):
+            task = self.find_task("tasks", m["index"])
+            if task is not None:
+                task.manual_base_hours = m.get("manual_base_hours")
+
+        self.category_corrections = mods.get("category_corrections", {})
+        self.apply_category_corrections()
+
+    def export_ortems_excel(self, path: str):
+        _export_ortems(self, path)
+
+    def export_excel_report(self, path: str):
+        _export_report(self, path)
+
+
+class Model(QObject):
+    project_changed = pyqtSignal()   # Émis lors de l'application des paramètres par défaut
+    data_updated = pyqtSignal(object)  # Émis après des modifications mineures : ensemble des parties à rafraîchir
+    description_updated = pyqtSignal()  # Émis lors d'une modification externe de la description
+
+    # Parties de l'interface à rafraîchir (voir request_refresh)
+    REFRESH_TABLES = "tables"
+    REFRESH_TREE = "tree"
+    REFRESH_TOTALS = "totals"  # totaux et délai d'étude
+    REFRESH_ALL = (REFRESH_TABLES, REFRESH_TREE, REFRESH_TOTALS)
+    FRAME_MS = 16  # Au plus un rafraîchissement par trame (~60 Hz)
+
+    def __init__(self, app_data: ApplicationData):
+        super().__init__()
+        self.app_data = app_data
+        self.project = Project(app_data)
+
+        # Planificateur de rafraîchissement : parties en attente, émises une seule fois
+        self._dirty: set = set()
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self.flush_refresh)
+        self._last_flush = QElapsedTimer()
+
+    # ------------------------------------------------------------------
+    # Rafraîchissement de l'interface
+    # ------------------------------------------------------------------
+
+    def request_refresh(self, *parts: str):
+        """Demande le rafraîchissement de parties de l'interface (REFRESH_*, toutes par défaut).
+
+        Les demandes sont regroupées : data_updated est émis une seule fois, au tour
+        suivant de la boucle d'événements et au plus une fois par trame (FRAME_MS).
+        Une rafale de modifications ne provoque donc qu'un rafraîchissement.
+        """
+        self._dirty.update(parts or self.REFRESH_ALL)
+        if not self._refresh_timer.isActive():
+            elapsed = self._last_flush.elapsed() if self._last_flush.isValid() else self.FRAME_MS
+            self._refresh_timer.start(max(0, self.FRAME_MS - elapsed))
+
+    def flush_refresh(self):
+        """Émet immédiatement les rafraîchissements en attente (ex. avant un export)."""
+        self._refresh_timer.stop()
+        if not self._dirty:
+            return
+        parts, self._dirty = self._dirty, set()
+        self._last_flush.start()
+        self.data_updated.emit(parts)
+
+    # ------------------------------------------------------------------
+    # Sauvegarde / Chargement
+    # ------------------------------------------------------------------
+
+    def save_project(self) -> dict:
+        """Sérialise le projet : valeurs scalaires + delta des modifications."""
+        return self.project.to_dict()
+
+    def load_project(self, data: dict):
+        """Charge un projet : applique les valeurs puis les modifications."""
+        self.project.load_dict(data)
\ No newline at end of file
@@ -41,11 +41,9 @@ class LPDCTabController(BaseTaskTabController):
     def _on_lpdc_secteur_coefficient_change(self, new_coeff: float):
         """Gère la modification d'un coefficient global (ex: LPDC)."""
         self.model.project.lpdc_coeff_secteur = new_coeff
-        self._update_all_tables()
-        self.model.data_updated.emit()
+        self._request_tables_update()
 
     def _on_lpdc_affaire_coefficient_change(self, new_coeff: float):
         """Gère la modification d'un coefficient global (ex: LPDC)."""
         self.model.project.lpdc_coeff_affaire = new_coeff
-        self._update_all_tables()
-        self.model.data_updated.emit()
+        self._request_tables_update()
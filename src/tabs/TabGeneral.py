@@ -230,6 +230,7 @@ class TabGeneralController:
         """Appelé une seule fois après DEBOUNCE_MS ms d'inactivité sur les champs importants."""
         criticity = self._pending_max_criticity
         self._pending_max_criticity = 0
+        self.model.flush_refresh()  # Appliquer les modifications en attente avant de reconstruire
         if criticity >= 2:
             self.model.project.apply_defaults()
         elif criticity >= 1:
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor, wait
+
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QGroupBox,
-    QLabel, QLineEdit, QComboBox, QPushButton, QTableWidget,
+    QLabel, QLineEdit, QComboBox, QPushButton, QTableWidget, QTableView, QCheckBox,
+    QHeaderView,
     QTableWidgetItem, QToolButton, QToolTip,
     QFrame, QScrollArea, QAbstractScrollArea, QScrollBar,
     QDialog, QStyledItemDelegate, QMessageBox
 )
-from PyQt6.QtCore import Qt, QPoint, QRect
+from PyQt6.QtCore import (
+    Qt, QPoint, QRect, QObject, QThread, QTimer, QCoreApplication, pyqtSignal,
+    QAbstractTableModel, QModelIndex,
+)
 
 from src.model import Model
 from src.utils.MachineDatabase import (
@@ -18,6 +24,7 @@ from src.utils.MachineDatabase import (
     COL_TYPE_PRODUIT, COL_PRODUIT, COL_TYPE_AFFAIRE, COL_DAS, COL_SECTEUR,
     COL_IC, COL_IM, COL_EEX,
 )
+from src.utils.MachineDatabaseSqlite import SqliteMachineDatabase
 from src.utils.widgets import NoWheelSpinBox, NoWheelComboBox
 
 
@@ -32,6 +39,180 @@ class _SortableItem(QTableWidgetItem):
             return super().__lt__(other)
 
 
+def _is_missing(value) -> bool:
+    import pandas as pd
+    return value is None or (not isinstance(value, str) and pd.isna(value))
+
+
+def _format_cell(value) -> str:
+    """Texte affiché pour une valeur de la base (dates jj/mm/aaaa, entiers sans décimale)."""
+    import pandas as pd
+    if _is_missing(value):
+        return ""
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%d/%m/%Y")
+    if isinstance(value, float):
+        return str(int(value)) if value == int(value) else f"{value:.4g}"
+    return str(value)
+
+
+# ─────────────────────────────────────────────────────────────────────
+#  Modèle des résultats de recherche
+# ─────────────────────────────────────────────────────────────────────
+class _ResultsModel(QAbstractTableModel):
+    """Résultats de recherche, formatés à la demande.
+
+    Seules les cellules affichées sont formatées (traduction code → label
+    comprise) ; le tri ne déplace qu'une permutation des lignes.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._columns: list = []
+        self._values: list = []      # une colonne (tableau object) par colonne affichée
+        self._label_maps: list = []  # dict code → label (ou None) par colonne
+        self._project_ids = None
+        self._order = None           # ligne affichée → ligne du résultat
+
+    def set_frame(self, df, project_ids, label_maps: dict = None):
+        import numpy as np
+        label_maps = label_maps or {}
+        self.beginResetModel()
+        self._columns = list(df.columns)
+        self._values = [df[col].to_numpy(dtype=object) for col in self._columns]
+        self._label_maps = [label_maps.get(col) for col in self._columns]
+        self._project_ids = project_ids
+        self._order = np.arange(len(df))
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self._columns, self._values, self._label_maps = [], [], []
+        self._project_ids = self._order = None
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() or self._order is None else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self._columns[section]
+        return super().headerData(section, orientation, role)
+
+    def _text(self, column: int, row: int) -> str:
+        value = self._values[column][row]
+        mapping = self._label_maps[column]
+        if mapping is not None and not _is_missing(value):
+            value = mapping.get(str(value).strip(), value)
+        return _format_cell(value)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._order[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._text(index.column(), row)
+        if role == Qt.ItemDataRole.UserRole:
+            return self._project_ids[row]
+        return None
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """Tri numérique quand le texte est un nombre, alphabétique sinon (nombres en tête)."""
+        import numpy as np
+        import pandas as pd
+        if not 0 <= column < len(self._columns) or self._order is None:
+            return
+        # Tri stable par rapport à l'ordre affiché (comme QTableWidget), y compris en décroissant
+        descending = order == Qt.SortOrder.DescendingOrder
+        current = self._order[::-1] if descending else self._order
+        texts = pd.Series([self._text(column, row) for row in current], dtype=object)
+        numbers = pd.to_numeric(texts, errors="coerce").to_numpy(dtype=np.float64)
+        is_text = np.isnan(numbers)
+        new_order = current[np.lexsort((texts.to_numpy(dtype=str), np.where(is_text, 0.0, numbers), is_text))]
+        if descending:
+            new_order = new_order[::-1]
+
+        self.layoutAboutToBeChanged.emit()
+        position = np.empty(len(new_order), dtype=np.intp)
+        position[new_order] = np.arange(len(new_order))
+        for index in self.persistentIndexList():
+            new_row = int(position[self._order[index.row()]])
+            self.changePersistentIndex(index, self.index(new_row, index.column()))
+        self._order = new_order
+        self.layoutChanged.emit()
+
+
+# ─────────────────────────────────────────────────────────────────────
+#  Chargement de la base en arrière-plan
+# ─────────────────────────────────────────────────────────────────────
+class _DatabaseLoader(QThread):
+    """Lit la base REX dans un thread séparé ; émet loaded(succès) une fois terminé."""
+    loaded = pyqtSignal(bool)
+
+    def __init__(self, db: MachineDatabase, parent=None):
+        super().__init__(parent)
+        self._db = db
+
+    def run(self):
+        # Toujours émettre loaded : sinon le contrôleur resterait en chargement
+        try:
+            ok = self._db.load()
+        except Exception as e:
+            print(f"Erreur lors du chargement de la base REX : {e}")
+            ok = False
+        self.loaded.emit(ok)
+
+
+class _SearchRunner(QObject):
+    """Exécute les recherches REX dans un thread de travail, une à la fois.
+
+    Chaque recherche reçoit un numéro croissant. Une recherche encore en
+    attente quand une plus récente est demandée n'est pas exécutée, et seul
+    le résultat de la dernière est émis : finished(numéro, résultats), reçu
+    dans le thread de l'interface (résultats None en cas d'erreur).
+    """
+    finished = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Un seul thread : la base n'est jamais interrogée par deux recherches à la fois
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rex-search")
+        self._future = None
+        self.latest = 0
+
+    def submit(self, search, *args) -> int:
+        self.latest += 1
+        self._future = self._executor.submit(self._run, self.latest, search, args)
+        return self.latest
+
+    def cancel(self):
+        """Abandonne la recherche en cours : son résultat ne sera pas émis."""
+        self.latest += 1
+
+    def _run(self, request_id: int, search, args):
+        if request_id != self.latest:
+            return  # remplacée par une recherche plus récente avant de démarrer
+        try:
+            results = search(*args)
+        except Exception as e:
+            print(f"Erreur lors de la recherche REX : {e}")
+            results = None
+        if request_id == self.latest:
+            self.finished.emit(request_id, results)
+
+    def wait(self):
+        """Attend la fin de la recherche en cours (avant de modifier ou recharger la base)."""
+        if self._future is not None:
+            wait([self._future])
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
 # ─────────────────────────────────────────────────────────────────────
 #  Section repliable
 # ─────────────────────────────────────────────────────────────────────
@@ -387,6 +568,8 @@ class TabMachineSearch(QWidget):
             inp.setPlaceholderText("Rechercher…")
             self.string_inputs[field] = inp
             text_grid.addWidget(inp, row + 1, col)
+        self.chk_live_search = QCheckBox("Rechercher pendant la saisie")
+        text_grid.addWidget(self.chk_live_search, (len(STRING_FIELDS) - 1) // 3 * 2 + 1, 2)
         text_group.setLayout(text_grid)
         section.addWidget(text_group)
 
@@ -450,6 +633,11 @@ class TabMachineSearch(QWidget):
         self.spin_tolerance.setSingleStep(5)
         tol_lay.addWidget(self.spin_tolerance)
         tol_lay.addStretch()
+        self.chk_similarity = QCheckBox("Classer par similarité")
+        self.chk_similarity.setToolTip(
+            "Affiche les machines les plus proches des critères saisis, "
+            "de la plus à la moins similaire, au lieu de filtrer avec la tolérance")
+        tol_lay.addWidget(self.chk_similarity)
         num_vbox.addLayout(tol_lay)
 
         num_grid = QGridLayout()
@@ -475,13 +663,19 @@ class TabMachineSearch(QWidget):
         main_layout.addWidget(self.label_count)
 
         # ── Tableau de résultats ─────────────────────────────────────
-        self.table_results = QTableWidget()
+        self.results_model = _ResultsModel(self)
+        self.table_results = QTableView()
         self.table_results.setObjectName("machineResults")
+        self.table_results.setModel(self.results_model)
         self.table_results.setAlternatingRowColors(True)
-        self.table_results.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        self.table_results.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table_results.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.table_results.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
         self.table_results.horizontalHeader().setStretchLastSection(False)
         self.table_results.horizontalHeader().setSectionsClickable(True)
+        # Largeur des colonnes estimée sur les premières lignes seulement
+        self.table_results.horizontalHeader().setResizeContentsPrecision(200)
+        # Hauteur de ligne fixe : la hauteur totale ne dépend pas du contenu
+        self.table_results.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         self.table_results.setSortingEnabled(True)
         # Pas de scrollbars internes : vertical géré par la scroll area,
         # horizontal géré par la scrollbar externe ci-dessous
@@ -545,67 +739,40 @@ class TabMachineSearch(QWidget):
     def set_results(self, df, label_maps: dict = None):
         """Affiche les résultats. label_maps: dict[col_name → dict[code → label]]."""
         import pandas as pd
-        self._last_results_df = df.copy()
-        self.table_results.setSortingEnabled(False)
-        self.table_results.clear()
+        self._last_results_df = df
+        # Nouvelle recherche : ordre de la base (ou de similarité), sans tri de colonne
+        self.table_results.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
 
         if df.empty:
             self._last_results_df = pd.DataFrame()
-            self.table_results.setRowCount(0)
-            self.table_results.setColumnCount(0)
+            self.clear_results()
             self.label_count.setText("Aucun résultat")
             return
 
         # Retirer les colonnes masquées
         display_df = df.drop(columns=[c for c in HIDDEN_COLUMNS if c in df.columns], errors="ignore")
 
-        if label_maps:
-            for col, mapping in label_maps.items():
-                if col in display_df.columns:
-                    display_df[col] = display_df[col].apply(
-                        lambda v, m=mapping: m.get(str(v).strip(), v) if pd.notna(v) else v
-                    )
-
-        columns = list(display_df.columns)
-        self.table_results.setColumnCount(len(columns))
-        self.table_results.setHorizontalHeaderLabels(columns)
-        self.table_results.setRowCount(len(display_df))
-
-        for row_idx in range(len(display_df)):
-            # Stocker le N° Projet pour le double-clic
-            project_id = ""
-            if COL_NUM_PROJET in df.columns:
-                val = df.iloc[row_idx][COL_NUM_PROJET]
-                project_id = str(val).strip() if pd.notna(val) else ""
-
-            for col_idx, col_name in enumerate(columns):
-                value = display_df.iloc[row_idx, col_idx]
-
-                # Formatage propre
-                if pd.isna(value):
-                    text = ""
-                elif isinstance(value, pd.Timestamp):
-                    text = value.strftime("%d/%m/%Y")
-                elif isinstance(value, float):
-                    text = str(int(value)) if value == int(value) else f"{value:.4g}"
-                else:
-                    text = str(value)
-
-                item = _SortableItem(text)
-                item.setData(Qt.ItemDataRole.UserRole, project_id)
-                self.table_results.setItem(row_idx, col_idx, item)
+        # N° Projet de chaque ligne pour le double-clic
+        if COL_NUM_PROJET in df.columns:
+            ids = df[COL_NUM_PROJET]
+            project_ids = ids.astype(str).str.strip().where(ids.notna(), "").to_numpy(dtype=object)
+        else:
+            project_ids = [""] * len(df)
 
+        self.results_model.set_frame(display_df, project_ids, label_maps)
         self.table_results.resizeColumnsToContents()
-        self.table_results.setSortingEnabled(True)
         self._fit_table_height()
         self.label_count.setText(f"{len(display_df)} machine(s) trouvée(s)")
 
+    def clear_results(self):
+        self.results_model.clear()
+        self._fit_table_height()
+
     def _fit_table_height(self):
         """Force la hauteur du tableau à sa taille naturelle pour éviter le scroll interne vertical."""
         t = self.table_results
         h = t.horizontalHeader().height() + 4  # header + border
-        for i in range(t.rowCount()):
-            h += t.rowHeight(i)
+        h += t.verticalHeader().length()       # lignes de hauteur fixe : calcul immédiat
         # +20 pour la scrollbar horizontale toujours visible
         h += t.horizontalScrollBar().sizeHint().height()
         t.setMinimumHeight(h)
@@ -613,10 +780,10 @@ class TabMachineSearch(QWidget):
 
     def get_project_id_at_row(self, row: int) -> str:
         """Retourne le N° Projet stocké dans la ligne (survit au tri)."""
-        item = self.table_results.item(row, 0)
-        if item is None:
+        index = self.results_model.index(row, 0)
+        if not index.isValid():
             return ""
-        return item.data(Qt.ItemDataRole.UserRole) or ""
+        return index.data(Qt.ItemDataRole.UserRole) or ""
 
     # ── Collecte des filtres ─────────────────────────────────────────
     def get_all_filters(self) -> dict:
@@ -684,12 +851,22 @@ class TabMachineSearch(QWidget):
 #  CONTRÔLEUR
 # =====================================================================
 class MachineSearchController:
+    LIVE_SEARCH_MS = 150  # Délai d'inactivité avant la recherche pendant la saisie
+
     def __init__(self, model: Model, view: TabMachineSearch):
         self.model = model
         self.view = view
-        self.db = MachineDatabase(model.app_data.rex_database_path)
+        ad = model.app_data
+        if ad.rex_backend == "sqlite":
+            self.db = SqliteMachineDatabase(ad.rex_database_path, ad.rex_cache_dir,
+                                            db_path=ad.rex_sqlite_path)
+        else:
+            self.db = MachineDatabase(ad.rex_database_path, ad.rex_cache_dir)
+        self._loading = True
+        self._pending_search = False
+        self._detail_open = False
+        self._flush_after_load = False  # modifications à réécrire après un rechargement
 
-        self.db.load()
         self._populate_filters()
 
         # Signaux
@@ -698,33 +875,40 @@ class MachineSearchController:
         self.model.project_changed.connect(self._on_project_changed)
         self.view.table_results.doubleClicked.connect(self._on_double_click)
 
+        # Recherches exécutées hors du thread de l'interface ; seule la plus récente est affichée
+        self._search_runner = _SearchRunner()
+        self._search_runner.finished.connect(self._on_search_done)
+
+        # Recherche pendant la saisie dans les champs texte
+        self._live_timer = QTimer()
+        self._live_timer.setSingleShot(True)
+        self._live_timer.setInterval(self.LIVE_SEARCH_MS)
+        self._live_timer.timeout.connect(self._on_search)
+        for inp in self.view.string_inputs.values():
+            inp.textEdited.connect(self._on_text_edited)
+
         # Filtrage dynamique des combos dépendants
         self.view.dropdown_inputs[COL_TYPE_PRODUIT].currentIndexChanged.connect(
             self._update_produit_combo)
         self.view.dropdown_inputs[COL_DAS].currentIndexChanged.connect(
             self._update_secteur_combo)
 
+        # Lecture du fichier Excel en arrière-plan : le reste de l'application
+        # est utilisable pendant le chargement
+        self.view.label_count.setText("Chargement de la base REX…")
+        self._loader = _DatabaseLoader(self.db)
+        self._loader.loaded.connect(self._on_database_loaded)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self._loader.wait)
+            app.aboutToQuit.connect(self._search_runner.shutdown)
+            app.aboutToQuit.connect(self.db.flush_edits)
+        self._loader.start()
+
     # ── Peuplement des combos ────────────────────────────────────────
     def _populate_filters(self):
         ad = self.model.app_data
 
-        # Années, IP (depuis la base de données)
-        if self.db.is_loaded:
-            self.view.populate_combo(
-                self.view.combo_date,
-                self.db.unique_values.get(COL_DATE, []),
-            )
-            self.view.populate_ip_combos(
-                self.db.unique_values.get("IP_first", []),
-                self.db.unique_values.get("IP_second", []),
-            )
-            # IC, IM, EEX : valeurs brutes de la base
-            for field in (COL_IC, COL_IM, COL_EEX):
-                combo: QComboBox = self.view.dropdown_inputs.get(field)
-                if combo is not None:
-                    combo.setMaxVisibleItems(10)
-                    self.view.populate_combo(combo, self.db.unique_values.get(field, []))
-
         # Champs avec labels (depuis app_data)
         self.view.populate_combo_with_labels(
             self.view.dropdown_inputs[COL_TYPE_PRODUIT], ad.product_types)
@@ -737,22 +921,87 @@ class MachineSearchController:
         self._update_produit_combo()
         self._update_secteur_combo()
 
+    def _populate_database_filters(self):
+        """Peuple les combos issus de la base (années, IP, IC, IM, EEX), une fois chargée."""
+        self.view.populate_combo(
+            self.view.combo_date,
+            self.db.unique_values.get(COL_DATE, []),
+        )
+        self.view.populate_ip_combos(
+            self.db.unique_values.get("IP_first", []),
+            self.db.unique_values.get("IP_second", []),
+        )
+        # IC, IM, EEX : valeurs brutes de la base
+        for field in (COL_IC, COL_IM, COL_EEX):
+            combo: QComboBox = self.view.dropdown_inputs.get(field)
+            if combo is not None:
+                combo.setMaxVisibleItems(10)
+                self.view.populate_combo(combo, self.db.unique_values.get(field, []))
+
+    def _on_database_loaded(self, ok: bool):
+        """Fin du chargement : peuple les filtres, réécrit les modifications en attente
+        après un rechargement et lance la recherche mise en attente."""
+        self._loading = False
+        if ok and self.db.is_loaded:
+            self._populate_database_filters()
+            self.view.label_count.setText("")
+            if self._flush_after_load:
+                self._flush_after_load = False
+                self._flush_edits()
+        else:
+            self._flush_after_load = False
+            self.view.label_count.setText("Base de données non chargée")
+        if self._pending_search and not self._loading:
+            self._pending_search = False
+            self._on_search()
+
     # ── Recherche ────────────────────────────────────────────────────
     def _on_search(self):
+        self._live_timer.stop()
+        if self._loading:
+            # Recherche lancée pendant le chargement : exécutée dès que la base est prête
+            self._pending_search = True
+            self.view.label_count.setText("Chargement de la base REX… la recherche sera lancée ensuite")
+            return
+        if self._detail_open:
+            # Le détail projet modifie la base : la recherche attend sa fermeture
+            self._pending_search = True
+            return
         if not self.db.is_loaded:
             self.view.label_count.setText("Base de données non chargée")
             return
         filters   = self.view.get_all_filters()
         tolerance = self.view.get_tolerance()
-        results   = self.db.search(filters, tolerance)
+        if self.view.chk_similarity.isChecked():
+            ad = self.model.app_data
+            self._search_runner.submit(self.db.search_similar, filters, ad.rex_similarity_top_k,
+                                       ad.rex_similarity_weights, tolerance)
+        else:
+            self._search_runner.submit(self.db.search, filters, tolerance)
+
+    def _on_search_done(self, request_id: int, results):
+        """Résultat d'une recherche : affiché seulement si aucune autre n'a été lancée depuis."""
+        if request_id != self._search_runner.latest:
+            return
+        if results is None:
+            self.view.label_count.setText("Erreur lors de la recherche")
+            return
         self.view.set_results(results, self._build_label_maps())
 
+    def _on_text_edited(self, _text: str):
+        if self.view.chk_live_search.isChecked():
+            self._live_timer.start()  # repart à zéro à chaque frappe
+
     def _on_double_click(self, index):
         """Double-clic sur une ligne : affiche le détail du projet."""
         row = index.row()
         project_id = self.view.get_project_id_at_row(row)
-        if not project_id:
+        if not project_id or self._loading:
             return
+        # Le détail modifie la base : pas de recherche en cours ni lancée pendant ce temps
+        self._live_timer.stop()
+        self._detail_open = True
+        self._search_runner.wait()
         machines = self.db.get_project_machines(project_id)
         hours = self.db.get_project_hours(project_id)
         dlg = ProjectDetailDialog(
@@ -764,6 +1013,40 @@ class MachineSearchController:
             parent=self.view,
         )
         dlg.exec()
+        self._detail_open = False
+        self._flush_edits()
+        if self._pending_search and not self._loading:
+            self._pending_search = False
+            self._on_search()
+
+    def _flush_edits(self):
+        """Écrit dans le classeur REX, en une fois, les modifications faites dans le détail projet."""
+        if not self.db.pending_edits or self.db.flush_edits():
+            return
+        if not self.db.edit_conflict:
+            QMessageBox.warning(
+                self.view, "Erreur",
+                "Impossible d'enregistrer les modifications dans la base REX.\n"
+                "Elles sont conservées et seront de nouveau enregistrées à la prochaine fermeture du détail.")
+            return
+        answer = QMessageBox.question(
+            self.view, "Base REX modifiée",
+            "La base REX a été modifiée par ailleurs depuis son chargement.\n"
+            f"Recharger la base et y réappliquer vos {self.db.pending_edits} modification(s) ?")
+        if answer == QMessageBox.StandardButton.Yes:
+            self._reload_database()
+
+    def _reload_database(self):
+        """Relit la base REX en arrière-plan ; les modifications en attente sont
+        réécrites dans _on_database_loaded."""
+        self._loading = True
+        self._flush_after_load = True
+        self._live_timer.stop()
+        self._search_runner.cancel()
+        self._search_runner.wait()  # la base n'est pas relue pendant une recherche
+        self.view.label_count.setText("Rechargement de la base REX…")
+        self._loader.wait()
+        self._loader.start()
 
     def _append_rex_to_description(self, text: str):
         """Ajoute une ligne de REX dans la description du projet actif."""
@@ -806,11 +1089,13 @@ class MachineSearchController:
         return maps
 
     def _on_reset(self):
+        self._pending_search = False
+        self._live_timer.stop()
+        self._search_runner.cancel()
         self.view.reset_filters()
         self._prefill_from_project()
-        self.view.table_results.setRowCount(0)
-        self.view.table_results.setColumnCount(0)
-        self.view.label_count.setText("")
+        self.view.clear_results()
+        self.view.label_count.setText("Chargement de la base REX…" if self._loading else "")
 
     # ── Filtrage dynamique des combos dépendants ─────────────────────
     def _update_produit_combo(self):
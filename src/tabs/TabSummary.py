@@ -1,4 +1,4 @@
-﻿from typing import Any, Dict, Tuple
+﻿from typing import Any, Dict, List, Tuple
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QLabel, QFrame, QTreeWidget, QTreeWidgetItem,
                              QHBoxLayout, QGridLayout, QLineEdit, QPushButton, QMenu,
                              QDialog, QDialogButtonBox, QGroupBox, QFormLayout, QScrollArea,
@@ -27,6 +27,15 @@ class CollapsibleSection(QTreeWidget):
         # Empêche Qt d'élargir automatiquement la dernière colonne.
         self.header().setStretchLastSection(False)
 
+        # Noeuds persistants : racines, noeud de chaque tâche, structure affichée
+        self._roots: List[_SummaryNode] = []
+        self._task_nodes: Dict[int, _SummaryNode] = {}
+        self._layout = None
+        self._rex_coeff = 1.0
+        self._display_multiplier = 1.0
+        self._font = QFont("Arial", 11)
+        self._bold_font = QFont("Arial", 11, QFont.Weight.Bold)
+
         self._auto_resize = (title == "RC")
         if self._auto_resize:
             self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
@@ -107,97 +116,184 @@ class CollapsibleSection(QTreeWidget):
             self._apply_expand(item.child(i), current, paths)
 
     def build_tree(self, items: Dict[str, Any], context: Dict[str, Any], rex_coeff: float = 1.0, display_multiplier: float = 1.0):
-        """Construit l'arbre à partir d'un dictionnaire de données."""
+        """Construit l'arbre à partir d'un dictionnaire de données.
+
+        Les items Qt ne sont recréés que si la structure (sections, catégories, tâches)
+        a changé ; sinon les noeuds existants sont seulement mis à jour.
+        """
         self._rex_coeff = rex_coeff
         self._display_multiplier = display_multiplier
-        expanded = self._get_expanded_paths()
-
-        self.clear()
-        for label, value in items.items():
-            self._add_node(label, value, None, context)
-
-        self._apply_column_widths()
-        if expanded:
-            self._restore_expanded(expanded)
-        else:
-            self.collapseAll()
+        layout = self._tree_layout(items)
+        if layout != self._layout:
+            expanded = self._get_expanded_paths()
+            self._create_nodes(items)
+            self._layout = layout
+            self._apply_column_widths()
+            if expanded:
+                self._restore_expanded(expanded)
+            else:
+                self.collapseAll()
+        self._patch(self._roots, context)
         if self._auto_resize:
             self.updateGeometry()
 
-    def _add_node(self, label: str, value: Any, parent: QTreeWidgetItem | None, context: Dict[str, Any]) -> tuple[float, float]:
-        """Ajoute récursivement un noeud à l'arbre."""
+    def update_tasks(self, tasks: List[AbstractTask], context: Dict[str, Any], rex_coeff: float = 1.0):
+        """Met à jour les tâches modifiées et leurs catégories, sans toucher au reste de l'arbre.
+
+        Un changement de coefficient REX met à jour toutes les valeurs corrigées.
+        """
+        if rex_coeff != self._rex_coeff:
+            self._rex_coeff = rex_coeff
+            self._patch(self._roots, context)
+            return
+        nodes = [self._task_nodes[id(task)] for task in tasks if id(task) in self._task_nodes]
+        if not nodes:
+            return
+        # Parents à recalculer, du plus profond au plus haut
+        parents = {}
+        for node in nodes:
+            self._patch_task(node, context)
+            parent = node.parent
+            while parent is not None and id(parent) not in parents:
+                parents[id(parent)] = parent
+                parent = parent.parent
+        visibility_changed = False
+        for parent in sorted(parents.values(), key=lambda n: n.depth, reverse=True):
+            visibility_changed |= self._patch_group(parent)
+        if self._auto_resize and visibility_changed:
+            self.updateGeometry()
+
+    # ── Structure ───────────────────────────────────────────────────
+
+    @classmethod
+    def _tree_layout(cls, value: Any) -> Any:
+        """Signature de la structure de l'arbre (libellés et identité des tâches)."""
+        if isinstance(value, dict):
+            return tuple((label, cls._tree_layout(sub)) for label, sub in value.items())
+        if isinstance(value, list):
+            return tuple(id(task) for task in value if isinstance(task, AbstractTask))
+        return None
+
+    def _create_nodes(self, items: Dict[str, Any]):
+        """Recrée tous les items Qt et les noeuds persistants associés."""
+        self.clear()
+        self._task_nodes = {}
+        self._roots = [self._create_group(label, value, None) for label, value in items.items()]
+
+    def _create_group(self, label: str, value: Any, parent: "_SummaryNode | None") -> "_SummaryNode":
         item = QTreeWidgetItem([label, "", ""])
-        has_manual_category_override = False
-        
+        item.setFlags(Qt.ItemFlag.ItemIsEnabled)
+        node = _SummaryNode(item, parent)
         if parent is None:
             self.addTopLevelItem(item)
-            item.setFont(0, QFont("Arial", 11, QFont.Weight.Bold))
+            item.setFont(0, self._bold_font)
+            item.setFont(1, self._font)
+            item.setFont(2, self._bold_font)
         else:
-            parent.addChild(item)
+            parent.item.addChild(item)
 
-        # Calculer les heures selon le type
         if isinstance(value, dict):
-            base_total = 0.0
-            corrected_total = 0.0
-            for sub_label, subvalue in value.items():
-                sub_base, sub_corrected = self._add_node(sub_label, subvalue, item, context)
-                base_total += sub_base
-                corrected_total += sub_corrected
-            is_bold = parent is None
+            node.children = [self._create_group(sub_label, sub, node) for sub_label, sub in value.items()]
         elif isinstance(value, list):
-            base_total = 0.0
-            corrected_total = 0.0
-            for task in value:
-                if isinstance(task, AbstractTask):
-                    if task.category_override_hours is not None:
-                        has_manual_category_override = True
-                    task_base, task_corrected = self._add_task_node(task, item, context)
-                    base_total += task_base
-                    corrected_total += task_corrected
-            is_bold = parent is None
-        elif isinstance(value, AbstractTask):
-            return self._add_task_node(value, parent, context)
-        else:
-            return 0.0, 0.0
-        
+            node.children = [self._create_task(task, node) for task in value if isinstance(task, AbstractTask)]
+        return node
+
+    def _create_task(self, task: AbstractTask, parent: "_SummaryNode") -> "_SummaryNode":
+        item = QTreeWidgetItem([task.label, "", ""])
+        item.setData(0, Qt.ItemDataRole.UserRole, task)
+        item.setFlags(Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable)
+        parent.item.addChild(item)
+        node = _SummaryNode(item, parent, task)
+        self._task_nodes[id(task)] = node
+        return node
+
+    # ── Mise à jour des valeurs ─────────────────────────────────────
+
+    def _patch(self, nodes: List["_SummaryNode"], context: Dict[str, Any]):
+        """Recalcule récursivement des noeuds (tâches puis catégories)."""
+        for node in nodes:
+            if node.task is not None:
+                self._patch_task(node, context)
+            else:
+                self._patch(node.children, context)
+                self._patch_group(node)
+
+    def _patch_task(self, node: "_SummaryNode", context: Dict[str, Any]):
+        task, item = node.task, node.item
+        base_hours = task.effective_hours(context)
+        node.base = base_hours
+        node.corrected = base_hours * self._rex_coeff
+        # Cacher les tâches à 0h
+        item.setHidden(base_hours == 0)
+        if base_hours != 0:
+            item.setText(1, f"{base_hours:.2f} h")
+            item.setText(2, f"{node.corrected:.2f} h")
+
+        # Style pour les tâches modifiées manuellement
+        manual = task.manual_base_hours
+        if manual != node.manual:
+            node.manual = manual
+            if manual is not None:
+                item.setFont(1, self._bold_font)
+                item.setToolTip(1, f"Valeur manuelle: {manual:.2f}h (base)")
+            else:
+                item.setData(1, Qt.ItemDataRole.FontRole, None)
+                item.setData(1, Qt.ItemDataRole.ToolTipRole, None)
+
+    def _patch_group(self, node: "_SummaryNode") -> bool:
+        """Met à jour un noeud de catégorie à partir de ses enfants ; indique si sa visibilité a changé."""
+        item = node.item
+        base_total = 0.0
+        corrected_total = 0.0
+        has_manual_category_override = False
+        for child in node.children:
+            if child.task is not None and child.task.category_override_hours is not None:
+                has_manual_category_override = True
+            base_total += child.base
+            corrected_total += child.corrected
+        node.base = base_total
+        node.corrected = corrected_total
+
         # Masquer si aucune heure, sinon afficher
-        item.setFlags(Qt.ItemFlag.ItemIsEnabled)
-        if base_total == 0:
-            item.setHidden(True)
-        else:
+        was_hidden = item.isHidden()
+        item.setHidden(base_total == 0)
+        if base_total != 0:
             item.setText(1, f"{base_total:.2f} h")
             item.setText(2, f"{corrected_total:.2f} h")
-            if is_bold:
-                item.setFont(1, QFont("Arial", 11))
-                item.setFont(2, QFont("Arial", 11, QFont.Weight.Bold))
+
+        if has_manual_category_override != node.override:
+            node.override = has_manual_category_override
+            top_level = node.parent is None
             if has_manual_category_override:
-                item.setFont(0, QFont("Arial", 11, QFont.Weight.Bold))
-                item.setFont(1, QFont("Arial", 11, QFont.Weight.Bold))
+                item.setFont(0, self._bold_font)
+                item.setFont(1, self._bold_font)
                 item.setToolTip(1, "Valeur manuelle de categorie")
-        
-        return base_total, corrected_total
+            else:
+                if not top_level:
+                    item.setData(0, Qt.ItemDataRole.FontRole, None)
+                    item.setData(1, Qt.ItemDataRole.FontRole, None)
+                else:
+                    item.setFont(1, self._font)
+                item.setData(1, Qt.ItemDataRole.ToolTipRole, None)
+        return was_hidden != item.isHidden()
 
-    def _add_task_node(self, task: AbstractTask, parent: QTreeWidgetItem, context: Dict[str, Any]) -> tuple[float, float]:
-        """Ajoute un noeud de tâche et retourne (heures base, heures corrigées REX)."""
-        base_hours = task.effective_hours(context)
-        corrected_hours = base_hours * self._rex_coeff
 
-        # Cacher les tâches à 0h
-        if base_hours == 0:
-            return 0.0, 0.0
+class _SummaryNode:
+    """Noeud persistant de l'arbre récapitulatif : section, catégorie ou tâche."""
 
-        item = QTreeWidgetItem([task.label, f"{base_hours:.2f} h", f"{corrected_hours:.2f} h"])
-        item.setData(0, Qt.ItemDataRole.UserRole, task)
-        item.setFlags(Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable)
-        
-        # Style pour les tâches modifiées manuellement
-        if task.manual_base_hours is not None:
-            item.setFont(1, QFont("Arial", 11, QFont.Weight.Bold))
-            item.setToolTip(1, f"Valeur manuelle: {task.manual_base_hours:.2f}h (base)")
-        
-        if parent:
-            parent.addChild(item)
-        return base_hours, corrected_hours
+    __slots__ = ("item", "parent", "task", "children", "depth", "base", "corrected", "manual", "override")
+
+    def __init__(self, item: QTreeWidgetItem, parent: "_SummaryNode | None", task: AbstractTask | None = None):
+        self.item = item
+        self.parent = parent
+        self.task = task
+        self.children: List["_SummaryNode"] = []
+        self.depth = 0 if parent is None else parent.depth + 1
+        # Dernières valeurs affichées
+        self.base = 0.0
+        self.corrected = 0.0
+        self.manual: float | None = None
+        self.override = False
 
 
 class TabSummary(QWidget):
@@ -558,6 +654,7 @@ class TabSummaryController:
     def __init__(self, model: Model, view: TabSummary):
         self.model = model
         self.view = view
+        self._tree_generation = -1  # Génération du moteur d'heures affichée dans l'arbre
 
         # Connecter les signaux du model
         self.model.project_changed.connect(self._on_project_changed)
@@ -573,6 +670,7 @@ class TabSummaryController:
     def _rebuild_tree(self):
         """Reconstruit l'arbre récapitulatif avec le coefficient REX courant."""
         project = self.model.project
+        self._tree_generation, _ = project.hours.take_changes()
         tree_items = project.generate_summary_tree()
         nrc_items = {label: value for label, value in tree_items.items() if label != "Suivi"}
         rc_items = {"Suivi": tree_items.get("Suivi", [])}
@@ -583,6 +681,24 @@ class TabSummaryController:
         self.view.tree_rc.build_tree(rc_items, project.context(), rex_coeff=project.manual_rex_coeff, display_multiplier=rc_factor)
         self.view.update_rc_factor(project.quantity, rc_factor, rc_hours, rex_coeff=project.manual_rex_coeff)
 
+    def _update_tree(self):
+        """Met à jour l'arbre à partir des tâches modifiées depuis le dernier affichage.
+
+        L'arbre n'est reconstruit que si le moteur d'heures a été reconstruit entre-temps
+        (changement de contexte ou de structure du projet).
+        """
+        project = self.model.project
+        generation, changed = project.hours.take_changes()
+        if generation != self._tree_generation:
+            self._rebuild_tree()
+            return
+        context = project.context()
+        for tree in (self.view.tree_nrc, self.view.tree_rc):
+            tree.update_tasks(changed, context, rex_coeff=project.manual_rex_coeff)
+        rc_factor = project._compute_multi_machine_coeff(project.quantity)
+        rc_hours = project._compute_recurrent_hours()
+        self.view.update_rc_factor(project.quantity, rc_factor, rc_hours, rex_coeff=project.manual_rex_coeff)
+
     def _on_project_changed(self):
         """Appelé quand le projet change - reconstruit l'arbre."""
         self._rebuild_tree()
@@ -595,13 +711,15 @@ class TabSummaryController:
         # Mettre à jour les totaux (sync_rex_fields appellé en interne)
         self._update_totals()
     
-    def _on_data_updated(self):
-        """Appelé lors de modifications mineures (valeurs, checkboxes) - met à jour l'arbre."""
-        self._rebuild_tree()
-        self._update_totals()
+    def _on_data_updated(self, parts):
+        """Appelé (une fois par rafraîchissement) après des modifications mineures - met à jour l'arbre et les totaux."""
+        if Model.REFRESH_TREE in parts:
+            self._update_tree()
+        if Model.REFRESH_TOTALS in parts:
+            self._update_totals()
 
     def _update_totals(self):
-        """Recalcule et affiche tous les totaux."""
+        """Recalcule et affiche tous les totaux, délai d'étude compris."""
         project: Project = self.model.project
 
         n_machines_total = project.compute_n_machines_total()  # calcule aussi nrc/rc subtotals/totals
@@ -639,30 +757,28 @@ class TabSummaryController:
     def _on_divers_changed(self, percent: float):
         """Appelé quand le pourcentage divers change."""
         self.model.project.divers_percent = percent / 100
-        self._update_totals()
-        # Pas besoin d'émettre data_updated car c'est juste un changement de total
+        self.model.request_refresh(Model.REFRESH_TOTALS)
+        # Seuls les totaux changent : ni les tables ni l'arbre ne sont rafraîchis
 
     def _on_rex_coeff_changed(self, coeff: float):
         """Appelé quand le coefficient REX change — efface les heures manuelles."""
         self.model.project.manual_rex_coeff = coeff
         self.model.project.manual_rex_hours = None  # Le coeff devient maître
-        self._rebuild_tree()
-        self._update_totals()
+        self.model.request_refresh(Model.REFRESH_TREE, Model.REFRESH_TOTALS)
 
     def _on_rex_hours_changed(self, hours: float):
         """Appelé quand des heures REX sont saisies — dérive et stocke le coeff équivalent."""
+        self.model.flush_refresh()  # n_machines_total doit refléter les modifications en attente
         self.model.project.manual_rex_hours = hours
         n_machines = self.model.project.n_machines_total or 0
         if n_machines != 0:
             self.model.project.manual_rex_coeff = hours / n_machines
-        self._rebuild_tree()
-        self._update_totals()
+        self.model.request_refresh(Model.REFRESH_TREE, Model.REFRESH_TOTALS)
 
     def _on_rex_hours_cleared(self):
         """Appelé quand le champ heures REX est vidé — revient au calcul par coeff."""
         self.model.project.manual_rex_hours = None
-        self._rebuild_tree()
-        self._update_totals()
+        self.model.request_refresh(Model.REFRESH_TREE, Model.REFRESH_TOTALS)
 
     def _on_delai_settings_clicked(self):
         """Ouvre la popup de paramétrage du délai d'étude."""
@@ -678,4 +794,4 @@ class TabSummaryController:
             app_data.demarrage_mois = values["demarrage_mois"]
             app_data.n_projeteurs = values["n_projeteurs"]
             app_data.save_delai_params()
-            self._update_totals()
\ No newline at end of file
+            self.model.request_refresh(Model.REFRESH_TOTALS)
\ No newline at end of file
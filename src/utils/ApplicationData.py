@@ -1,12 +1,41 @@
 import json
 import os
+import pickle
 import sys
 from pathlib import Path
 import yaml
 from typing import Dict, List, Optional, Any
+from src.utils import Task, TaskArrays as TaskArraysModule
 from src.utils.Task import GeneralTask, LPDCDocument, Option, Calcul, Labo
+from src.utils.TaskArrays import TaskArrays
 
 class ApplicationData:
+    CATALOGUE_CACHE_VERSION = 1  # À incrémenter si le format des objets du catalogue change
+
+    @classmethod
+    def load(cls, config_path="config.yaml") -> "ApplicationData":
+        """Crée une ApplicationData prête à l'emploi (sort_raw_data inclus).
+
+        Le catalogue compilé est relu depuis le cache binaire tant qu'aucun fichier de datapaths
+        n'a changé (date de modification et taille) ; sinon les JSON sont relus et le cache réécrit.
+        """
+        app_data = cls.__new__(cls)
+        app_data.load_config(config_path)
+        config_attrs = set(app_data.__dict__)
+        key = app_data._catalogue_key()
+
+        catalogue = app_data._read_catalogue_cache(key)
+        if catalogue is not None:
+            app_data.__dict__.update(catalogue)
+            return app_data
+
+        app_data.__init__(config_path)
+        app_data.sort_raw_data()
+        app_data._write_catalogue_cache(key, {
+            attr: value for attr, value in app_data.__dict__.items() if attr not in config_attrs
+        })
+        return app_data
+
     def __init__(self, config_path="config.yaml"):
         self.load_config(config_path)
 
@@ -28,6 +57,8 @@ class ApplicationData:
         self.demarrage_mois: float = 0.5
 
         self.tasks: Dict[str, Dict[str, List[GeneralTask]]] = {} # Dict[category: Dict[sub-category: List[GeneralTask]]]
+        self.task_arrays: Optional[TaskArrays] = None # Tâches générales compilées en tableaux NumPy
+        self._shared: Dict[tuple, Any] = {} # Dictionnaires / listes de codes partagés entre tâches (cf. _share)
 
         self.calculs: List[Calcul] = []
         self.calcul_categories: Dict[str, str] = {} # Dict[code: label]
@@ -92,8 +123,29 @@ class ApplicationData:
         self.project_save_dir = self._resolve_path(config.get("project-save-dir"), base_dir)
         self.ortems_template_path = self._resolve_path(config.get("ortems-template-path"), base_dir)
         self.excel_report_template_path = self._resolve_path(config.get("excel-report-template-path"), base_dir)
-        self.rex_database_path = self._resolve_path(config.get("rex-database-path"), base_dir)
+        # Base REX : un classeur, un dossier, ou une liste de classeurs / dossiers
+        rex_path = config.get("rex-database-path")
+        if isinstance(rex_path, list):
+            self.rex_database_path = [self._resolve_path(path, base_dir) for path in rex_path]
+        else:
+            self.rex_database_path = self._resolve_path(rex_path, base_dir)
         self.quick_export_path = self._resolve_path(config.get("quick-export-path"), base_dir)
+        self.catalogue_cache_path = (self._resolve_path(config.get("catalogue-cache-path"), base_dir)
+                                     or os.path.join(self._default_cache_dir(), "catalogue.pickle"))
+        self.rex_cache_dir = (self._resolve_path(config.get("rex-cache-dir"), base_dir)
+                              or os.path.join(self._default_cache_dir(), "rex"))
+        # Stockage de la base REX : "excel" (classeurs chargés en mémoire) ou "sqlite"
+        self.rex_backend = str(config.get("rex-backend") or "excel").lower()
+        self.rex_sqlite_path = (self._resolve_path(config.get("rex-sqlite-path"), base_dir)
+                                or os.path.join(self._default_cache_dir(), "rex.sqlite"))
+
+        # Recherche REX par similarité (poids par critère, nombre de résultats)
+        similarity = config.get("rex-similarity") or {}
+        self.rex_similarity_weights = similarity.get("weights")
+        try:
+            self.rex_similarity_top_k = int(similarity.get("top-k", 50))
+        except (ValueError, TypeError):
+            self.rex_similarity_top_k = 50
 
         # Stylesheet
         stylesheet_path = self._resolve_path(ui.get("stylesheet", ""), base_dir)
@@ -105,6 +157,67 @@ class ApplicationData:
             except (FileNotFoundError, IOError):
                 pass
 
+    # ── Cache du catalogue compilé ──────────────────────────────────
+
+    @staticmethod
+    def _default_cache_dir() -> str:
+        """Dossier de cache local à l'utilisateur (et non sur le partage réseau)."""
+        root = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        return str(Path(root) / "ChiffrageHET")
+
+    def _catalogue_key(self) -> tuple:
+        """Identifie les sources du catalogue : fichiers de données et code qui construit les objets."""
+        stamps = []
+        for key, path in sorted(self.paths.items()):
+            stat = os.stat(path)
+            stamps.append((key, path, stat.st_mtime_ns, stat.st_size))
+        if getattr(sys, "frozen", False):
+            code_files = [sys.executable]
+        else:
+            code_files = [__file__, Task.__file__, TaskArraysModule.__file__]
+        for path in code_files:
+            stamps.append((path, os.stat(path).st_mtime_ns))
+        return (self.CATALOGUE_CACHE_VERSION, tuple(stamps))
+
+    def _read_catalogue_cache(self, key: tuple) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.catalogue_cache_path, 'rb') as f:
+                if pickle.load(f) != key:
+                    return None
+                return pickle.load(f)
+        except Exception:
+            # Cache absent, incomplet ou incompatible : on reconstruit
+            return None
+
+    def _write_catalogue_cache(self, key: tuple, catalogue: Dict[str, Any]):
+        path = self.catalogue_cache_path
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(catalogue, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Le cache n'est qu'une optimisation
+            pass
+
+    def _share(self, value):
+        """Instance partagée d'un dictionnaire {code: valeur} ou d'une liste de codes, avec codes internés.
+
+        Les tâches aux données identiques (coefficients, sélections...) référencent alors le même objet.
+        """
+        if isinstance(value, dict):
+            key = (dict, tuple(value.items()))
+            make = lambda: {sys.intern(code): v for code, v in value.items()}
+        else:
+            key = (list, tuple(value))
+            make = lambda: [sys.intern(code) for code in value]
+        shared = self._shared.get(key)
+        if shared is None:
+            shared = self._shared[key] = make()
+        return shared
+
     def sort_raw_data(self):
         """Trie les données brutes des json en listes d'objets. La logique de conversion est differente pour chaque type de données."""
         # 1. Données générales
@@ -151,14 +264,22 @@ class ApplicationData:
                     general_task = GeneralTask(
                         index=index,
                         label=label,
-                        base_hours_machine=base_hours_machine,
-                        coeff_type_affaire=coeff_type_affaire,
-                        coeff_secteur=coeff_secteur,
+                        base_hours_machine=self._share(base_hours_machine),
+                        coeff_type_affaire=self._share(coeff_type_affaire),
+                        coeff_secteur=self._share(coeff_secteur),
                         multiplicative=is_multiplicative,
-                        ortems_repartition=ortems_repartition
+                        ortems_repartition=self._share(ortems_repartition)
                     )
                     self.tasks[category][sub_category].append(general_task)
                     index += 1
+
+        self.task_arrays = TaskArrays(
+            tasks=[task for sub_categories in self.tasks.values() for tasks in sub_categories.values() for task in tasks],
+            products=[code for products in self.product.values() for code in products],
+            affaires=self.types_affaires.keys(),
+            secteurs=[code for sectors in self.secteurs.values() for code in sectors],
+            jobs=self.jobs.keys(),
+        )
         # 3. LPDC
         self.lpdc_coeff_secteur = self.raw_data["LPDC"]["coeff_secteur"]
         self.lpdc_coeff_affaire = self.raw_data["LPDC"]["coeff_affaire"]
@@ -172,8 +293,8 @@ class ApplicationData:
                 index=doc.get("index", 0),
                 label=doc.get("label", ""),
                 hours=doc.get("hours", 0.0),
-                applicable_pour=doc.get("applicable_pour", []),
-                secteur_obligatoire=doc.get("secteur_obligatoire", []),
+                applicable_pour=self._share(doc.get("applicable_pour", [])),
+                secteur_obligatoire=self._share(doc.get("secteur_obligatoire", [])),
                 option_possible=doc.get("option_possible", False)
             )
             self.lpdc_docs.append(document)
@@ -188,9 +309,9 @@ class ApplicationData:
             calculation = Calcul(
                 index=calc.get("index", 0),
                 label=calc.get("label", ""),
-                category=calc.get("category", ""),
-                hours=calc.get("hours", {}),
-                selection=calc.get("selection", {})
+                category=sys.intern(calc.get("category", "")),
+                hours=self._share(calc.get("hours", {})),
+                selection=self._share(calc.get("selection", {}))
             )
             self.calculs.append(calculation)
         
@@ -205,7 +326,7 @@ class ApplicationData:
                 option = Option(
                     index=option.get("index", 0),
                     label=option.get("label", ""),
-                    category=cat_id,
+                    category=sys.intern(cat_id),
                     hours=option.get("hours", 0.0)
                 )
                 self.options.append(option)
@@ -221,8 +342,8 @@ class ApplicationData:
                 index=item.get("index", 0),
                 label=item.get("label", ""),
                 hours=item.get("hours", 0.0),
-                category=item.get("category", ""),
-                coeff_secteur=item.get("coeff_secteur", {})
+                category=sys.intern(item.get("category", "")),
+                coeff_secteur=self._share(item.get("coeff_secteur", {}))
             )
             self.labo.append(labo_task)
 
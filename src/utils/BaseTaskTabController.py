@@ -1,5 +1,5 @@
-from typing import List, Optional
-from src.model import Model
+from typing import Callable, List, Optional, Tuple
+from src.model import Model, Project
 from src.utils.TabTasks import TabTasks, TaskTableWidget
 from src.utils.Task import AbstractTask
 
@@ -9,13 +9,21 @@ class BaseTaskTabController:
 
     Fournit la gestion commune des signaux (modification manuelle, checkbox)
     et la mise à jour des totaux. Les sous-classes doivent implémenter _build_tables().
+
+    Les modifications marquent les tables de l'onglet ; leur mise à jour est faite
+    une seule fois par rafraîchissement du modèle (Model.request_refresh).
     """
 
     def __init__(self, model: Model, view: TabTasks):
         self.model = model
         self.view = view
         self.tables: List[TaskTableWidget] = []
+        # Passes de mise à jour en attente, dans l'ordre des demandes (sans doublon consécutif)
+        self._pending_updates: List[Callable[[], None]] = []
+        # Tâches modifiées en attente de mise à jour : (table, index de tâche)
+        self._pending_tasks: List[Tuple[TaskTableWidget, int]] = []
         self.model.project_changed.connect(self._on_project_changed)
+        self.model.data_updated.connect(self._on_data_updated)
 
     def _build_tables(self) -> List[TaskTableWidget]:
         """Construit et retourne les tables à afficher."""
@@ -29,16 +37,14 @@ class BaseTaskTabController:
         table.checkbox_toggled.connect(
             lambda checked, ref, t=table: self._on_checkbox_toggle_in_table(t, checked, ref)
         )
-        table.category_correction_modified.connect(self._on_category_correction)
+        table.category_correction_modified.connect(
+            lambda cat_name, text, t=table: self._on_category_correction_in_table(t, cat_name, text)
+        )
 
     @staticmethod
     def _find_task_in_table(table: TaskTableWidget, ref: int) -> Optional[AbstractTask]:
         """Recherche une tâche par son index dans une table spécifique."""
-        for task_list in table.categories.values():
-            for task, _ in task_list:
-                if task.index == ref:
-                    return task
-        return None
+        return table.find_task(ref)
 
     @staticmethod
     def _correction_key(table: TaskTableWidget, cat_name: str) -> str:
@@ -63,6 +69,25 @@ class BaseTaskTabController:
             table.refresh()
         self.view.display_tables(self.tables)
 
+    def _request_tables_update(self, update: Optional[Callable[[], None]] = None):
+        """Planifie une passe sur les tables de l'onglet (_update_all_tables par défaut).
+
+        Les passes sont exécutées au prochain rafraîchissement du modèle ; une même
+        passe demandée plusieurs fois de suite n'est exécutée qu'une fois.
+        """
+        update = update or self._update_all_tables
+        if not self._pending_updates or self._pending_updates[-1] != update:
+            self._pending_updates.append(update)
+        self.model.request_refresh()
+
+    def _on_data_updated(self, parts):
+        """Exécute les passes en attente, une fois pour toutes les modifications regroupées."""
+        if Model.REFRESH_TABLES not in parts:
+            return
+        pending, self._pending_updates = self._pending_updates, []
+        for update in pending:
+            update()
+
     def _update_all_tables(self):
         """Met à jour le contexte, les heures par défaut et les totaux de toutes les tables."""
         context = self.model.project.context()
@@ -71,6 +96,30 @@ class BaseTaskTabController:
             self._apply_all_category_overrides(table)
             table.update_table()
 
+    def _request_task_update(self, table: TaskTableWidget, ref: int):
+        """Planifie la mise à jour de la seule catégorie d'une tâche modifiée."""
+        self._pending_tasks.append((table, ref))
+        self._request_tables_update(self._update_pending_tasks)
+
+    def _update_pending_tasks(self):
+        """Recalcule l'override et le total de la catégorie de chaque tâche modifiée."""
+        pending, self._pending_tasks = self._pending_tasks, []
+        for table, ref in dict.fromkeys(pending):
+            cat_name = table.category_of(ref)
+            if cat_name is None:
+                continue
+            tasks = [task for task, _ in table._sorted_tasks(table.categories[cat_name])]
+            Project.distribute_category_correction(tasks, table.category_corrections.get(cat_name), table.context)
+            table.update_task(ref)
+
+    def _refresh_all_tables(self):
+        """Recalcule les overrides de catégorie puis rafraîchit toutes les tables."""
+        context = self.model.project.context()
+        for table in self.tables:
+            table.context = context
+            self._apply_all_category_overrides(table)
+            table.refresh()
+
     def _on_manual_change_in_table(self, table: TaskTableWidget, text: str, ref: int):
         """Gère la modification manuelle d'une valeur d'heures dans une table spécifique."""
         task = self._find_task_in_table(table, ref)
@@ -86,68 +135,29 @@ class BaseTaskTabController:
             task.manual_base_hours = target_hours / coeff if coeff else None
         else:
             task.manual_base_hours = None
-        self._update_all_tables()
-        self.model.data_updated.emit()
+        self._request_task_update(table, ref)
 
     def _on_checkbox_toggle_in_table(self, table: TaskTableWidget, checked: bool, ref: int):
         """Gère le changement d'état d'une checkbox dans une table spécifique."""
         task = self._find_task_in_table(table, ref)
         if task and hasattr(task, 'is_selected'):
             task.is_selected = checked
-            self._update_all_tables()
-            self.model.data_updated.emit()
+            self._request_task_update(table, ref)
 
-    def _on_category_correction(self, cat_name: str, text: str):
+    def _on_category_correction_in_table(self, table: TaskTableWidget, cat_name: str, text: str):
         """Gère la modification d'une correction de catégorie et la persiste dans le projet."""
-        # Identifier quelle table a émis le signal
-        sender_table = None
-        for table in self.tables:
-            if cat_name in table.categories:
-                sender_table = table
-                break
-
-        if sender_table:
-            key = self._correction_key(sender_table, cat_name)
-            correction = sender_table.category_corrections.get(cat_name)
-            if correction is not None:
-                self.model.project.category_corrections[key] = correction
-            else:
-                self.model.project.category_corrections.pop(key, None)
-
-        # Recalculer les overrides puis rafraîchir les tables
-        context = self.model.project.context()
-        for table in self.tables:
-            table.context = context
-            self._apply_all_category_overrides(table)
-            table.refresh()
-        self.model.data_updated.emit()
+        key = self._correction_key(table, cat_name)
+        correction = table.category_corrections.get(cat_name)
+        if correction is not None:
+            self.model.project.category_corrections[key] = correction
+        else:
+            self.model.project.category_corrections.pop(key, None)
+
+        # Recalculer les overrides puis rafraîchir les tables (au prochain rafraîchissement)
+        self._request_tables_update(self._refresh_all_tables)
 
     def _apply_all_category_overrides(self, table: TaskTableWidget):
         """Recalcule les overrides de catégorie pour toutes les catégories d'une table."""
         for cat_name, task_list in table.categories.items():
-            correction = table.category_corrections.get(cat_name)
-            sorted_tasks = table._sorted_tasks(task_list)
-
-            if correction is None:
-                for task, _ in sorted_tasks:
-                    task.category_override_hours = None
-                continue
-
-            # Calculer les heures naturelles (sans corrections manuelles ni override)
-            natural = {}
-            for task, _ in sorted_tasks:
-                saved_manual = task.manual_base_hours
-                saved_override = task.category_override_hours
-                task.manual_base_hours = None
-                task.category_override_hours = None
-                natural[task] = task.effective_hours(table.context)
-                task.manual_base_hours = saved_manual
-                task.category_override_hours = saved_override
-
-            total = sum(natural.values())
-
-            for task, _ in sorted_tasks:
-                if total == 0:
-                    task.category_override_hours = 0.0
-                else:
-                    task.category_override_hours = (natural[task] / total) * correction
+            tasks = [task for task, _ in table._sorted_tasks(task_list)]
+            Project.distribute_category_correction(tasks, table.category_corrections.get(cat_name), table.context)
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
 import openpyxl
 from pathlib import Path
-from typing import List, Dict, Any, TYPE_CHECKING
+from typing import List, Dict, Any, Optional, Tuple, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
+    import numpy as np
     import pandas as pd
 
 # ── Noms de colonnes (correspondant aux en-têtes Excel) ──────────────
@@ -54,40 +58,268 @@ HIDDEN_COLUMNS = ["Heures projet"]
 PROJET_HOURS_COLUMNS = ["230ETELEC", "230ETMECA", "230ETMECNC", "230ETNQ",
                         "230ETREGU", "240RD", "240RDNC", "Total général"]
 
+# ── Recherche par similarité ─────────────────────────────────────────
+COL_SIMILARITE = "Similarité (%)"
+
+# Poids par défaut des critères (surchargés par rex-similarity dans config.yaml)
+SIMILARITY_WEIGHTS = {
+    COL_MW: 3.0, COL_KV: 2.0, COL_TR_MIN: 2.0, COL_DAL: 2.0, COL_LFER: 2.0,
+    COL_NB_POLES: 2.0, COL_HZ: 1.0, COL_COS_PHI: 1.0, COL_NB_ENCOCHES: 1.0,
+    COL_NBR_MACHINES: 0.5,
+    COL_TYPE_PRODUIT: 2.0, COL_PRODUIT: 3.0, COL_TYPE_AFFAIRE: 1.0, COL_SECTEUR: 1.0,
+}
+# Distance attribuée à une case vide (ni pénalisée comme un écart total, ni ignorée)
+SIMILARITY_MISSING = 0.5
+SIMILARITY_TOP_K = 50
+
+
+def similarity_criteria(filters: Dict[str, Any], weights: Optional[Dict[str, float]],
+                        available) -> Tuple[Dict[str, tuple], Dict[str, Any]]:
+    """Sépare les critères classés (poids > 0) des filtres stricts.
+
+    Renvoie ({champ: (poids, cible)}, {champ: valeur}) ; la cible est un float
+    pour les champs numériques, une chaîne pour les listes déroulantes.
+    """
+    weights = SIMILARITY_WEIGHTS if weights is None else weights
+    ranked, strict = {}, {}
+    for field, value in filters.items():
+        if value is None or (isinstance(value, str) and value.strip() in ("", "Tous")):
+            continue
+        weight = float(weights.get(field, 0) or 0)
+        if weight > 0 and field in available:
+            if field in DROPDOWN_FIELDS:
+                ranked[field] = (weight, str(value))
+                continue
+            if field in NUMERIC_FIELDS or field == COL_NB_POLES:
+                try:
+                    ranked[field] = (weight, float(value))
+                    continue
+                except (ValueError, TypeError):
+                    pass  # ex. NB POLES ">4" : filtre strict
+        strict[field] = value
+    return ranked, strict
+
+
+def criterion_distance(field: str, target, values: np.ndarray, empty: np.ndarray) -> np.ndarray:
+    """Distance (0 à 1) de chaque valeur à la cible pour un critère de similarité.
+
+    Listes déroulantes : 0 si identique, 1 sinon (cible None = inconnue de la base).
+    Numériques : écart relatif à la cible, plafonné à 1. Case vide : SIMILARITY_MISSING.
+    """
+    import numpy as np
+    if field in DROPDOWN_FIELDS:
+        if target is None:
+            d = np.ones(len(values))
+        else:
+            d = (values != target).astype(np.float64)
+    else:
+        scale = abs(target) if target else 1.0
+        with np.errstate(invalid="ignore"):
+            d = np.minimum(np.abs(values - target) / scale, 1.0)
+    d[empty] = SIMILARITY_MISSING
+    d[np.isnan(d)] = 1.0  # cible non finie
+    return d
+
+
+def top_k_positions(distance: np.ndarray, rows: np.ndarray, top_k: int) -> np.ndarray:
+    """Positions des *top_k* plus petites distances, triées (à égalité : ordre des lignes)."""
+    import numpy as np
+    k = min(top_k, len(rows))
+    best = np.argpartition(distance, k - 1)[:k] if 0 < k < len(rows) else np.arange(len(rows))
+    return best[np.lexsort((rows[best], distance[best]))]
+
+
+def _set_cell(df: pd.DataFrame, df_index: int, column: str, value):
+    """Écrit une cellule du DataFrame ; renvoie la valeur effectivement stockée."""
+    # Gérer l'incompatibilité de type (ex: string dans colonne float64)
+    import numpy as np
+    if df[column].dtype.kind in ("f", "i", "u"):
+        if value == "":
+            value = np.nan
+        elif isinstance(value, str):
+            df[column] = df[column].astype(object)
+    df.at[df_index, column] = value
+    return value
+
+
+def write_machine_cells(filepath: str, cells: Dict[Tuple[int, str], Any]) -> bool:
+    """Écrit des cellules {(ligne, colonne): valeur} dans la feuille Machines, en un enregistrement.
+
+    ligne : 0 = première machine ; colonne : nom interne (COL_*).
+    Renvoie False sans rien écrire si une colonne est absente du classeur :
+    les modifications restent alors en attente.
+    """
+    import numpy as np
+    try:
+        wb = openpyxl.load_workbook(filepath)
+        ws = wb["Machines"]
+        # Trouver l'index de la colonne dans le fichier (1-based, row 1 = header)
+        header_row = [cell.value for cell in ws[1]]
+        # La colonne Excel peut avoir un nom légèrement différent — correspondance exacte
+        _COL_TO_EXCEL = {v: k for k, v in RexSource._EXCEL_TO_COL.items()}
+        missing = sorted({column for _, column in cells
+                          if _COL_TO_EXCEL.get(column, column) not in header_row})
+        if missing:
+            print(f"Colonne(s) {', '.join(missing)} absente(s) de {os.path.basename(filepath)} : "
+                  "modifications non écrites")
+            wb.close()
+            return False
+        for (row, column), value in cells.items():
+            excel_col_name = _COL_TO_EXCEL.get(column, column)
+            col_idx = header_row.index(excel_col_name) + 1  # 1-based
+            row_idx = row + 2  # 1-based, +1 header +1 for 0-based
+            excel_value = None if (isinstance(value, float) and np.isnan(value)) else value
+            # ws.cell(..., value=None) ne vide pas la cellule : affectation explicite
+            ws.cell(row=row_idx, column=col_idx).value = excel_value
+        wb.save(filepath)
+        wb.close()
+    except Exception as e:
+        print(f"Erreur sauvegarde Excel : {e}")
+        return False
+    return True
 
-class MachineDatabase:
-    """Charge et interroge la base de machines à partir d'un fichier Excel."""
 
-    def __init__(self, filepath: str):
-        import pandas as pd
+class RexSource:
+    """Un classeur REX : tables normalisées, cache local et journal des modifications.
+
+    MachineDatabase fusionne une ou plusieurs sources ; une source dont le
+    fichier n'a pas changé n'est pas relue.
+    """
+
+    CACHE_VERSION = 2  # À incrémenter si la normalisation des tables change
+
+    def __init__(self, filepath: str, cache_dir: Optional[str] = None):
         self.filepath = filepath
-        self.df: pd.DataFrame = pd.DataFrame()
-        self.df_projets: pd.DataFrame = pd.DataFrame()
-        self.unique_values: Dict[str, List[str]] = {}
-        self._loaded = False
+        self.cache_dir = cache_dir
+        self.df: Optional[pd.DataFrame] = None
+        self.df_projets: Optional[pd.DataFrame] = None
+        self.edits: List[Dict[str, Any]] = []  # en attente d'écriture dans le classeur
+        self.conflict = False
+        self._stamp: Optional[Dict[str, Any]] = None
 
-    # ── Chargement ───────────────────────────────────────────────────
-    def load(self) -> bool:
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.filepath)
+
+    def refresh(self) -> bool:
+        """(Re)lit le classeur s'il a changé depuis le dernier chargement.
+
+        Renvoie True si les tables ont été (re)chargées, False si la source
+        était à jour. Les erreurs de lecture sont propagées.
+        """
         import pandas as pd
-        path = Path(self.filepath)
-        if not path.exists():
-            print(f"Fichier base machines non trouvé : {self.filepath}")
+        # Date du classeur chargé, pour détecter une écriture concurrente avant flush()
+        stamp = self._source_stamp()
+        if self.df is not None and stamp == self._stamp:
             return False
-        try:
+        if not self._read_cache():
             self.df = pd.read_excel(self.filepath, sheet_name="Machines")
             self._rename_columns()
             self._load_projets_sheet()
             self._normalize_ip()
-            self._extract_unique_values()
-            self._loaded = True
-            return True
-        except Exception as e:
-            print(f"Erreur lors du chargement de la base machines : {e}")
+            self._write_cache()
+        self._stamp = stamp
+        self._replay_journal()
+        return True
+
+    # ── Cache local (tables déjà normalisées) ────────────────────────
+    #
+    # <cache_dir>/<empreinte du chemin>.machines.feather   (ou .pickle sans pyarrow)
+    # <cache_dir>/<empreinte du chemin>.projets.feather
+    # <cache_dir>/<empreinte du chemin>.meta.json           taille, mtime, sha256 du classeur
+    #
+    # Le cache est valide si taille et mtime du classeur sont inchangés ; si seule
+    # la date diffère (copie du fichier), l'empreinte sha256 est recalculée et comparée.
+
+    def _cache_base(self) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        source = os.path.normcase(os.path.abspath(self.filepath))
+        return os.path.join(self.cache_dir, hashlib.sha1(source.encode("utf-8")).hexdigest()[:16])
+
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _source_stamp(self) -> Dict[str, Any]:
+        st = os.stat(self.filepath)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    @staticmethod
+    def _read_frame(base: str, fmt: str) -> pd.DataFrame:
+        import pandas as pd
+        if fmt == "feather":
+            return pd.read_feather(f"{base}.feather")
+        return pd.read_pickle(f"{base}.pickle")
+
+    @staticmethod
+    def _write_frame(df: pd.DataFrame, base: str) -> str:
+        """Écrit une table au format Feather si possible, sinon en pickle ; renvoie le format."""
+        try:
+            df.to_feather(f"{base}.feather")
+            return "feather"
+        except Exception:
+            # pyarrow absent ou colonne de types mixtes non représentable
+            df.to_pickle(f"{base}.pickle")
+            return "pickle"
+
+    def _read_cache(self) -> bool:
+        base = self._cache_base()
+        if base is None:
             return False
+        try:
+            with open(f"{base}.meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != self.CACHE_VERSION:
+                return False
+            stamp = self._source_stamp()
+            if stamp != meta["source"]:
+                if stamp["size"] != meta["source"]["size"] or self._file_hash(self.filepath) != meta["sha256"]:
+                    return False
+                # Contenu identique (fichier recopié) : on met à jour la date de référence
+                meta["source"] = stamp
+                self._write_meta(base, meta)
+            df = self._read_frame(f"{base}.machines", meta["formats"]["machines"])
+            df_projets = self._read_frame(f"{base}.projets", meta["formats"]["projets"])
+        except Exception:
+            return False
+        self.df = df
+        self.df_projets = df_projets
+        return True
+
+    def _write_cache(self):
+        """Enregistre les tables normalisées ; les erreurs d'écriture sont ignorées."""
+        base = self._cache_base()
+        if base is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # La méta-donnée est écrite en dernier : sans elle, les tables sont ignorées
+            if os.path.exists(f"{base}.meta.json"):
+                os.remove(f"{base}.meta.json")
+            meta = {
+                "version": self.CACHE_VERSION,
+                "source": self._source_stamp(),
+                "sha256": self._file_hash(self.filepath),
+                "formats": {
+                    "machines": self._write_frame(self.df, f"{base}.machines"),
+                    "projets": self._write_frame(self.df_projets, f"{base}.projets"),
+                },
+            }
+            self._write_meta(base, meta)
+        except Exception as e:
+            print(f"Cache de la base machines non enregistré : {e}")
 
-    @property
-    def is_loaded(self) -> bool:
-        return self._loaded and not self.df.empty
+    @staticmethod
+    def _write_meta(base: str, meta: Dict[str, Any]):
+        tmp_path = f"{base}.meta.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, f"{base}.meta.json")
 
     def _load_projets_sheet(self):
         """Charge la feuille Projets (heures par code job par projet)."""
@@ -130,6 +362,178 @@ class MachineDatabase:
             return str(v).strip()
         self.df[COL_IP] = self.df[COL_IP].apply(_to_ip_str)
 
+    # ── Journal des modifications ────────────────────────────────────
+    #
+    # Les modifications sont appliquées en mémoire et notées dans un journal
+    # local (<cache_dir>/<empreinte du chemin>.journal.jsonl) au fil de l'eau,
+    # puis écrites ensemble dans le classeur par flush() : un seul
+    # chargement / enregistrement du fichier Excel par lot. Un journal non vidé
+    # (application fermée avant l'écriture) est rejoué au chargement suivant.
+
+    def set_cell(self, row: int, column: str, value):
+        """Modifie une cellule (ligne du classeur, 0 = première machine) et la journalise."""
+        value = _set_cell(self.df, row, column, value)
+        edit = {"row": int(row), "column": column, "value": value}
+        self.edits.append(edit)
+        journal = self._journal_path()
+        if journal:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(journal, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(edit, ensure_ascii=False, default=str) + "\n")
+            except OSError as e:
+                print(f"Journal des modifications non enregistré : {e}")
+        return value
+
+    def _journal_path(self) -> Optional[str]:
+        base = self._cache_base()
+        return f"{base}.journal.jsonl" if base else None
+
+    def _replay_journal(self):
+        """Réapplique les modifications pas encore écrites dans le classeur (journal local,
+        ou à défaut celles gardées en mémoire) sur les tables qui viennent d'être chargées."""
+        edits, self.edits = self.edits, []
+        journal = self._journal_path()
+        if journal and os.path.exists(journal):
+            try:
+                with open(journal, "r", encoding="utf-8") as f:
+                    edits = [json.loads(line) for line in f if line.strip()]
+            except (OSError, ValueError) as e:
+                print(f"Journal des modifications illisible : {e}")
+        for edit in edits:
+            if edit["column"] in self.df.columns and edit["row"] in self.df.index:
+                edit["value"] = _set_cell(self.df, edit["row"], edit["column"], edit["value"])
+                self.edits.append(edit)
+
+    def flush(self) -> bool:
+        """Écrit les modifications en attente dans le classeur, en un seul enregistrement.
+
+        Si le fichier a été modifié depuis son chargement (autre utilisateur),
+        rien n'est écrit : conflict passe à True et les modifications restent
+        en attente. Un nouveau refresh() les réapplique sur la nouvelle version.
+        """
+        self.conflict = False
+        if not self.edits:
+            return True
+        if self._source_stamp() != self._stamp:
+            self.conflict = True
+            print(f"{self.name} modifié depuis son chargement : modifications non écrites")
+            return False
+
+        # Dernière valeur de chaque cellule
+        cells = {(edit["row"], edit["column"]): edit["value"] for edit in self.edits}
+        if not write_machine_cells(self.filepath, cells):
+            return False
+
+        self.edits = []
+        self._stamp = self._source_stamp()
+        journal = self._journal_path()
+        if journal and os.path.exists(journal):
+            os.remove(journal)
+        # Le classeur a changé : le cache reprend l'état en mémoire, déjà à jour
+        self._write_cache()
+        return True
+
+
+class MachineDatabase:
+    """Charge et interroge la base de machines à partir d'un ou plusieurs fichiers Excel.
+
+    *sources* : un chemin ou une liste de chemins, fichiers .xlsx ou dossiers
+    (tous les .xlsx du dossier). Les classeurs sont fusionnés en une seule
+    table ; chaque ligne garde la trace de son classeur d'origine (source_of).
+    """
+
+    def __init__(self, sources: Union[str, List[str]], cache_dir: Optional[str] = None):
+        import numpy as np
+        import pandas as pd
+        self.source_paths: List[str] = [sources] if isinstance(sources, str) else list(sources or [])
+        self.cache_dir = cache_dir
+        self.sources: Dict[str, RexSource] = {}
+        self.df: pd.DataFrame = pd.DataFrame()
+        self.df_projets: pd.DataFrame = pd.DataFrame()
+        self.unique_values: Dict[str, List[str]] = {}
+        self._loaded = False
+        # Origine de chaque ligne de self.df : numéro de source, ligne dans le classeur
+        self._row_source = np.zeros(0, dtype=np.intp)
+        self._row_local = np.zeros(0, dtype=np.intp)
+        self._build_search_columns()
+        self._build_project_indexes()
+        self.edit_conflict = False
+
+    # ── Chargement ───────────────────────────────────────────────────
+    def load(self) -> bool:
+        """Charge (ou recharge) toutes les sources.
+
+        Les classeurs inchangés depuis le chargement précédent ne sont pas
+        relus ; la fusion et les index ne sont refaits que si une source a
+        changé, est apparue ou a disparu.
+        """
+        files = self._resolve_sources()
+        if not files:
+            print(f"Fichier base machines non trouvé : {', '.join(map(str, self.source_paths))}")
+            return False
+        sources: Dict[str, RexSource] = {}
+        changed = False
+        for path in files:
+            source = self.sources.get(path) or RexSource(path, self.cache_dir)
+            try:
+                changed |= source.refresh()
+            except Exception as e:
+                print(f"Erreur lors du chargement de la base machines ({path}) : {e}")
+                continue
+            sources[path] = source
+        if not sources:
+            return False
+        changed |= list(sources) != list(self.sources)
+        self.sources = sources
+        if changed or not self._loaded:
+            self._merge()
+        self._loaded = True
+        return True
+
+    def _resolve_sources(self) -> List[str]:
+        """Liste les classeurs désignés par les sources (dossiers développés, ordre conservé)."""
+        files: List[str] = []
+        for source in self.source_paths:
+            if not source:
+                continue
+            if os.path.isdir(source):
+                files.extend(sorted(str(p) for p in Path(source).glob("*.xlsx") if not p.name.startswith("~$")))
+            elif os.path.exists(source):
+                files.append(str(source))
+            else:
+                print(f"Fichier base machines non trouvé : {source}")
+        return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+    def _merge(self):
+        """Fusionne les tables des sources et reconstruit valeurs de filtres et index."""
+        import numpy as np
+        import pandas as pd
+        sources = list(self.sources.values())
+        if len(sources) == 1:
+            # Source unique : la table est partagée, les modifications n'ont lieu qu'une fois
+            self.df = sources[0].df
+            self.df_projets = sources[0].df_projets
+        else:
+            self.df = pd.concat([s.df for s in sources], ignore_index=True)
+            self.df_projets = pd.concat([s.df_projets for s in sources], ignore_index=True)
+        lengths = [len(s.df) for s in sources]
+        self._row_source = np.repeat(np.arange(len(sources)), lengths)
+        self._row_local = np.concatenate([np.arange(n) for n in lengths]) if lengths else np.zeros(0, dtype=np.intp)
+        self.unique_values = {}
+        self._extract_unique_values()
+        self._build_search_columns()
+        self._build_project_indexes()
+
+    def source_of(self, df_index: int) -> Tuple[RexSource, int]:
+        """Source d'une ligne de self.df et numéro de la ligne dans son classeur."""
+        source = list(self.sources.values())[self._row_source[df_index]]
+        return source, int(self._row_local[df_index])
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded and not self.df.empty
+
     def _extract_unique_values(self):
         """Prépare les listes de valeurs uniques pour les filtres."""
         import pandas as pd
@@ -154,90 +558,345 @@ class MachineDatabase:
             self.unique_values["IP_first"]  = sorted({ip[0] for ip in ips if ip[0].isdigit()})
             self.unique_values["IP_second"] = sorted({ip[1] for ip in ips if ip[1].isdigit()})
 
+    # ── Colonnes de recherche pré-calculées ─────────────────────────
+    def _build_search_columns(self):
+        """Prépare, une fois pour toutes, les colonnes typées utilisées par search().
+
+        Pour chaque colonne filtrable : un masque des cellules vides (toujours
+        incluses) et une représentation directement comparable — texte en
+        minuscules, float64, année, chiffres IP ou codes de catégorie.
+        """
+        self._empty: Dict[str, np.ndarray] = {}
+        self._text: Dict[str, pd.Series] = {}
+        self._numbers: Dict[str, np.ndarray] = {}
+        self._ip_digits: Dict[str, np.ndarray] = {}
+        self._codes: Dict[str, np.ndarray] = {}
+        self._code_of: Dict[str, Dict[str, int]] = {}
+        self._sorted: Dict[str, tuple] = {}
+        self._trigrams: Dict[str, Dict[str, np.ndarray]] = {}
+        for col in STRING_FIELDS + NUMERIC_FIELDS + DROPDOWN_FIELDS + [COL_DATE, COL_NB_POLES, COL_IP]:
+            if col in self.df.columns:
+                self._build_search_column(col)
+
+    def _build_search_column(self, col: str):
+        import numpy as np
+        import pandas as pd
+        values = self.df[col]
+        if col in STRING_FIELDS:
+            as_str = values.astype(str)
+            self._empty[col] = (values.isna() | (as_str.str.strip() == "")).to_numpy(copy=True)
+            self._text[col] = as_str.str.lower()
+            self._trigrams[col] = self._build_trigram_index(self._text[col], self._empty[col])
+        elif col == COL_DATE:
+            years = pd.to_datetime(values, errors="coerce").dt.year.to_numpy(dtype=np.float64, copy=True)
+            self._empty[col] = np.isnan(years)
+            self._numbers[col] = years
+        elif col in NUMERIC_FIELDS or col == COL_NB_POLES:
+            numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, copy=True)
+            self._empty[col] = np.isnan(numbers)
+            self._numbers[col] = numbers
+            if col in NUMERIC_FIELDS:
+                # Index trié (valeurs non vides) + lignes vides, pour les recherches ± tolérance
+                filled = np.flatnonzero(~self._empty[col])
+                order = filled[np.argsort(numbers[filled], kind="stable")]
+                self._sorted[col] = (numbers[order], order, np.flatnonzero(self._empty[col]))
+        elif col == COL_IP:
+            ip_str = values.astype(str)
+            self._empty[col] = (values.isna() | ip_str.isin(["", "nan"])).to_numpy(copy=True)
+            self._ip_digits["IP_first"] = ip_str.str[0].to_numpy(dtype=object, copy=True)
+            self._ip_digits["IP_second"] = ip_str.str[1].to_numpy(dtype=object, copy=True)
+        elif col in DROPDOWN_FIELDS:
+            col_vals = values.astype(str).str.strip()
+            self._empty[col] = (values.isna() | col_vals.isin(["", "nan"])).to_numpy(copy=True)
+            codes, uniques = pd.factorize(col_vals)
+            self._codes[col] = codes
+            self._code_of[col] = {value: code for code, value in enumerate(uniques)}
+
+    def _update_search_row(self, col: str, row: int):
+        """Met à jour la ligne *row* des colonnes de recherche de *col* après
+        modification d'une cellule, sans reconstruire la colonne entière.
+
+        Même conversion que _build_search_column, appliquée à la seule ligne
+        modifiée ; les trigrammes et l'index trié sont corrigés sur place.
+        """
+        import numpy as np
+        import pandas as pd
+        values = self.df[col].iloc[row:row + 1]
+        was_empty = bool(self._empty[col][row])
+        if col in STRING_FIELDS:
+            as_str = values.astype(str)
+            empty = bool((values.isna() | (as_str.str.strip() == "")).iloc[0])
+            text = as_str.str.lower().iloc[0]
+            index = self._trigrams[col]
+            if not was_empty:
+                old = self._text[col].iat[row]
+                for gram in {old[i:i + 3] for i in range(len(old) - 2)}:
+                    rows = index[gram]
+                    rows = np.delete(rows, np.searchsorted(rows, row))
+                    if len(rows):
+                        index[gram] = rows
+                    else:
+                        del index[gram]
+            if not empty:
+                for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+                    rows = index.get(gram)
+                    if rows is None:
+                        index[gram] = np.array([row], dtype=np.intp)
+                    else:
+                        index[gram] = np.insert(rows, np.searchsorted(rows, row), row)
+            self._empty[col][row] = empty
+            self._text[col].iat[row] = text
+        elif col == COL_DATE:
+            year = pd.to_datetime(values, errors="coerce").dt.year.to_numpy(dtype=np.float64)[0]
+            self._empty[col][row] = np.isnan(year)
+            self._numbers[col][row] = year
+        elif col in NUMERIC_FIELDS or col == COL_NB_POLES:
+            number = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)[0]
+            old = self._numbers[col][row]
+            self._empty[col][row] = np.isnan(number)
+            self._numbers[col][row] = number
+            if col in NUMERIC_FIELDS:
+                # Retrait puis réinsertion à sa place (à valeur égale, par numéro de ligne)
+                sorted_values, order, empty_rows = self._sorted[col]
+
+                def position(number: float) -> int:
+                    lo = np.searchsorted(sorted_values, number, side="left")
+                    hi = np.searchsorted(sorted_values, number, side="right")
+                    return lo + np.searchsorted(order[lo:hi], row)
+
+                if was_empty:
+                    empty_rows = np.delete(empty_rows, np.searchsorted(empty_rows, row))
+                else:
+                    at = position(old)
+                    sorted_values, order = np.delete(sorted_values, at), np.delete(order, at)
+                if np.isnan(number):
+                    empty_rows = np.insert(empty_rows, np.searchsorted(empty_rows, row), row)
+                else:
+                    at = position(number)
+                    sorted_values, order = np.insert(sorted_values, at, number), np.insert(order, at, row)
+                self._sorted[col] = (sorted_values, order, empty_rows)
+        elif col == COL_IP:
+            ip_str = values.astype(str)
+            self._empty[col][row] = bool((values.isna() | ip_str.isin(["", "nan"])).iloc[0])
+            self._ip_digits["IP_first"][row] = ip_str.str[0].iloc[0]
+            self._ip_digits["IP_second"][row] = ip_str.str[1].iloc[0]
+        elif col in DROPDOWN_FIELDS:
+            col_vals = values.astype(str).str.strip()
+            self._empty[col][row] = bool((values.isna() | col_vals.isin(["", "nan"])).iloc[0])
+            key = col_vals.iloc[0]
+            code_of = self._code_of[col]
+            # Même codage que pd.factorize : -1 pour une valeur manquante
+            self._codes[col][row] = -1 if pd.isna(key) else code_of.setdefault(key, len(code_of))
+
+    @staticmethod
+    def _build_trigram_index(text: pd.Series, empty: np.ndarray) -> Dict[str, np.ndarray]:
+        """Index inversé trigramme → lignes (triées) contenant ce trigramme."""
+        import numpy as np
+        postings: Dict[str, List[int]] = {}
+        for row, value in enumerate(text):
+            if empty[row]:
+                continue
+            for gram in {value[i:i + 3] for i in range(len(value) - 2)}:
+                postings.setdefault(gram, []).append(row)
+        return {gram: np.array(rows, dtype=np.intp) for gram, rows in postings.items()}
+
     # ── Recherche ────────────────────────────────────────────────────
+    def _text_candidates(self, col: str, value: str) -> Optional[np.ndarray]:
+        """Lignes pouvant contenir *value* (à vérifier), cases vides comprises.
+
+        Renvoie None si le texte est trop court pour l'index (moins de 3 caractères).
+        """
+        import numpy as np
+        query = value.lower()
+        if len(query) < 3:
+            return None
+        index = self._trigrams[col]
+        grams = {query[i:i + 3] for i in range(len(query) - 2)}
+        postings = sorted((index.get(gram) for gram in grams),
+                          key=lambda rows: -1 if rows is None else len(rows))
+        if postings[0] is None:
+            rows = np.empty(0, dtype=np.intp)
+        else:
+            rows = postings[0]
+            for other in postings[1:]:
+                if not len(rows):
+                    break
+                rows = np.intersect1d(rows, other, assume_unique=True)
+        return np.union1d(rows, np.flatnonzero(self._empty[col]))
+
+    def _range_candidates(self, col: str, target: float, tolerance_percent: float) -> np.ndarray:
+        """Lignes (triées) dont la valeur est dans target ± tolérance, ou vide."""
+        import numpy as np
+        values, order, empty_rows = self._sorted[col]
+        tol  = abs(target) * tolerance_percent / 100.0
+        low, high = target - tol, target + tol
+        if not low <= high:  # bornes NaN (cible infinie) : seules les cases vides passent
+            return empty_rows
+        lo = np.searchsorted(values, low, side="left")
+        hi = np.searchsorted(values, high, side="right")
+        return np.sort(np.concatenate((order[lo:hi], empty_rows)))
+
+    def _matches(self, field: str, value, rows: np.ndarray, tolerance_percent: float) -> Optional[np.ndarray]:
+        """Évalue un filtre sur les lignes *rows* (cases vides incluses) ; None si le filtre est ignoré."""
+        import numpy as np
+        col = COL_IP if field in ("IP_first", "IP_second") else field
+
+        if field in STRING_FIELDS:
+            matches = self._text[col].iloc[rows].str.contains(
+                str(value).lower(), na=False, regex=False
+            ).to_numpy()
+
+        elif field == COL_DATE:
+            try:
+                matches = self._numbers[col][rows] == int(value)
+            except (ValueError, TypeError):
+                return None
+
+        elif field in NUMERIC_FIELDS:
+            try:
+                target = float(value)
+            except (ValueError, TypeError):
+                return None
+            col_num = self._numbers[col][rows]
+            tol     = abs(target) * tolerance_percent / 100.0
+            matches = (col_num >= target - tol) & (col_num <= target + tol)
+
+        elif field == COL_NB_POLES:
+            if value == ">4":
+                matches = self._numbers[col][rows] > 4
+            else:
+                try:
+                    matches = self._numbers[col][rows] == int(value)
+                except (ValueError, TypeError):
+                    return None
+
+        elif field in ("IP_first", "IP_second"):
+            if value == "x":
+                return None
+            matches = self._ip_digits[field][rows] == str(value)
+
+        elif field in DROPDOWN_FIELDS:
+            code = self._code_of[col].get(str(value))
+            if code is None:
+                matches = np.zeros(len(rows), dtype=bool)
+            else:
+                matches = self._codes[col][rows] == code
+
+        else:
+            return None
+
+        return self._empty[col][rows] | matches
+
     def search(self, filters: Dict[str, Any], tolerance_percent: float = 10.0) -> pd.DataFrame:
         """Filtre la base selon *filters*.
 
         Règle : si une cellule de la base est vide/NaN pour un champ filtré,
         la ligne n'est **pas** exclue (les cases vides sont toujours incluses).
+
+        Les filtres numériques (index triés) et textuels (index de trigrammes)
+        donnent des lignes candidates : le plus sélectif fixe le point de départ
+        et les autres filtres ne sont vérifiés que sur ces lignes.
         """
-        import pandas as pd
         if self.df.empty:
             return self.df.copy()
+        return self.df.iloc[self._filter_rows(filters, tolerance_percent)].reset_index(drop=True)
 
-        mask = pd.Series(True, index=self.df.index)
-
+    def _filter_rows(self, filters: Dict[str, Any], tolerance_percent: float) -> np.ndarray:
+        """Positions (croissantes) des lignes retenues par search()."""
+        import numpy as np
+        active = {}
+        candidates = []  # (lignes, champ, résultat exact ?)
         for field, value in filters.items():
             if value is None or (isinstance(value, str) and value.strip() in ("", "Tous")):
                 continue
-
-            # Déterminer la colonne réelle
             col = COL_IP if field in ("IP_first", "IP_second") else field
-            if col not in self.df.columns:
+            if col not in self._empty:
                 continue
-
-            if field in STRING_FIELDS:
-                is_empty = self.df[col].isna() | (self.df[col].astype(str).str.strip() == "")
-                matches  = self.df[col].astype(str).str.lower().str.contains(
-                    str(value).lower(), na=False, regex=False
-                )
-                mask &= is_empty | matches
-
-            elif field == COL_DATE:
-                dates    = pd.to_datetime(self.df[col], errors="coerce")
-                is_empty = dates.isna()
-                try:
-                    matches = dates.dt.year == int(value)
-                except (ValueError, TypeError):
-                    continue
-                mask &= is_empty | matches
-
-            elif field in NUMERIC_FIELDS:
+            if field in NUMERIC_FIELDS:
                 try:
                     target = float(value)
                 except (ValueError, TypeError):
                     continue
-                col_num  = pd.to_numeric(self.df[col], errors="coerce")
-                is_empty = col_num.isna()
-                tol      = abs(target) * tolerance_percent / 100.0
-                matches  = (col_num >= target - tol) & (col_num <= target + tol)
-                mask &= is_empty | matches
-
-            elif field == COL_NB_POLES:
-                col_num  = pd.to_numeric(self.df[col], errors="coerce")
-                is_empty = col_num.isna()
-                if value == ">4":
-                    matches = col_num > 4
-                else:
-                    try:
-                        matches = col_num == int(value)
-                    except (ValueError, TypeError):
-                        continue
-                mask &= is_empty | matches
-
-            elif field == "IP_first":
-                if value == "x":
-                    continue
-                ip_str   = self.df[col].astype(str)
-                is_empty = self.df[col].isna() | (ip_str.isin(["", "nan"]))
-                matches  = ip_str.str[0] == str(value)
-                mask &= is_empty | matches
-
-            elif field == "IP_second":
-                if value == "x":
-                    continue
-                ip_str   = self.df[col].astype(str)
-                is_empty = self.df[col].isna() | (ip_str.isin(["", "nan"]))
-                matches  = ip_str.str[1] == str(value)
-                mask &= is_empty | matches
-
-            elif field in DROPDOWN_FIELDS:
-                col_vals = self.df[col].astype(str).str.strip()
-                is_empty = self.df[col].isna() | col_vals.isin(["", "nan"])
-                matches  = col_vals == str(value)
-                mask &= is_empty | matches
+                candidates.append((self._range_candidates(field, target, tolerance_percent), field, True))
+            elif field in STRING_FIELDS:
+                rows = self._text_candidates(field, str(value))
+                if rows is not None:
+                    candidates.append((rows, field, False))
+            active[field] = value
+
+        if candidates:
+            rows, field, exact = min(candidates, key=lambda c: len(c[0]))
+            if exact:
+                del active[field]
+        else:
+            rows = np.arange(len(self.df))
+
+        # Filtres restants, du plus rapide au plus coûteux (texte en dernier)
+        for field in sorted(active, key=lambda f: f in STRING_FIELDS):
+            if not len(rows):
+                break
+            keep = self._matches(field, active[field], rows, tolerance_percent)
+            if keep is not None:
+                rows = rows[keep]
+        return rows
+
+    # ── Recherche par similarité ─────────────────────────────────────
+    def search_similar(self, filters: Dict[str, Any], top_k: int = 50,
+                       weights: Optional[Dict[str, float]] = None,
+                       tolerance_percent: float = 10.0) -> pd.DataFrame:
+        """Retourne les *top_k* machines les plus proches des critères, triées.
+
+        Chaque critère pondéré (poids > 0) contribue une distance entre 0 et 1 :
+        écart relatif à la valeur cherchée (plafonné à 1) pour les champs
+        numériques, 0/1 pour les listes déroulantes, SIMILARITY_MISSING pour une
+        case vide. Les critères sans poids restent des filtres stricts. La
+        colonne COL_SIMILARITE donne 100 × (1 − distance moyenne pondérée).
+        """
+        import numpy as np
+        if self.df.empty:
+            return self.df.copy()
+        ranked, strict = similarity_criteria(filters, weights, self._empty)
+
+        rows = self._filter_rows(strict, tolerance_percent)
+        distance = np.zeros(len(rows))
+        total_weight = 0.0
+        for field, (weight, target) in ranked.items():
+            if field in DROPDOWN_FIELDS:
+                values, target = self._codes[field][rows], self._code_of[field].get(target)
+            else:
+                values = self._numbers[field][rows]
+            distance += weight * criterion_distance(field, target, values, self._empty[field][rows])
+            total_weight += weight
+        if total_weight:
+            distance /= total_weight
+
+        best = top_k_positions(distance, rows, top_k)
+        result = self.df.iloc[rows[best]].reset_index(drop=True)
+        result.insert(0, COL_SIMILARITE, np.round((1.0 - distance[best]) * 100.0, 1))
+        return result
 
-        return self.df[mask].reset_index(drop=True)
+    # ── Index des projets ────────────────────────────────────────────
+    def _build_project_indexes(self):
+        """N° Projet (normalisé) → indices des machines, et → ligne de la feuille Projets."""
+        self._machines_by_project: Dict[str, List[int]] = {}
+        if COL_NUM_PROJET in self.df.columns:
+            ids = self.df[COL_NUM_PROJET].astype(str).str.strip()
+            for df_index, project_id in zip(self.df.index, ids):
+                self._machines_by_project.setdefault(project_id, []).append(df_index)
+        self._projets_row: Dict[str, int] = {}
+        if "Projet" in self.df_projets.columns:
+            for position, project_id in enumerate(self.df_projets["Projet"]):
+                self._projets_row.setdefault(project_id, position)
+
+    def _move_project_row(self, df_index: int, old_id: str, new_id: str):
+        """Met à jour l'index des machines après modification du N° Projet d'une ligne."""
+        import bisect
+        rows = self._machines_by_project.get(old_id)
+        if rows is not None and df_index in rows:
+            rows.remove(df_index)
+            if not rows:
+                del self._machines_by_project[old_id]
+        bisect.insort(self._machines_by_project.setdefault(new_id, []), df_index)
 
     # ── Données projet (double-clic) ─────────────────────────────────
     def get_project_machines(self, project_id: str) -> pd.DataFrame:
@@ -245,66 +904,72 @@ class MachineDatabase:
         import pandas as pd
         if self.df.empty or COL_NUM_PROJET not in self.df.columns:
             return pd.DataFrame()
-        mask = self.df[COL_NUM_PROJET].astype(str).str.strip() == project_id.strip()
-        return self.df[mask].reset_index(drop=True)
+        rows = self._machines_by_project.get(project_id.strip(), [])
+        return self.df.loc[rows].reset_index(drop=True)
 
     def get_project_hours(self, project_id: str) -> Dict[str, Any]:
         """Retourne les heures du projet (ventilation par code job)."""
         if self.df_projets.empty:
             return {}
-        row = self.df_projets[self.df_projets["Projet"] == project_id.strip()]
-        if row.empty:
+        position = self._projets_row.get(project_id.strip())
+        if position is None:
             return {}
         import pandas as pd
+        row = self.df_projets.iloc[position]
         result = {}
         for col in PROJET_HOURS_COLUMNS:
-            val = row.iloc[0][col]
+            val = row[col]
             result[col] = val if pd.notna(val) else 0.0
         return result
 
     # ── Modification d'une cellule ───────────────────────────────────
     def update_machine_cell(self, df_index: int, column: str, value) -> bool:
-        """Met à jour une cellule dans le DataFrame en mémoire ET dans le fichier Excel.
-        
+        """Met à jour une cellule en mémoire et l'ajoute au journal de sa source.
+
         df_index : index dans self.df (pas l'index du sous-DataFrame filtré).
+        L'écriture dans le fichier Excel est différée jusqu'à flush_edits().
         """
         if column not in self.df.columns:
             return False
-        # Gérer l'incompatibilité de type (ex: string dans colonne float64)
-        import numpy as np
-        if self.df[column].dtype.kind in ("f", "i", "u"):
-            if value == "":
-                value = np.nan
-            elif isinstance(value, str):
-                self.df[column] = self.df[column].astype(object)
-        # Mise à jour en mémoire
-        self.df.at[df_index, column] = value
-        # Mise à jour dans le fichier Excel
-        try:
-            wb = openpyxl.load_workbook(self.filepath)
-            ws = wb["Machines"]
-            # Trouver l'index de la colonne dans le fichier (1-based, row 1 = header)
-            header_row = [cell.value for cell in ws[1]]
-            # La colonne Excel peut avoir un nom légèrement différent — correspondance exacte
-            _COL_TO_EXCEL = {v: k for k, v in self._EXCEL_TO_COL.items()}
-            excel_col_name = _COL_TO_EXCEL.get(column, column)
-            if excel_col_name not in header_row:
-                wb.close()
-                return False
-            col_idx = header_row.index(excel_col_name) + 1  # 1-based
-            row_idx = df_index + 2  # 1-based, +1 header +1 for 0-based
-            excel_value = None if (isinstance(value, float) and np.isnan(value)) else value
-            ws.cell(row=row_idx, column=col_idx, value=excel_value)
-            wb.save(self.filepath)
-            wb.close()
-            return True
-        except Exception as e:
-            print(f"Erreur sauvegarde Excel : {e}")
+        source, row = self.source_of(df_index)
+        if column not in source.df.columns:
             return False
+        old_id = str(self.df.at[df_index, column]).strip() if column == COL_NUM_PROJET else None
+        dtype = self.df[column].dtype
+        value = source.set_cell(row, column, value)
+        if self.df is not source.df:
+            _set_cell(self.df, df_index, column, value)
+        if self.df[column].dtype != dtype:
+            # Type de colonne changé (ex : texte dans une colonne numérique) : les
+            # conversions des autres lignes peuvent changer, la colonne est reconstruite
+            self._build_search_column(column)
+        elif column in self._empty:
+            self._update_search_row(column, df_index)
+        if old_id is not None:
+            self._move_project_row(df_index, old_id, str(self.df.at[df_index, column]).strip())
+        return True
+
+    @property
+    def pending_edits(self) -> int:
+        return sum(len(source.edits) for source in self.sources.values())
+
+    def flush_edits(self) -> bool:
+        """Écrit les modifications en attente, un enregistrement par classeur modifié.
+
+        edit_conflict passe à True si un classeur a été modifié par ailleurs
+        depuis son chargement : ses modifications restent en attente, et
+        load() les réapplique sur la nouvelle version avant un nouvel essai.
+        """
+        ok = True
+        self.edit_conflict = False
+        for source in self.sources.values():
+            if source.edits and not source.flush():
+                ok = False
+                self.edit_conflict |= source.conflict
+        return ok
 
     def get_original_df_indices(self, project_id: str) -> list:
         """Retourne les indices du DataFrame principal pour un projet donné."""
         if self.df.empty or COL_NUM_PROJET not in self.df.columns:
             return []
-        mask = self.df[COL_NUM_PROJET].astype(str).str.strip() == project_id.strip()
-        return self.df[mask].index.tolist()
+        return list(self._machines_by_project.get(project_id.strip(), []))
@@ -0,0 +1,490 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, Union, TYPE_CHECKING
+
+from src.utils.MachineDatabase import (
+    MachineDatabase, RexSource,
+    STRING_FIELDS, NUMERIC_FIELDS, DROPDOWN_FIELDS,
+    PROJET_HOURS_COLUMNS, COL_NUM_PROJET, COL_DATE, COL_NB_POLES, COL_IP, COL_SIMILARITE,
+    similarity_criteria, criterion_distance, top_k_positions,
+    write_machine_cells, _set_cell,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SCHEMA_VERSION = 1
+
+# Colonnes filtrables : chacune a une colonne de recherche "__<nom>" (NULL = case vide)
+SEARCH_COLUMNS = STRING_FIELDS + NUMERIC_FIELDS + DROPDOWN_FIELDS + [COL_DATE, COL_NB_POLES, COL_IP]
+# Colonnes de recherche indexées (recherches par intervalle ou égalité)
+INDEXED_COLUMNS = NUMERIC_FIELDS + [COL_DATE, COL_NB_POLES]
+
+_ISO_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}")
+
+
+def _q(name: str) -> str:
+    """Nom de colonne SQL entre guillemets."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _key(col: str) -> str:
+    return _q("__" + col)
+
+
+def _to_sql(value):
+    """Valeur de cellule → valeur SQLite (NaN → NULL, dates → texte ISO)."""
+    import numpy as np
+    import pandas as pd
+    if isinstance(value, str):
+        return value
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _search_keys(col: str, values: pd.Series) -> list:
+    """Valeurs de la colonne de recherche de *col*, comme MachineDatabase._build_search_column :
+    texte en minuscules, float, année, IP ou valeur de liste ; None pour une case vide."""
+    import numpy as np
+    import pandas as pd
+    if col in STRING_FIELDS:
+        as_str = values.astype(str)
+        empty = (values.isna() | (as_str.str.strip() == "")).to_numpy()
+        keys = as_str.str.lower().tolist()
+    elif col == COL_DATE:
+        numbers = pd.to_datetime(values, errors="coerce").dt.year.to_numpy(dtype=np.float64)
+        empty, keys = np.isnan(numbers), numbers.tolist()
+    elif col in NUMERIC_FIELDS or col == COL_NB_POLES:
+        numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+        empty, keys = np.isnan(numbers), numbers.tolist()
+    elif col == COL_IP:
+        as_str = values.astype(str)
+        empty = (values.isna() | as_str.isin(["", "nan"])).to_numpy()
+        keys = as_str.tolist()
+    else:
+        as_str = values.astype(str).str.strip()
+        empty = (values.isna() | as_str.isin(["", "nan"])).to_numpy()
+        keys = as_str.tolist()
+    return [None if is_empty else key for key, is_empty in zip(keys, empty)]
+
+
+class SqliteMachineDatabase:
+    """Base REX stockée dans un fichier SQLite, à la place de MachineDatabase.
+
+    Mêmes arguments que MachineDatabase, plus *db_path*. Seule la partie de
+    son interface utilisée par l'onglet de recherche et le détail projet est
+    fournie (load, is_loaded, unique_values, search, search_similar,
+    get_project_machines, get_original_df_indices, get_project_hours,
+    update_machine_cell, pending_edits, flush_edits, edit_conflict) : il n'y
+    a pas de DataFrame df, les machines restant dans le fichier *db_path*.
+
+    Les classeurs sources sont importés dans la base au premier chargement,
+    puis de nouveau dès que l'un d'eux change ; sinon load() ne relit que les
+    méta-données. Les recherches sont des requêtes SQL sur des colonnes de
+    recherche indexées (cases vides = NULL, toujours incluses), les
+    modifications des UPDATE d'une seule ligne, notées dans la table edits
+    puis écrites dans les classeurs par flush_edits().
+    """
+
+    def __init__(self, sources: Union[str, List[str]], cache_dir: Optional[str] = None, *, db_path: str):
+        self.db_path = db_path
+        self.source_paths: List[str] = [sources] if isinstance(sources, str) else list(sources or [])
+        self.cache_dir = cache_dir
+        self.unique_values: Dict[str, List[str]] = {}
+        self.columns: List[str] = []
+        self.edit_conflict = False
+        self._dtypes: Dict[str, str] = {}
+        self._date_columns: List[str] = []      # colonnes objet contenant des dates
+        self._projets_dtypes: Dict[str, str] = {}
+        self._keys: List[str] = []              # colonnes filtrables présentes
+        self._sources: List[Dict[str, Any]] = []
+        self._count = 0
+        self._loaded = False
+        self._con: Optional[sqlite3.Connection] = None
+
+    # ── Connexion et méta-données ────────────────────────────────────
+    def _connect(self) -> sqlite3.Connection:
+        if self._con is None:
+            folder = os.path.dirname(self.db_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            # Chargement en arrière-plan (QThread), puis utilisation depuis l'interface
+            self._con = sqlite3.connect(self.db_path, check_same_thread=False)
+            with self._con:
+                self._con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+                self._con.execute("CREATE TABLE IF NOT EXISTS edits (id INTEGER PRIMARY KEY, "
+                                  "source TEXT, row INTEGER, column TEXT, value TEXT)")
+        return self._con
+
+    def _read_meta(self) -> Dict[str, Any]:
+        return {key: json.loads(value) for key, value in self._con.execute("SELECT key, value FROM meta")}
+
+    def _write_meta(self, **values):
+        self._con.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              [(key, json.dumps(value, ensure_ascii=False)) for key, value in values.items()])
+
+    def _apply_meta(self, meta: Dict[str, Any]):
+        self.columns = [c["name"] for c in meta["columns"]]
+        self._dtypes = {c["name"]: c["dtype"] for c in meta["columns"]}
+        self._date_columns = [c["name"] for c in meta["columns"] if c.get("dates")]
+        self._projets_dtypes = {c["name"]: c["dtype"] for c in meta["projets_columns"]}
+        self._keys = meta["keys"]
+        self._sources = meta["sources"]
+        self.unique_values = meta["unique_values"]
+        self._count = self._con.execute("SELECT COUNT(*) FROM machines").fetchone()[0]
+
+    @staticmethod
+    def _stamp(path: str) -> Dict[str, Any]:
+        st = os.stat(path)
+        return {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    # ── Chargement (import des classeurs) ────────────────────────────
+    def load(self) -> bool:
+        """Ouvre la base SQLite, en important les classeurs s'ils ont changé depuis le dernier import.
+
+        Les modifications pas encore écrites dans les classeurs (table edits)
+        sont réappliquées après un nouvel import.
+        """
+        bridge = MachineDatabase(self.source_paths, self.cache_dir)
+        files = bridge._resolve_sources()
+        if not files:
+            print(f"Fichier base machines non trouvé : {', '.join(map(str, self.source_paths))}")
+            return False
+        try:
+            self._connect()
+            meta = self._read_meta()
+            if meta.get("version") != SCHEMA_VERSION or meta.get("sources") != [self._stamp(f) for f in files]:
+                if not bridge.load():
+                    return False
+                self._import(bridge)
+                meta = self._read_meta()
+                self._apply_meta(meta)
+                self._replay_edits()
+            else:
+                self._apply_meta(meta)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Erreur de la base SQLite REX ({self.db_path}) : {e}")
+            return False
+        self._loaded = True
+        return True
+
+    def _import(self, bridge: MachineDatabase):
+        """Remplace les tables machines et projets par le contenu des classeurs chargés."""
+        df, df_projets = bridge.df, bridge.df_projets
+        columns = list(df.columns)
+        keys = [col for col in SEARCH_COLUMNS if col in columns]
+        with self._con:
+            self._con.execute("DROP TABLE IF EXISTS machines")
+            self._con.execute("DROP TABLE IF EXISTS projets")
+            definitions = ['"__id" INTEGER PRIMARY KEY', '"__source" INTEGER', '"__row" INTEGER', '"__projet" TEXT']
+            definitions += [_q(col) for col in columns] + [_key(col) for col in keys]
+            self._con.execute(f"CREATE TABLE machines ({', '.join(definitions)})")
+            projets = list(df_projets.columns) or ["Projet"]
+            self._con.execute(f"CREATE TABLE projets ({', '.join(_q(col) for col in projets)})")
+
+            if COL_NUM_PROJET in columns:
+                project_ids = df[COL_NUM_PROJET].astype(str).str.strip().tolist()
+            else:
+                project_ids = [None] * len(df)
+            values = [[_to_sql(v) for v in df[col]] for col in columns]
+            search = [_search_keys(col, df[col]) for col in keys]
+            rows = zip(df.index.tolist(), bridge._row_source.tolist(), bridge._row_local.tolist(),
+                       project_ids, *values, *search)
+            placeholders = ", ".join("?" * (4 + len(columns) + len(keys)))
+            self._con.executemany(f"INSERT INTO machines VALUES ({placeholders})", rows)
+            if len(df_projets.columns):
+                self._con.executemany(
+                    f"INSERT INTO projets VALUES ({', '.join('?' * len(projets))})",
+                    zip(*[[_to_sql(v) for v in df_projets[col]] for col in projets]))
+
+            self._con.execute('CREATE INDEX machines_projet ON machines("__projet")')
+            for i, col in enumerate(INDEXED_COLUMNS):
+                if col in keys:
+                    self._con.execute(f"CREATE INDEX machines_k{i} ON machines({_key(col)})")
+            if "Projet" in projets:
+                self._con.execute('CREATE INDEX projets_projet ON projets("Projet")')
+
+            self._write_meta(
+                version=SCHEMA_VERSION,
+                columns=[{"name": col, "dtype": str(df[col].dtype),
+                          "dates": bool(df[col].map(lambda v: isinstance(v, datetime)).any())}
+                         for col in columns],
+                projets_columns=[{"name": col, "dtype": str(df_projets[col].dtype)} for col in df_projets.columns],
+                keys=keys,
+                sources=[self._stamp(path) for path in bridge.sources],
+                unique_values=bridge.unique_values,
+            )
+
+    def _replay_edits(self):
+        """Réapplique les modifications en attente sur les tables qui viennent d'être importées."""
+        paths = [source["path"] for source in self._sources]
+        edits = self._con.execute("SELECT id, source, row, column, value FROM edits ORDER BY id").fetchall()
+        with self._con:
+            for edit_id, path, row, column, value in edits:
+                found = None
+                if path in paths:
+                    found = self._con.execute('SELECT "__id" FROM machines WHERE "__source" = ? AND "__row" = ?',
+                                              (paths.index(path), row)).fetchone()
+                if found is None or self._write_cell(found[0], column, json.loads(value)) is None:
+                    self._con.execute("DELETE FROM edits WHERE id = ?", (edit_id,))
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded and self._count > 0
+
+    # ── Lecture ──────────────────────────────────────────────────────
+    def _frame(self, rows: list, columns: List[str], dtypes: Dict[str, str]) -> pd.DataFrame:
+        """Reconstruit un DataFrame avec les types d'origine à partir de lignes SQL."""
+        import numpy as np
+        import pandas as pd
+        df = pd.DataFrame.from_records(rows, columns=columns) if rows else pd.DataFrame(columns=columns)
+        for col in columns:
+            values = df[col]
+            if col in self._date_columns:
+                values = values.map(lambda v: datetime.fromisoformat(v)
+                                    if isinstance(v, str) and _ISO_DATETIME.match(v) else v)
+            if dtypes[col] == "object":
+                values = values.astype(object)
+                df[col] = values.where(values.notna(), np.nan)
+            else:
+                df[col] = values.astype(dtypes[col])
+        return df
+
+    def _select_machines(self, condition: str = "", params: tuple = ()) -> pd.DataFrame:
+        columns = ", ".join(_q(col) for col in self.columns)
+        rows = self._con.execute(f'SELECT {columns} FROM machines{condition} ORDER BY "__id"', params).fetchall()
+        return self._frame(rows, self.columns, self._dtypes)
+
+    # ── Recherche ────────────────────────────────────────────────────
+    def _where(self, filters: Dict[str, Any], tolerance_percent: float) -> Tuple[str, list]:
+        """Clause WHERE équivalente aux filtres de MachineDatabase.search() (cases vides incluses)."""
+        clauses, params = [], []
+        for field, value in filters.items():
+            if value is None or (isinstance(value, str) and value.strip() in ("", "Tous")):
+                continue
+            col = COL_IP if field in ("IP_first", "IP_second") else field
+            if col not in self._keys:
+                continue
+            key = _key(col)
+            try:
+                if field in STRING_FIELDS:
+                    condition, args = f"instr({key}, ?) > 0", [str(value).lower()]
+                elif field == COL_DATE:
+                    condition, args = f"{key} = ?", [int(value)]
+                elif field in NUMERIC_FIELDS:
+                    target = float(value)
+                    tol = abs(target) * tolerance_percent / 100.0
+                    condition, args = f"{key} BETWEEN ? AND ?", [target - tol, target + tol]
+                elif field == COL_NB_POLES:
+                    if value == ">4":
+                        condition, args = f"{key} > 4", []
+                    else:
+                        condition, args = f"{key} = ?", [int(value)]
+                elif field in ("IP_first", "IP_second"):
+                    if value == "x":
+                        continue
+                    position = 1 if field == "IP_first" else 2
+                    condition, args = f"substr({key}, {position}, 1) = ?", [str(value)]
+                elif field in DROPDOWN_FIELDS:
+                    condition, args = f"{key} = ?", [str(value)]
+                else:
+                    continue
+            except (ValueError, TypeError):
+                continue
+            clauses.append(f"({key} IS NULL OR {condition})")
+            params.extend(args)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def search(self, filters: Dict[str, Any], tolerance_percent: float = 10.0) -> pd.DataFrame:
+        """Filtre la base selon *filters* (mêmes règles que MachineDatabase.search)."""
+        where, params = self._where(filters, tolerance_percent)
+        return self._select_machines(where, tuple(params))
+
+    def search_similar(self, filters: Dict[str, Any], top_k: int = 50,
+                       weights: Optional[Dict[str, float]] = None,
+                       tolerance_percent: float = 10.0) -> pd.DataFrame:
+        """Retourne les *top_k* machines les plus proches (mêmes règles que MachineDatabase.search_similar).
+
+        Les filtres stricts sont appliqués en SQL ; seules les colonnes de
+        recherche des critères classés sont lues pour calculer les distances.
+        """
+        import numpy as np
+        ranked, strict = similarity_criteria(filters, weights, self._keys)
+        where, params = self._where(strict, tolerance_percent)
+        selected = "".join(f", {_key(field)}" for field in ranked)
+        found = self._con.execute(f'SELECT "__id"{selected} FROM machines{where} ORDER BY "__id"', params).fetchall()
+        ids = np.array([row[0] for row in found], dtype=np.intp)
+
+        distance = np.zeros(len(found))
+        total_weight = 0.0
+        for i, (field, (weight, target)) in enumerate(ranked.items(), start=1):
+            raw = [row[i] for row in found]
+            if field in DROPDOWN_FIELDS:
+                values = np.array(raw, dtype=object)
+                empty = np.array([value is None for value in raw], dtype=bool)
+            else:
+                values = np.array([np.nan if value is None else value for value in raw], dtype=np.float64)
+                empty = np.isnan(values)
+            distance += weight * criterion_distance(field, target, values, empty)
+            total_weight += weight
+        if total_weight:
+            distance /= total_weight
+
+        best = top_k_positions(distance, ids, top_k)
+        columns = ", ".join(_q(col) for col in self.columns)
+        rows = {row[0]: row[1:] for row in self._con.execute(
+            f'SELECT "__id", {columns} FROM machines WHERE "__id" IN (SELECT value FROM json_each(?))',
+            (json.dumps(ids[best].tolist()),))}
+        result = self._frame([rows[i] for i in ids[best].tolist()], self.columns, self._dtypes)
+        result.insert(0, COL_SIMILARITE, np.round((1.0 - distance[best]) * 100.0, 1))
+        return result
+
+    # ── Données projet (double-clic) ─────────────────────────────────
+    def get_project_machines(self, project_id: str) -> pd.DataFrame:
+        """Retourne toutes les machines appartenant au même projet."""
+        import pandas as pd
+        if COL_NUM_PROJET not in self.columns:
+            return pd.DataFrame()
+        return self._select_machines(' WHERE "__projet" = ?', (project_id.strip(),))
+
+    def get_original_df_indices(self, project_id: str) -> list:
+        """Retourne les indices des machines d'un projet (clé primaire de la table machines)."""
+        rows = self._con.execute('SELECT "__id" FROM machines WHERE "__projet" = ? ORDER BY "__id"',
+                                 (project_id.strip(),))
+        return [row[0] for row in rows]
+
+    def get_project_hours(self, project_id: str) -> Dict[str, Any]:
+        """Retourne les heures du projet (ventilation par code job)."""
+        if "Projet" not in self._projets_dtypes:
+            return {}
+        columns = ", ".join(_q(col) for col in PROJET_HOURS_COLUMNS)
+        row = self._con.execute(f'SELECT {columns} FROM projets WHERE "Projet" = ? ORDER BY rowid LIMIT 1',
+                                (project_id.strip(),)).fetchone()
+        if row is None:
+            return {}
+        return {col: 0.0 if val is None else val for col, val in zip(PROJET_HOURS_COLUMNS, row)}
+
+    # ── Modification d'une cellule ───────────────────────────────────
+    def _write_cell(self, df_index: int, column: str, value) -> Optional[Tuple[str, int, Any]]:
+        """UPDATE d'une cellule et de ses colonnes de recherche.
+
+        Renvoie (classeur, ligne dans le classeur, valeur stockée), ou None si
+        la cellule n'existe pas ou si la valeur est incompatible avec la colonne.
+        """
+        if column not in self._dtypes:
+            return None
+        found = self._con.execute(f'SELECT "__source", "__row", {_q(column)} FROM machines WHERE "__id" = ?',
+                                  (df_index,)).fetchone()
+        if found is None:
+            return None
+        source, row, current = found
+        # Même conversion que le DataFrame en mémoire (ex. "" → NaN dans une colonne numérique)
+        cell = self._frame([(current,)], [column], self._dtypes)
+        try:
+            value = _set_cell(cell, 0, column, value)
+        except (TypeError, ValueError) as e:
+            print(f"Valeur refusée pour '{column}' : {e}")
+            return None
+
+        assignments, params = [f"{_q(column)} = ?"], [_to_sql(value)]
+        if column in self._keys:
+            assignments.append(f"{_key(column)} = ?")
+            params.append(_search_keys(column, cell[column])[0])
+        if column == COL_NUM_PROJET:
+            assignments.append('"__projet" = ?')
+            params.append(str(cell.at[0, column]).strip())
+        self._con.execute(f'UPDATE machines SET {", ".join(assignments)} WHERE "__id" = ?', (*params, df_index))
+        dtype = str(cell[column].dtype)
+        if dtype != self._dtypes[column]:
+            # La colonne change de type (ex. texte saisi dans une colonne numérique)
+            self._dtypes[column] = dtype
+            meta = self._read_meta()
+            for description in meta["columns"]:
+                if description["name"] == column:
+                    description["dtype"] = dtype
+            self._write_meta(columns=meta["columns"])
+        return self._sources[source]["path"], row, value
+
+    def update_machine_cell(self, df_index: int, column: str, value) -> bool:
+        """Met à jour une cellule (un UPDATE) et note la modification dans la table edits.
+
+        L'écriture dans le fichier Excel est différée jusqu'à flush_edits().
+        """
+        with self._con:
+            written = self._write_cell(df_index, column, value)
+            if written is None:
+                return False
+            path, row, value = written
+            self._con.execute("INSERT INTO edits (source, row, column, value) VALUES (?, ?, ?, ?)",
+                              (path, row, column, json.dumps(value, ensure_ascii=False, default=str)))
+        return True
+
+    @property
+    def pending_edits(self) -> int:
+        if self._con is None:
+            return 0
+        return self._con.execute("SELECT COUNT(*) FROM edits").fetchone()[0]
+
+    def flush_edits(self) -> bool:
+        """Écrit les modifications en attente, un enregistrement par classeur modifié.
+
+        edit_conflict passe à True si un classeur a été modifié par ailleurs
+        depuis son import : ses modifications restent en attente, et load()
+        les réapplique sur la nouvelle version avant un nouvel essai.
+        """
+        ok = True
+        self.edit_conflict = False
+        if self._con is None:
+            return ok
+        cells: Dict[str, Dict[Tuple[int, str], Any]] = {}
+        for path, row, column, value in self._con.execute(
+                "SELECT source, row, column, value FROM edits ORDER BY id"):
+            # Dernière valeur de chaque cellule
+            cells.setdefault(path, {})[(row, column)] = json.loads(value)
+        for i, source in enumerate(self._sources):
+            path = source["path"]
+            if path not in cells:
+                continue
+            if not os.path.exists(path) or self._stamp(path) != source:
+                print(f"{os.path.basename(path)} modifié depuis son import : modifications non écrites")
+                self.edit_conflict = True
+                ok = False
+                continue
+            if not write_machine_cells(path, cells[path]):
+                ok = False
+                continue
+            # Le classeur a maintenant le contenu de la base : pas de nouvel import
+            self._sources[i] = self._stamp(path)
+            with self._con:
+                self._con.execute("DELETE FROM edits WHERE source = ?", (path,))
+                self._write_meta(sources=self._sources)
+        return ok
+
+    # ── Export ───────────────────────────────────────────────────────
+    def export_workbook(self, filepath: str) -> bool:
+        """Écrit le contenu de la base dans un classeur au format de REX_HET.xlsx (feuilles Machines et Projets)."""
+        import pandas as pd
+        to_excel = {v: k for k, v in RexSource._EXCEL_TO_COL.items()}
+        projets_columns = list(self._projets_dtypes)
+        try:
+            machines = self._select_machines()
+            rows = self._con.execute(
+                f"SELECT {', '.join(_q(col) for col in projets_columns) or 'NULL'} FROM projets ORDER BY rowid")
+            projets = self._frame(rows.fetchall() if projets_columns else [], projets_columns, self._projets_dtypes)
+            with pd.ExcelWriter(filepath, engine="openpyxl") as writer:
+                machines.rename(columns=to_excel).to_excel(writer, sheet_name="Machines", index=False)
+                projets.to_excel(writer, sheet_name="Projets", index=False)
+        except Exception as e:
+            print(f"Erreur lors de l'export de la base REX : {e}")
+            return False
+        return True
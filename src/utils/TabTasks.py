@@ -1,15 +1,376 @@
 from typing import Any, Dict, List, Optional, Tuple
-from PyQt6.QtCore import Qt, QSize, pyqtSignal
+from PyQt6.QtCore import Qt, QSize, QEvent, QModelIndex, QAbstractTableModel, pyqtSignal
 from PyQt6.QtGui import QColor, QBrush, QFont
-from PyQt6.QtWidgets import (QTableWidget, QTableWidgetItem, QHeaderView, QLabel,
-                             QVBoxLayout, QAbstractItemView, QCheckBox, QLineEdit,
-                             QHBoxLayout, QSizePolicy, QWidget, QScrollArea, QFrame)
+from PyQt6.QtWidgets import (QTableView, QHeaderView, QLabel, QApplication, QStyle,
+                             QVBoxLayout, QAbstractItemView, QLineEdit, QStyledItemDelegate,
+                             QStyleOptionViewItem, QHBoxLayout, QSizePolicy, QWidget, QScrollArea, QFrame)
 from src.utils.Task import AbstractTask
 
 
-class TaskTableWidget(QTableWidget):
-    """Widget de tableau unifié : chaque ligne a une checkbox (grisée si obligatoire, active si optionnelle)."""
-    
+def _fmt_hours(hours: float) -> str:
+    """Formate un nombre d'heures (2 décimales, sans zéros inutiles)."""
+    return f"{hours:.2f}".rstrip("0").rstrip(".")
+
+
+class TaskTableModel(QAbstractTableModel):
+    """Lignes d'un tableau de tâches : en-têtes de catégorie, puis tâches des catégories dépliées.
+
+    Les cellules sont calculées à la demande depuis les tâches (état du
+    projet) et le contexte. Le modèle garde l'état propre à l'affichage :
+    catégories repliées, totaux des catégories et texte saisi dans les
+    corrections manuelles.
+    """
+
+    manual_value_modified = pyqtSignal(str, int)  # (text, ref)
+    checkbox_toggled = pyqtSignal(bool, int)  # (is_checked, ref)
+    category_correction_modified = pyqtSignal(str, str)  # (category_name, text)
+
+    COL_CHOICE, COL_REF, COL_LABEL, COL_BASE, COL_FINAL, COL_CORRECTION = range(6)
+    GRAY = QColor("#ecf0f1")
+
+    def __init__(self, task_type: str, parent=None):
+        super().__init__(parent)
+        self.columns = ["Choix", "Ref", task_type, "Base", "Heures finales", "Correction"]
+        self.context: Dict[str, Any] = {}
+        # category_name -> List[(task, mandatory)]
+        self.categories: Dict[str, List[Tuple[AbstractTask, bool]]] = {}
+        self.category_corrections: Dict[str, Optional[float]] = {}
+        self.collapsed: Dict[str, bool] = {}
+
+        # Lignes affichées : (catégorie, tâche ou None pour l'en-tête, obligatoire)
+        self._rows: List[Tuple[str, Optional[AbstractTask], bool]] = []
+        self._header_rows: Dict[str, int] = {}
+        self._task_rows: Dict[int, int] = {}
+        # Index des tâches : index de tâche → tâche et → catégorie (reconstruits par rebuild)
+        self._tasks: Dict[int, AbstractTask] = {}
+        self._task_categories: Dict[int, str] = {}
+        # Tâches triées de chaque catégorie, telles qu'affichées
+        self._sorted: Dict[str, List[Tuple[AbstractTask, bool]]] = {}
+        self._totals: Dict[str, float] = {}
+        # Texte du champ de correction de chaque tâche (index → texte)
+        self._manual_text: Dict[int, str] = {}
+
+        self._bold = QFont()
+        self._bold.setBold(True)
+
+    @staticmethod
+    def sorted_tasks(task_list: List[Tuple[AbstractTask, bool]]) -> List[Tuple[AbstractTask, bool]]:
+        """Trie les tâches : obligatoires d'abord, optionnelles ensuite."""
+        return sorted(task_list, key=lambda t: (not t[1], t[0].index))
+
+    # ── Construction et mise à jour ──────────────────────────────────
+    def _sorted_categories(self) -> Dict[str, List[Tuple[AbstractTask, bool]]]:
+        return {cat_name: self.sorted_tasks(task_list) for cat_name, task_list in self.categories.items()}
+
+    def rebuild(self, sorted_categories: Optional[Dict[str, List[Tuple[AbstractTask, bool]]]] = None):
+        """Recalcule la liste des lignes depuis les catégories et leurs tâches."""
+        self.beginResetModel()
+        self._sorted = sorted_categories if sorted_categories is not None else self._sorted_categories()
+        self._rows = []
+        for cat_name, tasks in self._sorted.items():
+            self._rows.append((cat_name, None, False))
+            if not self.collapsed.get(cat_name, False):
+                self._rows.extend((cat_name, task, mandatory) for task, mandatory in tasks)
+        self._index_tasks()
+        self._index_rows()
+        self._reset_manual_texts()
+        self._compute_totals()
+        self.endResetModel()
+
+    def refresh(self):
+        """Reprend l'état des tâches ; les lignes ne sont recalculées que si les tâches ont changé."""
+        sorted_categories = self._sorted_categories()
+        if self._layout(sorted_categories) != self._layout(self._sorted):
+            self.rebuild(sorted_categories)
+            return
+        self._reset_manual_texts()
+        self._compute_totals()
+        self._all_changed()
+
+    def update(self):
+        """Recalcule les heures après un changement de contexte ou de saisie.
+
+        Comme le champ de correction, la valeur saisie fixe les heures finales :
+        les heures de base manuelles sont recalculées avec les coefficients du
+        contexte courant.
+        """
+        for cat_name, tasks in self._sorted.items():
+            if self.category_corrections.get(cat_name) is not None:
+                continue  # correction de catégorie : champs de tâche inactifs
+            for task, _mandatory in tasks:
+                self._apply_manual_text(task)
+        self._compute_totals()
+        self._all_changed()
+
+    @staticmethod
+    def _layout(sorted_categories: Dict[str, List[Tuple[AbstractTask, bool]]]) -> List[Tuple[str, List[Tuple[int, bool]]]]:
+        return [(cat_name, [(task.index, mandatory) for task, mandatory in tasks])
+                for cat_name, tasks in sorted_categories.items()]
+
+    def update_task(self, task_index: int):
+        """Recalcule le total de la catégorie d'une tâche et rafraîchit les lignes de cette catégorie.
+
+        Suffit après une saisie ou une case cochée : les autres catégories ne changent pas.
+        """
+        cat_name = self._task_categories.get(task_index)
+        if cat_name is None:
+            return
+        tasks = self._sorted[cat_name]
+        self._totals[cat_name] = sum(task.effective_hours(self.context) for task, _ in tasks)
+        header_row = self._header_rows[cat_name]
+        last_row = header_row if self.collapsed.get(cat_name, False) else header_row + len(tasks)
+        self.dataChanged.emit(self.index(header_row, 0), self.index(last_row, len(self.columns) - 1))
+
+    def task(self, task_index: int) -> Optional[AbstractTask]:
+        return self._tasks.get(task_index)
+
+    def task_category(self, task_index: int) -> Optional[str]:
+        return self._task_categories.get(task_index)
+
+    def task_row(self, task_index: int) -> Optional[int]:
+        """Ligne d'une tâche, None si sa catégorie est repliée."""
+        return self._task_rows.get(task_index)
+
+    def header_row(self, cat_name: str) -> Optional[int]:
+        return self._header_rows.get(cat_name)
+
+    def _index_tasks(self):
+        self._tasks = {}
+        self._task_categories = {}
+        for cat_name, tasks in self._sorted.items():
+            for task, _mandatory in tasks:
+                self._tasks[task.index] = task
+                self._task_categories[task.index] = cat_name
+
+    def _index_rows(self):
+        self._header_rows = {}
+        self._task_rows = {}
+        for row, (cat_name, task, _mandatory) in enumerate(self._rows):
+            if task is None:
+                self._header_rows[cat_name] = row
+            else:
+                self._task_rows[task.index] = row
+
+    def _reset_manual_texts(self):
+        self._manual_text = {
+            task.index: f"{task.effective_hours(self.context):.2f}" if task.manual_base_hours is not None else ""
+            for tasks in self._sorted.values() for task, _mandatory in tasks
+        }
+
+    def _apply_manual_text(self, task: AbstractTask):
+        """Met à jour task.manual_base_hours depuis le texte du champ de correction."""
+        text = self._manual_text.get(task.index, "").strip()
+        if not text:
+            task.manual_base_hours = None
+            return
+        try:
+            target_hours = float(text)
+            coeff = task.context_coefficients(self.context)
+            task.manual_base_hours = target_hours / coeff if coeff else None
+        except ValueError:
+            task.manual_base_hours = None
+
+    def _compute_totals(self):
+        self._totals = {cat_name: sum(task.effective_hours(self.context) for task, _ in tasks)
+                        for cat_name, tasks in self._sorted.items()}
+
+    def _all_changed(self):
+        if self._rows:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self._rows) - 1, len(self.columns) - 1))
+
+    # ── Catégories repliables ────────────────────────────────────────
+    def header_rows(self) -> List[int]:
+        return list(self._header_rows.values())
+
+    def category_at(self, row: int) -> Optional[str]:
+        """Catégorie si la ligne est un en-tête, None sinon."""
+        cat_name, task, _mandatory = self._rows[row]
+        return cat_name if task is None else None
+
+    def toggle_category(self, cat_name: str):
+        """Replie ou déplie une catégorie (retire ou insère les lignes de ses tâches)."""
+        collapsing = not self.collapsed.get(cat_name, False)
+        self.collapsed[cat_name] = collapsing
+        header_row = self._header_rows[cat_name]
+        tasks = self._sorted[cat_name]
+        if tasks:
+            first, last = header_row + 1, header_row + len(tasks)
+            if collapsing:
+                self.beginRemoveRows(QModelIndex(), first, last)
+                del self._rows[first:last + 1]
+                self._index_rows()
+                self.endRemoveRows()
+            else:
+                self.beginInsertRows(QModelIndex(), first, last)
+                self._rows[first:first] = [(cat_name, task, mandatory) for task, mandatory in tasks]
+                self._index_rows()
+                self.endInsertRows()
+        header = self.index(header_row, self.COL_CHOICE)
+        self.dataChanged.emit(header, header)
+
+    # ── QAbstractTableModel ──────────────────────────────────────────
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.columns[section]
+        return None
+
+    def flags(self, index):
+        cat_name, task, mandatory = self._rows[index.row()]
+        col = index.column()
+        if col == self.COL_CORRECTION and (task is None or self.category_corrections.get(cat_name) is None):
+            return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsEditable
+        if col == self.COL_CHOICE and task is not None and not mandatory:
+            return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsUserCheckable
+        return Qt.ItemFlag.ItemIsEnabled
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        cat_name, task, mandatory = self._rows[index.row()]
+        if task is None:
+            return self._header_data(cat_name, index.column(), role)
+        return self._task_data(cat_name, task, mandatory, index.column(), role)
+
+    def _header_data(self, cat_name: str, col: int, role):
+        correction = self.category_corrections.get(cat_name)
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            if col == self.COL_CHOICE:
+                indicator = "▶" if self.collapsed.get(cat_name, False) else "▼"
+                return f"{indicator} {cat_name}"
+            if col == self.COL_FINAL:
+                return _fmt_hours(correction if correction is not None else self._totals.get(cat_name, 0.0))
+            if col == self.COL_CORRECTION:
+                return f"{correction:.2f}" if correction is not None else ""
+        elif role == Qt.ItemDataRole.FontRole and col != self.COL_CORRECTION:
+            return self._bold
+        elif role == Qt.ItemDataRole.BackgroundRole and col != self.COL_CORRECTION:
+            return QBrush(self.GRAY)
+        elif role == Qt.ItemDataRole.TextAlignmentRole and col in (self.COL_FINAL, self.COL_CORRECTION):
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+    def _task_data(self, cat_name: str, task: AbstractTask, mandatory: bool, col: int, role):
+        if col == self.COL_CHOICE:
+            if mandatory:
+                # Pas de case à cocher, cellule grisée
+                return QBrush(self.GRAY) if role == Qt.ItemDataRole.BackgroundRole else None
+            if role == Qt.ItemDataRole.CheckStateRole:
+                checked = getattr(task, "is_selected", False)
+                return Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked
+            return None
+
+        if col == self.COL_CORRECTION and self.category_corrections.get(cat_name) is not None:
+            # Correction de catégorie : champ de la tâche remplacé par une cellule grisée
+            return QBrush(self.GRAY) if role == Qt.ItemDataRole.BackgroundRole else None
+
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            if col == self.COL_REF:
+                return str(task.index)
+            if col == self.COL_LABEL:
+                return task.label
+            if col == self.COL_BASE:
+                return _fmt_hours(task.default_hours(self.context))
+            if col == self.COL_FINAL:
+                return _fmt_hours(task.effective_hours(self.context))
+            if col == self.COL_CORRECTION:
+                return self._manual_text.get(task.index, "")
+        elif role == Qt.ItemDataRole.TextAlignmentRole and col != self.COL_LABEL:
+            return Qt.AlignmentFlag.AlignCenter
+        elif role == Qt.ItemDataRole.ForegroundRole and col == self.COL_BASE:
+            return QBrush(QColor("#0063AF"))
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid():
+            return False
+        cat_name, task, _mandatory = self._rows[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.CheckStateRole and col == self.COL_CHOICE and task is not None:
+            self.checkbox_toggled.emit(Qt.CheckState(value) == Qt.CheckState.Checked, task.index)
+            self.dataChanged.emit(index, index)
+            return True
+        if role != Qt.ItemDataRole.EditRole or col != self.COL_CORRECTION:
+            return False
+        text = str(value)
+        if task is not None:
+            self._manual_text[task.index] = text
+            self.dataChanged.emit(index, index)
+            self.manual_value_modified.emit(text, task.index)
+            return True
+
+        # Correction de catégorie
+        text = text.strip()
+        try:
+            self.category_corrections[cat_name] = float(text) if text else None
+        except ValueError:
+            self.category_corrections[cat_name] = None
+        self.dataChanged.emit(index, index)
+        # Émettre le signal pour que le contrôleur persiste et recalcule
+        self.category_correction_modified.emit(cat_name, text)
+        return True
+
+
+class _TaskItemDelegate(QStyledItemDelegate):
+    """Champs de correction créés à la demande, et case à cocher centrée dans la colonne Choix."""
+
+    def createEditor(self, parent, option, index):
+        editor = QLineEdit(parent)
+        editor.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setText(index.data(Qt.ItemDataRole.EditRole) or "")
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.text(), Qt.ItemDataRole.EditRole)
+
+    def paint(self, painter, option, index):
+        state = index.data(Qt.ItemDataRole.CheckStateRole)
+        if state is None:
+            super().paint(painter, option, index)
+            return
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        widget = opt.widget
+        style = widget.style() if widget else QApplication.style()
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_PanelItemViewItem, opt, painter, widget)
+        rect = style.subElementRect(QStyle.SubElement.SE_ItemViewItemCheckIndicator, opt, widget)
+        rect.moveCenter(option.rect.center())
+        opt.rect = rect
+        checked = Qt.CheckState(state) == Qt.CheckState.Checked
+        opt.state |= QStyle.StateFlag.State_On if checked else QStyle.StateFlag.State_Off
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_IndicatorItemViewItemCheck, opt, painter, widget)
+
+    def editorEvent(self, event, model, option, index):
+        if not index.flags() & Qt.ItemFlag.ItemIsUserCheckable:
+            return super().editorEvent(event, model, option, index)
+        toggle = False
+        if event.type() == QEvent.Type.MouseButtonRelease:
+            toggle = event.button() == Qt.MouseButton.LeftButton and option.rect.contains(event.position().toPoint())
+        elif event.type() == QEvent.Type.MouseButtonDblClick:
+            return True
+        elif event.type() == QEvent.Type.KeyPress:
+            toggle = event.key() in (Qt.Key.Key_Space, Qt.Key.Key_Select)
+        if not toggle:
+            return False
+        checked = Qt.CheckState(index.data(Qt.ItemDataRole.CheckStateRole)) == Qt.CheckState.Checked
+        return model.setData(index, Qt.CheckState.Unchecked if checked else Qt.CheckState.Checked,
+                             Qt.ItemDataRole.CheckStateRole)
+
+
+class TaskTableWidget(QTableView):
+    """Tableau de tâches : chaque ligne a une case Choix (grisée si obligatoire, à cocher si optionnelle).
+
+    Vue sur un TaskTableModel : aucune cellule n'a de widget permanent, les
+    champs de correction sont créés par le délégué le temps de la saisie.
+    """
+
     manual_value_modified = pyqtSignal(str, int)  # (text, ref)
     checkbox_toggled = pyqtSignal(bool, int)  # (is_checked, ref)
     category_correction_modified = pyqtSignal(str, str)  # (category_name, text)
@@ -23,27 +384,39 @@ class TaskTableWidget(QTableWidget):
             self.label.setObjectName("important")
         self.task_type = task_type
 
-        self.context: Dict[str, Any] = {}
-        # category_name -> List[(task, mandatory)]
-        self.categories: Dict[str, List[Tuple[AbstractTask, bool]]] = {}
-        self.category_corrections: Dict[str, Optional[float]] = {}
-
-        # Collapsible state
-        self._collapsed: Dict[str, bool] = {}
-        self._category_header_rows: Dict[str, int] = {}
-        self._category_task_counts: Dict[str, int] = {}
+        self.task_model = TaskTableModel(task_type, self)
+        self.setModel(self.task_model)
+        self.setItemDelegate(_TaskItemDelegate(self))
+        self.task_model.manual_value_modified.connect(self.manual_value_modified)
+        self.task_model.checkbox_toggled.connect(self.checkbox_toggled)
+        self.task_model.category_correction_modified.connect(self.category_correction_modified)
+        # Les lignes d'en-tête s'étendent sur les colonnes Choix à Base
+        self.task_model.modelReset.connect(self._on_rows_changed)
+        self.task_model.rowsInserted.connect(self._on_rows_changed)
+        self.task_model.rowsRemoved.connect(self._on_rows_changed)
 
         self._setup_table()
-        self.cellClicked.connect(self._on_cell_clicked)
+        self.clicked.connect(self._on_cell_clicked)
         self.adjust_height_to_content()
 
+    @property
+    def context(self) -> Dict[str, Any]:
+        return self.task_model.context
+
+    @context.setter
+    def context(self, context: Dict[str, Any]):
+        self.task_model.context = context
+
+    @property
+    def categories(self) -> Dict[str, List[Tuple[AbstractTask, bool]]]:
+        return self.task_model.categories
+
+    @property
+    def category_corrections(self) -> Dict[str, Optional[float]]:
+        return self.task_model.category_corrections
+
     def _setup_table(self):
         """Configure les colonnes et le style du tableau."""
-        columns = ["Choix", "Ref", self.task_type, "Base", "Heures finales", "Correction"]
-            
-        self.setColumnCount(len(columns))
-        self.setHorizontalHeaderLabels(columns)
-        
         header = self.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeMode.Fixed)              # Choix
         self.setColumnWidth(0, 60)
@@ -54,7 +427,9 @@ class TaskTableWidget(QTableWidget):
         header.setSectionResizeMode(5, QHeaderView.ResizeMode.ResizeToContents)   # Correction
 
         self.verticalHeader().setVisible(False)
-        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.DoubleClicked
+                             | QAbstractItemView.EditTrigger.EditKeyPressed
+                             | QAbstractItemView.EditTrigger.AnyKeyPressed)
         self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
@@ -66,7 +441,7 @@ class TaskTableWidget(QTableWidget):
     def collapse_all(self):
         """Marque toutes les catégories comme repliées (à appeler avant show_table)."""
         for cat_name in self.categories:
-            self._collapsed[cat_name] = True
+            self.task_model.collapsed[cat_name] = True
 
     def add_task(self, category_name: str, task: AbstractTask, mandatory: bool = True):
         """Ajoute une tâche à une catégorie. mandatory=True → checkbox grisée, False → checkbox active."""
@@ -76,150 +451,29 @@ class TaskTableWidget(QTableWidget):
 
     def _sorted_tasks(self, task_list: List[Tuple[AbstractTask, bool]]) -> List[Tuple[AbstractTask, bool]]:
         """Trie les tâches : obligatoires d'abord, optionnelles ensuite."""
-        return sorted(task_list, key=lambda t: (not t[1], t[0].index))
+        return TaskTableModel.sorted_tasks(task_list)
 
-    def _add_category_header_row(self, cat_name: str, total_hours: float):
-        """Ajoute une ligne d'en-tête pour une catégorie (cliquable pour replier/déplier)."""
-        row = self.rowCount()
-        self.insertRow(row)
-
-        font = QFont()
-        font.setBold(True)
-        bg = QBrush(QColor("#ecf0f1"))
-
-        # Indicateur replié/déplié
-        is_collapsed = self._collapsed.get(cat_name, False)
-        indicator = "▶" if is_collapsed else "▼"
-
-        # Nom de la catégorie (colonnes 0..3 : Choix, Ref, Label, Base)
-        cat_item = QTableWidgetItem(f"{indicator} {cat_name}")
-        cat_item.setFlags(Qt.ItemFlag.ItemIsEnabled)
-        cat_item.setBackground(bg)
-        cat_item.setFont(font)
-        self.setItem(row, 0, cat_item)
-        self.setSpan(row, 0, 1, self.COL_OFFSET + 3)  # colonnes 0-3
-
-        # Total dans "Heures finales" (colonne 4)
-        total_hours_item = QTableWidgetItem(f"{total_hours:.2f}")
-        total_hours_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        total_hours_item.setFlags(Qt.ItemFlag.ItemIsEnabled)
-        total_hours_item.setBackground(bg)
-        total_hours_item.setFont(font)
-        self.setItem(row, self.COL_OFFSET + 3, total_hours_item)
-
-        # Correction de catégorie (colonne 5)
-        line_edit = QLineEdit()
-        line_edit.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        correction = self.category_corrections.get(cat_name)
-        if correction is not None:
-            line_edit.setText(f"{correction:.2f}")
-        line_edit.editingFinished.connect(
-            lambda le=line_edit, cn=cat_name: self._on_category_correction_input(cn, le.text())
-        )
-        self.setCellWidget(row, self.COL_OFFSET + 4, line_edit)
-
-    def _add_task_row(self, task: AbstractTask, row: int, mandatory: bool) -> float:
-        """Ajoute une ligne de tâche et retourne les heures effectives."""
-        self.insertRow(row)
-        off = self.COL_OFFSET
-
-        if mandatory:
-            # Pas de checkbox, cellule grisée
-            empty_item = QTableWidgetItem()
-            empty_item.setFlags(Qt.ItemFlag.ItemIsEnabled)
-            empty_item.setBackground(QBrush(QColor("#ecf0f1")))
-            self.setItem(row, 0, empty_item)
-        else:
-            # Checkbox sur fond blanc
-            checkbox = QCheckBox()
-            chk_widget = QWidget()
-            chk_widget.setObjectName("optionalCheckboxCell")
-            chk_layout = QHBoxLayout(chk_widget)
-            chk_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            chk_layout.setContentsMargins(0, 0, 0, 0)
-            chk_layout.addWidget(checkbox)
-            self.setCellWidget(row, 0, chk_widget)
-            if hasattr(task, 'is_selected'):
-                checkbox.setChecked(task.is_selected)
-            checkbox.checkStateChanged.connect(
-                lambda _state, ref=task.index, cb=checkbox: self.checkbox_toggled.emit(cb.isChecked(), ref)
-            )
-
-        # Ref
-        ref_item = QTableWidgetItem(str(task.index))
-        ref_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.setItem(row, off + 0, ref_item)
-
-        # Label
-        label_item = QTableWidgetItem(task.label)
-        self.setItem(row, off + 1, label_item)
-
-        # Heures par défaut (lecture seule)
-        default_h = task.default_hours(self.context)
-        hours_item = QTableWidgetItem(f"{default_h:.2f}".rstrip("0").rstrip("."))
-        hours_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        hours_item.setFlags(Qt.ItemFlag.ItemIsEnabled)
-        hours_item.setForeground(QBrush(QColor("#0063AF")))
-        self.setItem(row, off + 2, hours_item)
-
-        # Heures finales (lecture seule, mise à jour dynamique)
-        final_h = task.effective_hours(self.context)
-        final_hours_item = QTableWidgetItem(f"{final_h:.2f}".rstrip("0").rstrip("."))
-        final_hours_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        final_hours_item.setFlags(Qt.ItemFlag.ItemIsEnabled)
-        self.setItem(row, off + 3, final_hours_item)
-
-        # Correction manuelle
-        line_edit = QLineEdit()
-        line_edit.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        if task.manual_base_hours is not None:
-            line_edit.setText(f"{task.effective_hours(self.context):.2f}")
-        line_edit.editingFinished.connect(
-            lambda le=line_edit, ref=task.index: self.manual_value_modified.emit(le.text(), ref)
-        )
-        self.setCellWidget(row, off + 4, line_edit)
-
-        return task.effective_hours(self.context)
+    def find_task(self, ref: int) -> Optional[AbstractTask]:
+        """Tâche affichée dans le tableau à partir de son index (recherche directe)."""
+        return self.task_model.task(ref)
+
+    def category_of(self, ref: int) -> Optional[str]:
+        """Catégorie d'une tâche du tableau à partir de son index."""
+        return self.task_model.task_category(ref)
 
     def show_table(self):
         """Affiche toutes les catégories et leurs tâches (obligatoires d'abord, puis optionnelles)."""
-        self._category_header_rows.clear()
-        self._category_task_counts.clear()
-
-        for cat_name, task_list in self.categories.items():
-            sorted_tasks = self._sorted_tasks(task_list)
-            total_hours = 0.0
-            
-            self._add_category_header_row(cat_name, total_hours)
-            header_row = self.rowCount() - 1
-            self._category_header_rows[cat_name] = header_row
-            self._category_task_counts[cat_name] = len(sorted_tasks)
-            
-            for task, mandatory in sorted_tasks:
-                row = self.rowCount()
-                total_hours += self._add_task_row(task, row, mandatory)
-
-            correction = self.category_corrections.get(cat_name)
-            display = correction if correction is not None else total_hours
-            total_item = self.item(header_row, self.COL_OFFSET + 3)
-            total_item.setText(f"{display:.2f}".rstrip("0").rstrip("."))
-
-            if correction is not None:
-                self._set_task_corrections_enabled(header_row, len(sorted_tasks), False)
-
-            # Appliquer l'état replié
-            is_collapsed = self._collapsed.get(cat_name, False)
-            if is_collapsed:
-                for i in range(len(sorted_tasks)):
-                    self.setRowHidden(header_row + 1 + i, True)
+        self.task_model.rebuild()
+
+    def _on_rows_changed(self, *_args):
+        self.clearSpans()
+        for header_row in self.task_model.header_rows():
+            self.setSpan(header_row, 0, 1, self.COL_OFFSET + 3)  # colonnes 0-3
+        self.adjust_height_to_content()
 
     def _content_height(self) -> int:
         """Calcule la hauteur totale nécessaire pour afficher tout le contenu."""
-        h = self.horizontalHeader().height() + 2
-        for row in range(self.rowCount()):
-            if not self.isRowHidden(row):
-                h += self.rowHeight(row)
-        return h
+        return self.horizontalHeader().height() + 2 + self.verticalHeader().length()
 
     def sizeHint(self) -> QSize:
         return QSize(super().sizeHint().width(), self._content_height())
@@ -231,34 +485,13 @@ class TaskTableWidget(QTableWidget):
         """Notifie le layout que la taille a changé."""
         self.updateGeometry()
 
-    def _on_cell_clicked(self, row: int, _col: int):
-        """Détecte un clic sur une ligne d'en-tête de catégorie pour replier/déplier."""
-        for cat_name, header_row in self._category_header_rows.items():
-            if row == header_row:
-                self._toggle_category(cat_name)
-                break
-
-    def _toggle_category(self, cat_name: str):
-        """Replie ou déplie une catégorie."""
-        is_collapsed = self._collapsed.get(cat_name, False)
-        self._collapsed[cat_name] = not is_collapsed
-        header_row = self._category_header_rows[cat_name]
-        task_count = self._category_task_counts[cat_name]
-
-        # Masquer/afficher les lignes de tâches
-        for i in range(task_count):
-            self.setRowHidden(header_row + 1 + i, not is_collapsed)
-
-        # Mettre à jour l'indicateur
-        indicator = "▶" if not is_collapsed else "▼"
-        item = self.item(header_row, 0)
-        if item:
-            text = item.text()
-            if text.startswith(("▶ ", "▼ ")):
-                text = text[2:]
-            item.setText(f"{indicator} {text}")
-
-        self.adjust_height_to_content()
+    def _on_cell_clicked(self, index: QModelIndex):
+        """Clic sur un en-tête de catégorie : replier/déplier ; sur un champ de correction : saisie."""
+        cat_name = self.task_model.category_at(index.row())
+        if cat_name is not None and index.column() != TaskTableModel.COL_CORRECTION:
+            self.task_model.toggle_category(cat_name)
+        elif index.flags() & Qt.ItemFlag.ItemIsEditable:
+            self.edit(index)
 
     @property
     def is_empty(self) -> bool:
@@ -266,113 +499,17 @@ class TaskTableWidget(QTableWidget):
         return not any(self.categories.values())
 
     def refresh(self):
-        """Recrée l'affichage du tableau avec les données actuelles."""
-        self.clearContents()
-        self.setRowCount(0)
-        self.show_table()
+        """Met l'affichage à jour avec les données actuelles (lignes recalculées si les tâches ont changé)."""
+        self.task_model.refresh()
         self.adjust_height_to_content()
 
-    @staticmethod
-    def _fmt(hours: float) -> str:
-        """Formate un nombre d'heures en supprimant les zéros inutiles."""
-        return f"{hours:.1f}".rstrip("0").rstrip(".")
-
-    def _sync_manual_hours(self, task: AbstractTask, task_row: int) -> None:
-        """Lit le QLineEdit de correction et met à jour task.manual_base_hours."""
-        line_edit = self.cellWidget(task_row, self.COL_OFFSET + 4)
-        if not isinstance(line_edit, QLineEdit):
-            return
-        text = line_edit.text().strip()
-        if not text:
-            task.manual_base_hours = None
-            return
-        try:
-            target_hours = float(text)
-            coeff = task.context_coefficients(self.context)
-            task.manual_base_hours = target_hours / coeff if coeff else None
-        except ValueError:
-            task.manual_base_hours = None
-
-    def _is_task_checked(self, task_row: int) -> bool:
-        """Retourne True si la checkbox est cochée, ou True si ligne obligatoire (pas de checkbox)."""
-        checkbox_widget = self.cellWidget(task_row, 0)
-        if not checkbox_widget:
-            return True  # Ligne obligatoire, pas de checkbox → toujours active
-        checkbox = checkbox_widget.findChild(QCheckBox)
-        return checkbox.isChecked() if checkbox else False
-
-    def _on_category_correction_input(self, cat_name: str, text: str):
-        """Gère la saisie d'une correction de catégorie."""
-        text = text.strip()
-        if text:
-            try:
-                self.category_corrections[cat_name] = float(text)
-            except ValueError:
-                self.category_corrections[cat_name] = None
-        else:
-            self.category_corrections[cat_name] = None
-
-        # Émettre le signal pour que le contrôleur persiste et recalcule
-        self.category_correction_modified.emit(cat_name, text)
-
-    def _set_task_corrections_enabled(self, header_row: int, task_count: int, enabled: bool):
-        """Active/désactive les corrections individuelles des tâches d'une catégorie."""
-        col = self.COL_OFFSET + 4
-        for idx in range(task_count):
-            task_row = header_row + 1 + idx
-            if not enabled:
-                # Remplacer le QLineEdit par une cellule grisée
-                self.removeCellWidget(task_row, col)
-                gray_item = QTableWidgetItem()
-                gray_item.setFlags(Qt.ItemFlag.ItemIsEnabled)
-                gray_item.setBackground(QBrush(QColor("#ecf0f1")))
-                self.setItem(task_row, col, gray_item)
-            else:
-                # Restaurer le QLineEdit si absent
-                existing = self.cellWidget(task_row, col)
-                if not isinstance(existing, QLineEdit):
-                    line_edit = QLineEdit()
-                    line_edit.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                    self.setCellWidget(task_row, col, line_edit)
-
-    def _update_task_row(self, task: AbstractTask, task_row: int) -> float:
-        """Met à jour une ligne de tâche et retourne sa contribution au total."""
-        off = self.COL_OFFSET
-        default_h = task.default_hours(self.context)
-
-        item_base = self.item(task_row, off + 2)
-        if item_base:
-            item_base.setText(self._fmt(default_h))
-
-        item_final = self.item(task_row, off + 3)
-        if item_final:
-            item_final.setText(self._fmt(task.effective_hours(self.context)))
-
-        self._sync_manual_hours(task, task_row)
-
-        return task.effective_hours(self.context)
-
-    def _update_category(self, cat_name: str, task_list: List[Tuple[AbstractTask, bool]], header_row: int) -> None:
-        """Met à jour toutes les lignes d'une catégorie et son total."""
-        sorted_tasks = self._sorted_tasks(task_list)
-        total_hours = sum(
-            self._update_task_row(task, header_row + 1 + idx)
-            for idx, (task, _mandatory) in enumerate(sorted_tasks)
-        )
-
-        correction = self.category_corrections.get(cat_name)
-        display = correction if correction is not None else total_hours
-
-        total_item = self.item(header_row, self.COL_OFFSET + 3)
-        if total_item:
-            total_item.setText(self._fmt(display))
-
     def update_table(self):
-        """Met à jour les heures par défaut et les totaux des catégories sans recréer les widgets."""
-        current_row = 0
-        for cat_name, task_list in self.categories.items():
-            self._update_category(cat_name, task_list, current_row)
-            current_row += 1 + len(task_list)
+        """Met à jour les heures par défaut et les totaux des catégories."""
+        self.task_model.update()
+
+    def update_task(self, ref: int):
+        """Met à jour la catégorie d'une seule tâche (total, lignes)."""
+        self.task_model.update_task(ref)
 
 
 class TabTasks(QWidget):
@@ -1,13 +1,133 @@
 from abc import abstractmethod
-from typing import Dict, List, Optional, Any, override
+from array import array
+from math import nan
+from typing import Callable, Dict, List, Optional, Any, override
+
+import numpy as np
+
+
+class TaskState:
+    """État éditable des tâches d'un projet, stocké dans des tableaux compacts (une case par tâche).
+
+    Les tâches du catalogue (ApplicationData) sont partagées entre les projets : un projet n'en
+    garde que des vues légères (cf. AbstractTask.bind) dont les attributs éditables sont lus et
+    écrits ici. Les heures absentes (None) sont stockées sous forme de NaN.
+    """
+
+    def __init__(self, size: int):
+        self.is_selected: List[bool] = [False] * size
+        self.manual_base_hours: array = array("d", [nan]) * size
+        self.category_override_hours: array = array("d", [nan]) * size
+
+    def __len__(self) -> int:
+        return len(self.is_selected)
+
+    def hours_array(self, name: str) -> np.ndarray:
+        """Vue NumPy (sans copie) d'un tableau d'heures, pour les calculs vectorisés."""
+        return np.frombuffer(getattr(self, name))
+
+
+class TrackedAttribute:
+    """Attribut éditable d'une tâche : toute modification est signalée au listener de la tâche.
+
+    Permet au moteur de recalcul du projet (HoursEngine) de n'invalider que la tâche modifiée.
+    La valeur est stockée dans le slot "_<nom>" de la tâche.
+    """
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+        self.storage = f"_{name}"
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return getattr(obj, self.storage, None)
+
+    def __set__(self, obj, value):
+        previous = getattr(obj, self.storage, None)
+        setattr(obj, self.storage, value)
+        if obj.listener is not None and previous != value:
+            obj.listener(obj)
+
+
+class StateAttribute(TrackedAttribute):
+    """Attribut éditable d'une vue de tâche liée à un projet : valeur stockée dans le TaskState du projet."""
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj._state, self.name)[obj._slot]
+        return None if value != value else value  # NaN → None
+
+    def __set__(self, obj, value):
+        previous = self.__get__(obj)
+        getattr(obj._state, self.name)[obj._slot] = nan if value is None else value
+        if obj.listener is not None and previous != value:
+            obj.listener(obj)
+
+
+def _slot_names(cls: type) -> List[str]:
+    """Tous les slots d'une classe et de ses parents."""
+    names: List[str] = []
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get("__slots__", ()):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+_view_classes: Dict[type, tuple] = {}
+
+
+def _view_class(cls: type) -> tuple:
+    """Sous-classe "vue" d'une classe de tâche et slots à recopier (créée une fois par classe).
+
+    Les attributs éditables (TrackedAttribute) y sont redéfinis en StateAttribute.
+    """
+    cached = _view_classes.get(cls)
+    if cached is None:
+        namespace: Dict[str, Any] = {"__slots__": ("_state", "_slot")}
+        tracked = set()
+        for klass in cls.__mro__:
+            for name, attr in klass.__dict__.items():
+                if isinstance(attr, TrackedAttribute) and name not in namespace:
+                    namespace[name] = StateAttribute()
+                    namespace[name].__set_name__(None, name)
+                    tracked.add(attr.storage)
+        view_cls = type(f"{cls.__name__}View", (cls,), namespace)
+        copied = [name for name in _slot_names(cls) if name not in tracked and name != "listener"]
+        cached = _view_classes[cls] = (view_cls, copied)
+    return cached
 
 
 class AbstractTask:
+    __slots__ = ("label", "listener", "_manual_base_hours", "_category_override_hours")
+
+    manual_base_hours = TrackedAttribute()
+    category_override_hours = TrackedAttribute()
+
     def __init__(self, label: str):
         self.label = label
+        # Appelé avec la tâche à chaque modification d'un attribut éditable
+        self.listener: Optional[Callable[["AbstractTask"], None]] = None
         self.manual_base_hours: Optional[float] = None
         self.category_override_hours: Optional[float] = None
 
+    def bind(self, state: TaskState, slot: int) -> "AbstractTask":
+        """Vue de la tâche pour un projet.
+
+        La vue recopie les slots de la tâche (références vers les données du catalogue, partagées)
+        et lit/écrit ses attributs éditables dans state[slot].
+        """
+        view_cls, copied = _view_class(type(self))
+        view = object.__new__(view_cls)
+        for name in copied:
+            setattr(view, name, getattr(self, name))
+        view.listener = None
+        view._state = state
+        view._slot = slot
+        return view
+
     @abstractmethod
     def base_hours(self, context: Dict[str, Any]) -> float:
         """Heures brutes avant application des coefficients de contexte."""
@@ -35,6 +155,8 @@ class AbstractTask:
 
 
 class GeneralTask(AbstractTask):
+    __slots__ = ("index", "base_hours_machine", "coeff_type_affaire", "coeff_secteur", "multiplicative", "ortems_repartition")
+
     def __init__(self, index: int, label: str,
                  base_hours_machine: Dict[str, float],
                  coeff_type_affaire: Dict[str, float],
@@ -60,6 +182,9 @@ class GeneralTask(AbstractTask):
         return self.base_hours_machine.get(product, 0.0)
         
 class LPDCDocument(AbstractTask):
+    __slots__ = ("index", "hours", "applicable_pour", "secteur_obligatoire", "option_possible", "_is_selected")
+    is_selected = TrackedAttribute()
+
     def __init__(self, label: str,
                  index: int,
                  hours: float,
@@ -92,6 +217,9 @@ class LPDCDocument(AbstractTask):
         return self.hours
 
 class Option(AbstractTask):
+    __slots__ = ("index", "category", "hours", "_is_selected")
+    is_selected = TrackedAttribute()
+
     def __init__(self, label: str,
                  index: int,
                  category: str,
@@ -114,6 +242,9 @@ class Option(AbstractTask):
         return self.hours
         
 class Calcul(AbstractTask):
+    __slots__ = ("index", "category", "hours", "selection", "_is_selected")
+    is_selected = TrackedAttribute()
+
     def __init__(self, label: str,
                  index: int,
                  category: str,
@@ -146,6 +277,9 @@ class Calcul(AbstractTask):
         return self.hours.get(machine_type, 0.0)
         
 class Labo(AbstractTask):
+    __slots__ = ("index", "hours", "category", "coeff_secteur", "_is_selected")
+    is_selected = TrackedAttribute()
+
     def __init__(self, index: int, label: str, hours: float, category: str, coeff_secteur: Dict[str, float]):
         super().__init__(label)
         self.index = index
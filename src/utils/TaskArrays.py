@@ -0,0 +1,115 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from src.utils.Task import GeneralTask
+
+
+class TaskArrays:
+    """Catalogue des tâches générales compilé en tableaux NumPy denses.
+
+    Chaque ligne correspond à une tâche (ordre du catalogue), chaque colonne à un
+    code produit, affaire, secteur ou job. Une colonne supplémentaire en fin de
+    tableau représente un code inconnu : 0 h pour les produits, coefficient 1.0
+    pour les affaires et secteurs (mêmes valeurs par défaut que GeneralTask).
+
+    Les heures de toutes les tâches s'obtiennent par une simple indexation
+    (gather), la répartition ORTEMS par un produit matrice-vecteur.
+    """
+
+    def __init__(self, tasks: List[GeneralTask], products: Iterable[str], affaires: Iterable[str],
+                 secteurs: Iterable[str], jobs: Iterable[str]):
+        self.indices: List[int] = [task.index for task in tasks]
+        self.row_of: Dict[int, int] = {index: row for row, index in enumerate(self.indices)}
+
+        # Espaces de clés : codes de référence + codes rencontrés dans les tâches
+        self.product_ids = self._key_space(products, (t.base_hours_machine for t in tasks))
+        self.affaire_ids = self._key_space(affaires, (t.coeff_type_affaire for t in tasks))
+        self.secteur_ids = self._key_space(secteurs, (t.coeff_secteur for t in tasks))
+        self.job_ids = self._key_space(jobs, (t.ortems_repartition for t in tasks))
+        self.jobs: List[str] = list(self.job_ids)
+
+        self.base_hours = self._dense(tasks, "base_hours_machine", self.product_ids, 0.0)
+        self.coeff_affaire = self._dense(tasks, "coeff_type_affaire", self.affaire_ids, 1.0)
+        self.coeff_secteur = self._dense(tasks, "coeff_secteur", self.secteur_ids, 1.0)
+        self.multiplicative = np.array([task.multiplicative for task in tasks], dtype=bool)
+        # Matrice (tâches × jobs), sans colonne "inconnu"
+        self.ortems = self._dense(tasks, "ortems_repartition", self.job_ids, 0.0)[:, :-1]
+
+    @staticmethod
+    def _key_space(reference: Iterable[str], mappings: Iterable[Dict[str, float]]) -> Dict[str, int]:
+        ids: Dict[str, int] = {}
+        for code in reference:
+            ids.setdefault(code, len(ids))
+        for mapping in mappings:
+            for code in mapping:
+                ids.setdefault(code, len(ids))
+        return ids
+
+    @staticmethod
+    def _dense(tasks: List[GeneralTask], attr: str, ids: Dict[str, int], default: float) -> np.ndarray:
+        array = np.full((len(tasks), len(ids) + 1), default, dtype=np.float64)
+        for row, task in enumerate(tasks):
+            for code, value in getattr(task, attr).items():
+                array[row, ids[code]] = value
+        return array
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    # ── Contexte ────────────────────────────────────────────────────
+
+    def context_ids(self, product, affaire, secteur):
+        """Convertit des codes (ou des séquences de codes) en indices de colonnes."""
+        def lookup(ids: Dict[str, int], codes):
+            if isinstance(codes, str):
+                return ids.get(codes, len(ids))
+            return np.array([ids.get(code, len(ids)) for code in codes], dtype=np.intp)
+        return lookup(self.product_ids, product), lookup(self.affaire_ids, affaire), lookup(self.secteur_ids, secteur)
+
+    def coefficients(self, affaire, secteur) -> np.ndarray:
+        """Produit des coefficients affaire × secteur de chaque tâche."""
+        _, a, s = self.context_ids("", affaire, secteur)
+        return self.coeff_affaire[:, a] * self.coeff_secteur[:, s]
+
+    def default_hours(self, product, affaire, secteur) -> np.ndarray:
+        """Heures par défaut de chaque tâche.
+
+        Avec des codes simples, renvoie un vecteur (tâches). Avec des séquences de
+        codes de même longueur, renvoie une matrice (contextes × tâches) : utile
+        pour évaluer de nombreuses variantes en une seule opération.
+        """
+        p, a, s = self.context_ids(product, affaire, secteur)
+        return (self.base_hours[:, p] * (self.coeff_affaire[:, a] * self.coeff_secteur[:, s])).T
+
+    def effective_hours(self, product: str, affaire: str, secteur: str,
+                        manual_base_hours: Optional[np.ndarray] = None,
+                        override_hours: Optional[np.ndarray] = None) -> np.ndarray:
+        """Heures effectives de chaque tâche (NaN = pas de valeur manuelle / d'override)."""
+        p, a, s = self.context_ids(product, affaire, secteur)
+        coeff = self.coeff_affaire[:, a] * self.coeff_secteur[:, s]
+        hours = self.base_hours[:, p] * coeff
+        if manual_base_hours is not None:
+            hours = np.where(np.isnan(manual_base_hours), hours, manual_base_hours * coeff)
+        if override_hours is not None:
+            hours = np.where(np.isnan(override_hours), hours, override_hours)
+        return hours
+
+    # ── Agrégats ────────────────────────────────────────────────────
+
+    def recurrent_hours(self, hours: np.ndarray) -> np.ndarray:
+        """Somme des heures des tâches multiplicatives (RC), sur le dernier axe."""
+        return hours @ self.multiplicative
+
+    def repartition(self, hours: np.ndarray, quantity_coeff: float = 1.0) -> np.ndarray:
+        """Répartition ORTEMS (vecteur par job, dans l'ordre de self.jobs).
+
+        Seules les heures positives sont réparties ; les tâches multiplicatives
+        sont multipliées par le coefficient multi-machines.
+        """
+        scaled = np.where(self.multiplicative, hours * quantity_coeff, hours)
+        return np.where(scaled > 0, scaled, 0.0) @ self.ortems
+
+    def rows(self, tasks: Sequence[GeneralTask]) -> np.ndarray:
+        """Lignes du catalogue correspondant à une liste de tâches (par index)."""
+        return np.array([self.row_of[task.index] for task in tasks], dtype=np.intp)
@@ -1,7 +1,10 @@
 from __future__ import annotations
+from concurrent.futures import Executor, ThreadPoolExecutor
 from copy import copy
+from io import BytesIO
 import os
-from typing import TYPE_CHECKING, Dict, List, Any
+import threading
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
 
 import openpyxl
 from openpyxl.styles import Font
@@ -9,7 +12,36 @@ from openpyxl.styles import Font
 from src.utils.Task import GeneralTask
 
 if TYPE_CHECKING:
-    from src.model import Model, Project
+    from src.model import Model, Project, ProjectTotals
+
+
+# ── Cache des templates ─────────────────────────────────────────────
+
+_template_lock = threading.Lock()
+_templates: Dict[str, Tuple[float, bytes]] = {}  # chemin → (mtime, contenu du fichier)
+
+
+def _open_template(path: str) -> openpyxl.Workbook:
+    """Nouveau classeur issu d'un template Excel, lu une seule fois sur disque (relu si le fichier change).
+
+    Le classeur est reconstruit depuis la copie en mémoire : un deepcopy d'un classeur openpyxl
+    perd ses tables de styles.
+    """
+    mtime = os.path.getmtime(path)
+    with _template_lock:
+        cached = _templates.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, "rb") as f:
+                cached = _templates[path] = (mtime, f.read())
+    return openpyxl.load_workbook(BytesIO(cached[1]))
+
+
+def _save_workbook(wb: openpyxl.Workbook, path: str):
+    """Sérialise le classeur en mémoire puis l'écrit en une fois (beaucoup plus rapide sur un partage réseau)."""
+    buffer = BytesIO()
+    wb.save(buffer)
+    with open(path, "wb") as f:
+        f.write(buffer.getvalue())
 
 
 # ── Helpers bas-niveau pour la feuille Excel ────────────────────────
@@ -26,6 +58,12 @@ def _auto_hours(task, ctx: dict) -> float:
     return h
 
 
+def _ordered_categories(totals: "ProjectTotals", section: str, categories: Dict[str, str]) -> List[str]:
+    """Catégories présentes dans une section, dans l'ordre de référence (cf. Project.items_by_category)."""
+    present = [node[1] for node in totals.category_hours if node[0] == section]
+    return [cat for cat in categories if cat in present] + [cat for cat in present if cat not in categories]
+
+
 def _merge_col_b(ws, start: int, end: int, label: str):
     cell = ws.cell(row=start, column=2)
     cell.value = label
@@ -79,11 +117,13 @@ def _write_header(ws, project: "Project"):
 
 # ── Points d'entrée publics ─────────────────────────────────────────
 
-def export_ortems_excel(project: "Project", path: str):
-    repartition = project.make_ortems_repartition()
+def export_ortems_excel(project: "Project", path: str, repartition: Optional[Dict[str, float]] = None,
+                        delai: Optional[Dict[str, float]] = None):
+    """Export ORTEMS ; repartition et delai sont recalculés s'ils ne sont pas fournis."""
+    if repartition is None:
+        repartition = project.make_ortems_repartition()
 
-    template_path = project.app_data.ortems_template_path
-    wb = openpyxl.load_workbook(template_path)
+    wb = _open_template(project.app_data.ortems_template_path)
     ws_ortems = wb["prepa ORTEMS"]
     col = 3
     job_labels = project.app_data.jobs
@@ -92,39 +132,42 @@ def export_ortems_excel(project: "Project", path: str):
         ws_ortems.cell(row=2, column=col).value = hours
         col += 1
 
-    delai = project.compute_delai_etude()
+    if delai is None:
+        delai = project.compute_delai_etude()
     ws_ortems["B2"] = delai["delai_reel"]
 
     wb.active = ws_ortems
-    wb.save(path)
+    _save_workbook(wb, path)
 
 
-def export_excel_report(project: "Project", path: str):
-    template_path = project.app_data.excel_report_template_path
-    wb = openpyxl.load_workbook(template_path)
+def export_excel_report(project: "Project", path: str, totals: Optional["ProjectTotals"] = None):
+    """Rapport Excel ; si totals est fourni, les totaux du projet sont supposés déjà calculés."""
+    wb = _open_template(project.app_data.excel_report_template_path)
     ws = wb['chiffrage']
-    ctx = project.context()
     rex = project.manual_rex_coeff
 
-    # Recalcul des totaux (cascade : nrc_subtotal, rc_subtotal, nrc_total, rc_total)
-    project.compute_n_machines_total()
-    project.calculate_total_with_rex()
+    if totals is None:
+        # Recalcul des totaux (cascade : nrc_subtotal, rc_subtotal, nrc_total, rc_total)
+        project.compute_n_machines_total()
+        project.calculate_total_with_rex()
+        totals = project.compute_totals()
+    ctx = project.hours.context
+    app_data = project.app_data
 
     _write_header(ws, project)
 
-    summary_tree = project.generate_summary_tree()
+    gestion = project.tasks.get("Gestion de projet", {})
 
     # Enclenchement (rows 17-20)
-    for r, task in zip(range(17, 21), summary_tree['Enclenchement']):
-        _write_d_e_f(ws, r, task.default_hours(ctx), task.effective_hours(ctx), rex)
+    for r, task in zip(range(17, 21), gestion.get("Enclenchement", [])):
+        _write_d_e_f(ws, r, task.default_hours(ctx), project.hours.leaf_hours(task), rex)
 
     # Calculs (rows 21-25, 1 ligne par catégorie)
-    for r, (cat_label, calcul_list) in zip(range(21, 26), summary_tree['Calculs'].items()):
-        active = [c for c in calcul_list if c.is_active(ctx)]
-        ws.cell(row=r, column=3).value = cat_label
-        _write_d_e_f(ws, r,
-                     sum(c.default_hours(ctx) for c in active),
-                     sum(c.effective_hours(ctx) for c in active), rex)
+    calcul_cats = _ordered_categories(totals, "calculs", app_data.calcul_categories)
+    for r, cat in zip(range(21, 26), calcul_cats):
+        node = ("calculs", cat)
+        ws.cell(row=r, column=3).value = app_data.calcul_categories.get(cat, cat)
+        _write_d_e_f(ws, r, totals.category_auto_hours[node], totals.category_hours[node], rex)
 
     # Plans fab (dynamique)
     row = 26
@@ -135,15 +178,16 @@ def export_excel_report(project: "Project", path: str):
     fills = [copy(ws.cell(row=row, column=c).fill) for c in range(2, 7)]
     ws.delete_rows(row)
 
-    tasks: Dict[str, List[GeneralTask]] = summary_tree['Plans / Specs / LDN']
+    plans_label = "Plans / Specs / LDN"
+    tasks: Dict[str, List[GeneralTask]] = project.tasks.get(plans_label, {})
     for subcat, tlist in tasks.items():
-        if sum(t.effective_hours(ctx) for t in tlist) == 0:
+        if totals.category_hours.get(("tasks", plans_label, subcat), 0.0) == 0:
             continue
         first_row = row
         for t in tlist:
             ws.insert_rows(row)
             ws.cell(row=row, column=3).value = t.label
-            _write_d_e_f(ws, row, t.default_hours(ctx), t.effective_hours(ctx), rex)
+            _write_d_e_f(ws, row, t.default_hours(ctx), project.hours.leaf_hours(t), rex)
             for c in range(2, 7):
                 ws.cell(row=row, column=c).font = fonts[c-2]
                 ws.cell(row=row, column=c).border = borders[c-2]
@@ -156,16 +200,14 @@ def export_excel_report(project: "Project", path: str):
     # Options (dynamique)
     fills = [copy(ws.cell(row=row, column=c).fill) for c in range(2, 7)]
     ws.delete_rows(row)
-    options: Dict[str, List[GeneralTask]] = summary_tree['Options']
     first_row = row
-    for cat_label, option_list in options.items():
-        if sum(o.effective_hours(ctx) for o in option_list) == 0:
+    for cat in _ordered_categories(totals, "options", app_data.option_categories):
+        node = ("options", cat)
+        if totals.category_hours[node] == 0:
             continue
         ws.insert_rows(row)
-        ws.cell(row=row, column=3).value = cat_label
-        _write_d_e_f(ws, row,
-                     sum(o.default_hours(ctx) for o in option_list if o.is_active(ctx)),
-                     sum(o.effective_hours(ctx) for o in option_list), rex)
+        ws.cell(row=row, column=3).value = app_data.option_categories.get(cat, cat)
+        _write_d_e_f(ws, row, totals.category_auto_hours[node], totals.category_hours[node], rex)
         for c in range(2, 7):
             ws.cell(row=row, column=c).font = fonts[c-2]
             ws.cell(row=row, column=c).border = borders[c-2]
@@ -177,31 +219,22 @@ def export_excel_report(project: "Project", path: str):
         _merge_col_b(ws, first_row, row - 1, "Options")
 
     # LPDC (2 lignes : BASE et PART)
-    for cat_label, lpdc_list in summary_tree['Plans et documents contractuels'].items():
-        active = [d for d in lpdc_list if d.is_active(ctx)]
+    for cat in ("BASE", "PART"):
+        node = ("lpdc", cat)
         _write_d_e_f(ws, row,
-                     sum(d.default_hours(ctx) for d in active),
-                     sum(d.effective_hours(ctx) for d in active), rex)
+                     totals.category_auto_hours.get(node, 0.0),
+                     totals.category_hours.get(node, 0.0), rex)
         row += 1
 
     # LABO (2 lignes : LAB_METAL et LAB_ISOL)
-    for cat_label, labo_list in summary_tree['Laboratoire'].items():
-        active = [la for la in labo_list if la.is_active(ctx)]
-        _write_d_e_f(ws, row,
-                     sum(la.default_hours(ctx) for la in active),
-                     sum(la.effective_hours(ctx) for la in active), rex)
+    for cat in _ordered_categories(totals, "labo", app_data.labo_categories):
+        node = ("labo", cat)
+        _write_d_e_f(ws, row, totals.category_auto_hours[node], totals.category_hours[node], rex)
         row += 1
 
     # Auto subtotals (heures de base, sans modifications manuelles)
-    nrc_subtotal_auto = (
-        sum(t.default_hours(ctx) for t in summary_tree['Enclenchement'])
-        + sum(c.default_hours(ctx) for lst in summary_tree['Calculs'].values() for c in lst if c.is_active(ctx))
-        + sum(t.default_hours(ctx) for lst in summary_tree['Plans / Specs / LDN'].values() for t in lst)
-        + sum(o.default_hours(ctx) for lst in summary_tree['Options'].values() for o in lst if o.is_active(ctx))
-        + sum(d.default_hours(ctx) for lst in summary_tree['Plans et documents contractuels'].values() for d in lst if d.is_active(ctx))
-        + sum(la.default_hours(ctx) for lst in summary_tree['Laboratoire'].values() for la in lst if la.is_active(ctx))
-    )
-    rc_subtotal_auto = sum(task.default_hours(ctx) for task in summary_tree['Suivi'])
+    nrc_subtotal_auto = totals.nrc_subtotal_auto
+    rc_subtotal_auto = totals.rc_subtotal_auto
     nrc_total_auto = nrc_subtotal_auto * (1 + project.divers_percent)
     rc_total_1machine_auto = rc_subtotal_auto * (1 + project.divers_percent)
 
@@ -219,8 +252,8 @@ def export_excel_report(project: "Project", path: str):
     row += 1
 
     # Suivi (6 lignes RC, labels déjà dans le template)
-    for task in summary_tree['Suivi']:
-        _write_d_e_f(ws, row, task.default_hours(ctx), task.effective_hours(ctx), rex)
+    for task in gestion.get("Suivi", []):
+        _write_d_e_f(ws, row, task.default_hours(ctx), project.hours.leaf_hours(task), rex)
         row += 1
 
     # RC — Divers risques techniques (pour 1 machine)
@@ -249,12 +282,44 @@ def export_excel_report(project: "Project", path: str):
     ws.cell(row=row, column=5).value = project.n_machines_total
     ws.cell(row=row, column=6).value = project.total_with_rex
 
-    wb.save(path)
+    _save_workbook(wb, path)
+
+
+def export_project(project: "Project", export_dir: str, executor: Optional[Executor] = None,
+                   file_name: Optional[str] = None) -> Dict[str, str]:
+    """Génère le rapport Excel et l'export ORTEMS d'un projet dans export_dir.
+
+    Les fichiers sont nommés d'après file_name, ou d'après le numéro CRM et la révision
+    du projet par défaut. Si un executor est fourni, les deux fichiers sont générés en parallèle.
+    """
+    file_name = file_name or f"{project.crm_number}{project.revision}"
+    rapport_path = os.path.join(export_dir, f"{file_name}_rapport.xlsx")
+    ortems_path = os.path.join(export_dir, f"{file_name}_ortems.xlsx")
+
+    # Tout ce qui modifie le projet est calculé ici, avant de paralléliser : les deux
+    # exports reçoivent ces résultats et ne recalculent rien. Seul le rapport lit
+    # ensuite les heures des tâches (cache du moteur d'heures, déjà synchronisé).
+    project.compute_n_machines_total()
+    project.calculate_total_with_rex()
+    totals = project.compute_totals()
+    repartition = project.make_ortems_repartition()
+    delai = project.compute_delai_etude()
+
+    if executor is None:
+        export_excel_report(project, rapport_path, totals)
+        export_ortems_excel(project, ortems_path, repartition, delai)
+    else:
+        futures = [
+            executor.submit(export_excel_report, project, rapport_path, totals),
+            executor.submit(export_ortems_excel, project, ortems_path, repartition, delai),
+        ]
+        for future in futures:
+            future.result()
+    return {"rapport": rapport_path, "ortems": ortems_path}
 
 
 def quick_export(model: "Model") -> Dict[str, str]:
     prj = model.project
-    file_name = f"{prj.crm_number}{prj.revision}"
 
     # Garantit un dossier d'export valide, même si la config pointe sur le dossier parent.
     base_export_dir = prj.app_data.quick_export_path or prj.app_data.project_save_dir or "."
@@ -263,8 +328,5 @@ def quick_export(model: "Model") -> Dict[str, str]:
         base_export_dir = os.path.join(base_export_dir, "Chiffrages HET")
     os.makedirs(base_export_dir, exist_ok=True)
 
-    rapport_path = os.path.join(base_export_dir, f"{file_name}_rapport.xlsx")
-    ortems_path = os.path.join(base_export_dir, f"{file_name}_ortems.xlsx")
-    export_excel_report(prj, rapport_path)
-    export_ortems_excel(prj, ortems_path)
-    return {"rapport": rapport_path, "ortems": ortems_path}
\ No newline at end of file
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        return export_project(prj, base_export_dir, pool)